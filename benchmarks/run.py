@@ -0,0 +1,282 @@
+"""
+Benchmarks for the hot paths of varvault at multiple scales.
+
+Each benchmark runs on a synthetic keyring and vault file with a given number of keys and is repeated a number of times;
+the fastest and the median time of the repetitions are reported. The results are written as JSON and can be compared
+against the results of a previous run to detect regressions.
+
+Usage:
+```
+python3 benchmarks/run.py                                   # Run all benchmarks at 10, 1k, 10k and 100k keys
+python3 benchmarks/run.py --scales 10 1000 --repeat 3       # Run all benchmarks at 10 and 1k keys, 3 repetitions each
+python3 benchmarks/run.py --only get_single get_multiple    # Run some benchmarks only
+python3 benchmarks/run.py --output new.json --baseline old.json --fail-on-regression
+```
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+
+from typing import *
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import varvault
+
+SCALES = (10, 1_000, 10_000, 100_000)
+
+# Operations that are timed one at a time are repeated this many times per repetition. The reported time is per operation.
+OPERATIONS = 20
+
+# Automatic dispatch fan-out is capped at this many automatics, as registering an automatic dispatches it right away when its keys exist.
+MAX_FAN_OUT = 1_000
+
+
+class Context:
+    def __init__(self, directory: str, keys: int, with_logging: bool):
+        self.directory = directory
+        self.keys = keys
+        self.flags = tuple() if with_logging else (varvault.Flags.disable_logger,)
+        self.keyring = make_keyring(keys)
+        self.data = {f"key_{i}": make_value(i) for i in range(keys)}
+        self.existing = os.path.join(directory, f"existing-{keys}.json")
+        with open(self.existing, "w") as f:
+            json.dump(self.data, f, indent=2)
+
+    def path(self, name: str) -> str:
+        path = os.path.join(self.directory, f"{name}-{self.keys}.json")
+        for p in (path, path + ".bak"):
+            if os.path.exists(p):
+                os.remove(p)
+        return path
+
+    def vault(self, name: str, mode: str = "w", path: str = None) -> varvault.VarVault:
+        return varvault.create(*self.flags, keyring=self.keyring, resource=varvault.JsonResource(path or self.path(name), mode=mode))
+
+    def full_vault(self, name: str, mode: str = "w") -> varvault.VarVault:
+        vault = self.vault(name, mode=mode)
+        vault.insert_minivault(self.minivault())
+        return vault
+
+    def minivault(self) -> varvault.MiniVault:
+        keys = self.keyring.get_keys()
+        return varvault.MiniVault({keys[name]: value for name, value in self.data.items()})
+
+
+def make_keyring(keys: int) -> Type[varvault.Keyring]:
+    attributes = {f"key_{i}": varvault.Key(f"key_{i}", valid_type=dict) for i in range(keys)}
+    attributes.update({name: varvault.Key(name, valid_type=str) for name in ("extra", "trigger", "input", "output")})
+    return type(f"BenchmarkKeyring{keys}", (varvault.Keyring,), attributes)
+
+
+def make_value(i: int) -> Dict:
+    return {"id": i, "name": f"value-{i}", "tags": ["a", "b", "c"], "score": i * 0.5, "nested": {"enabled": i % 2 == 0, "path": f"/tmp/{i}"}}
+
+
+# ================================================================================================================
+# Benchmarks. Each benchmark takes a Context and returns a callable that does the work to time, which lets the
+# benchmark do setup without it being timed. If the callable returns an int, it's the number of operations done and the
+# time is reported per operation. If it returns a tuple of (operations, seconds), the benchmark timed the work itself.
+# ================================================================================================================
+def bench_insert(ctx: Context):
+    vault = ctx.full_vault("insert")
+
+    def run():
+        for i in range(OPERATIONS):
+            vault.insert(ctx.keyring.extra, f"value-{i}", varvault.Flags.permit_modifications)
+        return OPERATIONS
+    return run
+
+
+def bench_insert_minivault(ctx: Context):
+    vault = ctx.vault("insert_minivault")
+    mini = ctx.minivault()
+    return lambda: vault.insert_minivault(mini, varvault.Flags.permit_modifications)
+
+
+def bench_get_single(ctx: Context):
+    vault = ctx.full_vault("get_single")
+    key = ctx.keyring.get_keys()[f"key_{ctx.keys // 2}"]
+
+    def run():
+        for _ in range(OPERATIONS):
+            vault.get(key)
+        return OPERATIONS
+    return run
+
+
+def bench_get_multiple(ctx: Context):
+    vault = ctx.full_vault("get_multiple")
+    keys = [key for name, key in ctx.keyring.get_keys().items() if name.startswith("key_")]
+    return lambda: vault.get(keys)
+
+
+def bench_decorated_call(ctx: Context):
+    vault = ctx.full_vault("decorated_call")
+    vault.insert(ctx.keyring.input, "input")
+
+    @vault.manual(varvault.Flags.permit_modifications, input=ctx.keyring.input, output=ctx.keyring.output)
+    def decorated(input=varvault.AssignedByVault):
+        return input
+
+    def run():
+        for _ in range(OPERATIONS):
+            decorated()
+        return OPERATIONS
+    return run
+
+
+def bench_resource_write(ctx: Context):
+    resource = varvault.JsonResource(ctx.path("resource_write"), mode="w")
+    resource.create()
+    return lambda: resource.write(ctx.data)
+
+
+def bench_resource_read(ctx: Context):
+    resource = varvault.JsonResource(ctx.existing, mode="r")
+    resource.create()
+    return lambda: resource.read()
+
+
+def bench_live_update_reload(ctx: Context):
+    path = ctx.path("live_update_reload")
+    shutil.copyfile(ctx.existing, path)
+    reader = ctx.vault("live_update_reload", mode="r+", path=path)
+    writer = ctx.vault("live_update_reload", mode="a", path=path)
+    key = ctx.keyring.get_keys()["key_0"]
+    counter = iter(range(sys.maxsize))
+
+    def run():
+        # The write is part of the setup of the reload, so only the get that triggers the reload is timed
+        writer.insert(ctx.keyring.extra, f"value-{next(counter)}", varvault.Flags.permit_modifications)
+        start = time.perf_counter()
+        reader.get(key)
+        return None, time.perf_counter() - start
+    return run
+
+
+def bench_factory_create(ctx: Context):
+    return lambda: varvault.create(*ctx.flags, keyring=ctx.keyring, resource=varvault.JsonResource(ctx.existing, mode="r"))
+
+
+def bench_factory_create_lazy(ctx: Context):
+    return lambda: varvault.create(*ctx.flags, varvault.Flags.lazy_load, keyring=ctx.keyring, resource=varvault.JsonResource(ctx.existing, mode="r"))
+
+
+def bench_factory_create_warm_start(ctx: Context):
+    # The first create fills the warm-start cache, so every timed create is a hit
+    path = ctx.path("warm_start")
+    shutil.copyfile(ctx.existing, path)
+    varvault.WarmStartCache(path).remove()
+    create = lambda: varvault.create(*ctx.flags, keyring=ctx.keyring, resource=varvault.JsonResource(path, mode="r", warm_start=True))
+    assert not create().load_stats.warm_start
+    return create
+
+
+def bench_automatic_fan_out(ctx: Context):
+    vault = ctx.vault("automatic_fan_out")
+    fan_out = min(ctx.keys, MAX_FAN_OUT)
+    calls = list()
+    for i in range(fan_out):
+        def automatic(trigger=varvault.AssignedByVault):
+            calls.append(trigger)
+        automatic.__name__ = f"automatic_{i}"
+        vault.automatic(input=ctx.keyring.trigger)(automatic)
+
+    def run():
+        vault.insert(ctx.keyring.trigger, "go", varvault.Flags.permit_modifications)
+        assert len(calls) % fan_out == 0
+    return run
+
+
+BENCHMARKS: Dict[str, Callable[[Context], Callable]] = {name[len("bench_"):]: function for name, function in globals().items() if name.startswith("bench_")}
+
+
+# ================================================================================================================
+# Running and reporting
+# ================================================================================================================
+def measure(run: Callable, repeat: int) -> Dict:
+    times = list()
+    operations = 1
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ret = run()
+        elapsed = time.perf_counter() - start
+        if isinstance(ret, tuple):
+            # The benchmark timed the work itself
+            ret, elapsed = ret
+        operations = ret if isinstance(ret, int) else 1
+        times.append(elapsed / operations)
+    return {"min": min(times), "median": statistics.median(times), "repeat": repeat, "operations": operations}
+
+
+def run_benchmarks(names: List[str], scales: List[int], repeat: int, with_logging: bool) -> Dict:
+    results = dict()
+    with tempfile.TemporaryDirectory(prefix="varvault-benchmarks-") as directory:
+        for scale in scales:
+            ctx = Context(directory, scale, with_logging)
+            for name in names:
+                result = measure(BENCHMARKS[name](ctx), repeat)
+                results[f"{name}[{scale}]"] = result
+                print(f"{name + f'[{scale}]':<35} min {result['min'] * 1e3:12.4f} ms   median {result['median'] * 1e3:12.4f} ms", flush=True)
+    return results
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    f"""Prints a comparison of {results} against {baseline} and returns the benchmarks that are slower than the baseline by more than {threshold}."""
+    regressions = list()
+    print(f"\n{'benchmark':<35} {'baseline (ms)':>14} {'current (ms)':>14} {'ratio':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<35} {'-':>14} {result['min'] * 1e3:14.4f} {'new':>8}")
+            continue
+        ratio = result["min"] / baseline[name]["min"] if baseline[name]["min"] else float("inf")
+        marker = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            marker = "  <-- regression"
+        print(f"{name:<35} {baseline[name]['min'] * 1e3:14.4f} {result['min'] * 1e3:14.4f} {ratio:8.2f}{marker}")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks for the hot paths of varvault")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES), help=f"The number of keys in the vault to run the benchmarks at. Default: {SCALES}")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), default=list(BENCHMARKS), help="Only run these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of repetitions of each benchmark. Default: 5")
+    parser.add_argument("--with-logging", action="store_true", help="Run the benchmarks with varvault's logger enabled; it's disabled by default")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare the results against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="The relative slowdown compared to the baseline that counts as a regression. Default: 0.2")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with 1 if a regression compared to the baseline is found")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.only, args.scales, args.repeat, args.with_logging)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"varvault": varvault.__version__,
+                       "python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                       "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) compared to {args.baseline}: {regressions}")
+            if args.fail_on_regression:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
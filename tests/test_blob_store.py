@@ -0,0 +1,182 @@
+import json
+import array
+import shutil
+import tempfile
+
+from commons import *
+import pytest
+
+from varvault.blob_store import REFERENCE_KEY, BUFFER_KEY
+from varvault.compression import COMPRESSIONS, detect
+
+vault_file_new = f"{DIR}/new-vault.json"
+blob_dir = f"{vault_file_new}.blobs"
+
+LARGE = "large " * 1000
+
+
+class KeyringBlobs(varvault.Keyring):
+    key_large = varvault.Key("key_large", valid_type=str)
+    key_large_copy = varvault.Key("key_large_copy", valid_type=str)
+    key_small = varvault.Key("key_small", valid_type=int)
+    key_large_dict = varvault.Key("key_large_dict", valid_type=dict)
+
+
+class KeyringBuffers(varvault.Keyring):
+    key_bytes = varvault.Key("key_bytes", valid_type=bytes)
+    key_bytearray = varvault.Key("key_bytearray", valid_type=bytearray)
+    key_array = varvault.Key("key_array", valid_type=array.array)
+    key_memoryview = varvault.Key("key_memoryview", valid_type=memoryview)
+    key_empty = varvault.Key("key_empty", valid_type=bytes)
+
+
+BUFFERS = {
+    KeyringBuffers.key_bytes: b"\x00\x01binary\xff",
+    KeyringBuffers.key_bytearray: bytearray(b"mutable"),
+    KeyringBuffers.key_array: array.array("d", [0.5, 1.5, -2.25]),
+    KeyringBuffers.key_memoryview: memoryview(array.array("i", range(12))).cast("B").cast("i", [3, 4]),
+    KeyringBuffers.key_empty: b"",
+}
+
+
+class TestBlobStore:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        try:
+            os.remove(vault_file_new)
+        except:
+            pass
+        shutil.rmtree(blob_dir, ignore_errors=True)
+
+    def test_large_values_are_stored_apart(self):
+        resource = varvault.JsonResource(vault_file_new, mode="w", blob_threshold=100)
+        vault = varvault.create(keyring=KeyringBlobs, resource=resource)
+        vault.insert(KeyringBlobs.key_large, LARGE)
+        vault.insert(KeyringBlobs.key_large_copy, LARGE)
+        vault.insert(KeyringBlobs.key_small, 1)
+
+        content = json.load(open(vault_file_new))
+        assert content[KeyringBlobs.key_small] == 1
+        assert list(content[KeyringBlobs.key_large]) == [REFERENCE_KEY]
+        assert content[KeyringBlobs.key_large] == content[KeyringBlobs.key_large_copy], "Values are stored by their content, so equal values share a file"
+        assert len(os.listdir(blob_dir)) == 1
+        assert os.path.getsize(vault_file_new) < len(LARGE)
+
+        # References are resolved regardless of the threshold of the resource that reads the file
+        for stream_threshold in (0, varvault.STREAM_THRESHOLD):
+            loaded = varvault.create(keyring=KeyringBlobs, resource=varvault.JsonResource(vault_file_new, mode="r", shared=False, stream_threshold=stream_threshold))
+            assert loaded.get(KeyringBlobs.key_large) == LARGE
+            assert loaded.get(KeyringBlobs.key_small) == 1
+        assert varvault.JsonResource(vault_file_new, mode="r").read()[KeyringBlobs.key_large] == LARGE
+
+    def test_small_writes_do_not_store_values_again(self):
+        vault = varvault.create(keyring=KeyringBlobs, resource=varvault.JsonResource(vault_file_new, mode="w", blob_threshold=100))
+        vault.insert(KeyringBlobs.key_large, LARGE)
+        stored = list()
+        put = vault.resource.blobs.put
+        vault.resource.blobs.put = lambda encoded: stored.append(encoded) or put(encoded)
+        for i in range(5):
+            vault.insert(KeyringBlobs.key_small, i, varvault.Flags.permit_modifications)
+        assert stored == []
+        assert json.load(open(vault_file_new))[KeyringBlobs.key_small] == 4
+
+    def test_small_writes_do_not_store_mutable_values_again(self):
+        vault = varvault.create(keyring=KeyringBlobs, resource=varvault.JsonResource(vault_file_new, mode="w", blob_threshold=100))
+        large = {f"key{i}": list(range(10)) for i in range(20)}
+        vault.insert(KeyringBlobs.key_large_dict, large)
+        stored = list()
+        put = vault.resource.blobs.put
+        vault.resource.blobs.put = lambda encoded: stored.append(encoded) or put(encoded)
+        for i in range(5):
+            vault.insert(KeyringBlobs.key_small, i, varvault.Flags.permit_modifications)
+        assert stored == []
+
+        # A value that is changed in place is stored again the next time the vault is written
+        large["key0"].append(10)
+        vault.insert(KeyringBlobs.key_small, 5, varvault.Flags.permit_modifications)
+        assert len(stored) == 1
+        assert len(os.listdir(blob_dir)) == 2
+        loaded = varvault.create(keyring=KeyringBlobs, resource=varvault.JsonResource(vault_file_new, mode="r", shared=False))
+        assert loaded.get(KeyringBlobs.key_large_dict) == large
+
+    def test_lazy_load_resolves_on_access(self):
+        vault = varvault.create(keyring=KeyringBlobs, resource=varvault.JsonResource(vault_file_new, mode="w", blob_threshold=100))
+        vault.insert(KeyringBlobs.key_large, LARGE)
+        vault.insert(KeyringBlobs.key_small, 1)
+
+        resource = varvault.JsonResource(vault_file_new, mode="a")
+        read = list()
+        get = resource.blobs.get
+        resource.blobs.get = lambda reference: read.append(reference) or get(reference)
+        lazy = varvault.create(varvault.Flags.lazy_load, keyring=KeyringBlobs, resource=resource)
+        lazy.insert(KeyringBlobs.key_small, 2, varvault.Flags.permit_modifications)
+        assert read == [], "A value stored apart should only be read when it's accessed"
+        assert json.load(open(vault_file_new))[KeyringBlobs.key_large] == {REFERENCE_KEY: os.listdir(blob_dir)[0][:-len(".json")]}
+        assert lazy.get(KeyringBlobs.key_large) == LARGE
+        assert len(read) == 1
+
+    def test_prune_blobs(self):
+        resource = varvault.JsonResource(vault_file_new, mode="w", blob_threshold=100)
+        vault = varvault.create(keyring=KeyringBlobs, resource=resource)
+        vault.insert(KeyringBlobs.key_large, LARGE)
+        vault.insert(KeyringBlobs.key_large, LARGE + "changed", varvault.Flags.permit_modifications)
+        assert len(os.listdir(blob_dir)) == 2
+        assert len(resource.prune_blobs()) == 1
+        assert len(os.listdir(blob_dir)) == 1
+        assert varvault.JsonResource(vault_file_new, mode="r").read()[KeyringBlobs.key_large] == LARGE + "changed"
+
+    def test_compressed_blobs(self):
+        vault = varvault.create(keyring=KeyringBlobs, resource=varvault.JsonResource(vault_file_new, mode="w", blob_threshold=100, compression="gzip"))
+        vault.insert(KeyringBlobs.key_large, LARGE)
+        blob, = os.listdir(blob_dir)
+        assert detect(open(os.path.join(blob_dir, blob), "rb").read(8)) is COMPRESSIONS["gzip"]
+        assert varvault.JsonResource(vault_file_new, mode="r").read()[KeyringBlobs.key_large] == LARGE
+
+    def test_buffers(self):
+        vault = varvault.create(keyring=KeyringBuffers, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        vault.insert_minivault(varvault.MiniVault(BUFFERS))
+
+        content = json.load(open(vault_file_new))
+        assert all(BUFFER_KEY in content[key] for key in BUFFERS), "Buffers are stored apart regardless of the threshold"
+        assert content[KeyringBuffers.key_memoryview][BUFFER_KEY] == {"type": "memoryview", "format": "i", "shape": [3, 4], "byteorder": sys.byteorder}
+        assert {name[-len(".bin"):] for name in os.listdir(blob_dir)} == {".bin"}
+
+        for flags in ((), (varvault.Flags.lazy_load,)):
+            # The second read of a shared resource comes from the snapshot of the first, which must keep the types too
+            for _ in range(2):
+                loaded = varvault.create(*flags, keyring=KeyringBuffers, resource=varvault.JsonResource(vault_file_new, mode="r"))
+                for key, value in BUFFERS.items():
+                    assert type(loaded.get(key)) is type(value)
+                    assert loaded.get(key) == value
+
+    def test_memoryview_maps_the_file(self):
+        vault = varvault.create(keyring=KeyringBuffers, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        vault.insert(KeyringBuffers.key_memoryview, BUFFERS[KeyringBuffers.key_memoryview])
+        loaded = varvault.JsonResource(vault_file_new, mode="r").read()[KeyringBuffers.key_memoryview]
+        assert loaded.readonly, "The value refers to the memory-mapped file rather than a copy of it"
+        assert loaded.shape == (3, 4) and loaded.tolist() == BUFFERS[KeyringBuffers.key_memoryview].tolist()
+
+    def test_live_update_with_buffers(self):
+        vault = varvault.create(keyring=KeyringBuffers, resource=varvault.JsonResource(vault_file_new, mode="w+"))
+        reader = varvault.create(keyring=KeyringBuffers, resource=varvault.JsonResource(vault_file_new, mode="r+"))
+        vault.insert(KeyringBuffers.key_array, array.array("d", [1.0]))
+        assert reader.get(KeyringBuffers.key_array) == array.array("d", [1.0])
+        vault.insert(KeyringBuffers.key_array, array.array("d", [2.0]), varvault.Flags.permit_modifications)
+        assert reader.get(KeyringBuffers.key_array) == array.array("d", [2.0])
+
+    def test_numpy(self):
+        numpy = pytest.importorskip("numpy")
+
+        class KeyringNumpy(varvault.Keyring):
+            key_matrix = varvault.Key("key_matrix", valid_type=numpy.ndarray)
+
+        matrix = numpy.arange(12, dtype=numpy.float32).reshape(3, 4)
+        vault = varvault.create(keyring=KeyringNumpy, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        vault.insert(KeyringNumpy.key_matrix, matrix)
+        loaded = varvault.create(keyring=KeyringNumpy, resource=varvault.JsonResource(vault_file_new, mode="r")).get(KeyringNumpy.key_matrix)
+        assert loaded.dtype == matrix.dtype and (loaded == matrix).all()
+        assert not loaded.flags.writeable, "The array refers to the memory-mapped file rather than a copy of it"
@@ -0,0 +1,134 @@
+import json
+import tempfile
+import time
+
+from commons import *
+
+vault_file_new = f"{DIR}/new-vault.json"
+
+
+class TestChangeDetection:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        try:
+            os.remove(vault_file_new)
+        except:
+            pass
+
+    def write(self, content: str, mtime_ns: int = None):
+        with open(vault_file_new, "w") as f:
+            f.write(content)
+        if mtime_ns is not None:
+            os.utime(vault_file_new, ns=(mtime_ns, mtime_ns))
+
+    def test_md5(self):
+        detector = varvault.Md5ChangeDetector()
+        self.write('{"a": 1}')
+        state = detector.state(vault_file_new)
+        assert detector.state(vault_file_new) == state
+        self.write('{"a": 2}')
+        assert detector.state(vault_file_new) != state
+
+    def test_stat(self):
+        detector = varvault.StatChangeDetector()
+        self.write('{"a": 1}', mtime_ns=1_000_000_000)
+        state = detector.state(vault_file_new)
+        assert detector.state(vault_file_new) == state
+        self.write('{"a": 22}', mtime_ns=1_000_000_000)
+        assert detector.state(vault_file_new) != state
+
+    def test_tiered_does_not_hash_when_stat_is_conclusive(self):
+        detector = varvault.TieredChangeDetector()
+        old = time.time_ns() - 10 * 1_000_000_000
+        self.write('{"a": 1}', mtime_ns=old)
+        state = detector.state(vault_file_new)
+        assert detector.hashes == 1, "The first check must hash the file"
+
+        # Nothing has changed and the file was modified well before the last check, so the stat is enough
+        for _ in range(10):
+            assert detector.state(vault_file_new) == state
+        assert detector.hashes == 1
+
+        # The size has changed, so the file has changed and there is no need to hash it
+        self.write('{"a": 100}', mtime_ns=old + 1)
+        changed = detector.state(vault_file_new)
+        assert changed != state
+        assert detector.hashes == 1
+
+    def test_tiered_hashes_when_stat_is_ambiguous(self):
+        detector = varvault.TieredChangeDetector()
+        old = time.time_ns() - 10 * 1_000_000_000
+        self.write('{"a": 1}', mtime_ns=old)
+        state = detector.state(vault_file_new)
+
+        # Same size, same content, different mtime; hash the file and find that nothing has changed
+        self.write('{"a": 1}', mtime_ns=old + 1)
+        assert detector.state(vault_file_new) == state
+        assert detector.hashes == 2
+
+        # Same size, different content
+        self.write('{"a": 2}', mtime_ns=old + 2)
+        assert detector.state(vault_file_new) != state
+        assert detector.hashes == 3
+
+    def test_tiered_hashes_recently_modified_files(self):
+        detector = varvault.TieredChangeDetector(timestamp_granularity=60)
+        self.write('{"a": 1}')
+        state = detector.state(vault_file_new)
+        mtime_ns = os.stat(vault_file_new).st_mtime_ns
+
+        # A modification with the same size and the same mtime; the stat is identical, but the file was modified recently so it must be hashed
+        self.write('{"a": 2}', mtime_ns=mtime_ns)
+        assert detector.state(vault_file_new) != state
+        assert detector.hashes == 2
+
+    def test_json_resource_uses_change_detector(self):
+        detector = varvault.Md5ChangeDetector()
+        resource = varvault.JsonResource(vault_file_new, mode="w+", change_detector=detector)
+        assert resource.change_detector is detector
+        resource.create()
+        assert resource.state == detector.state(vault_file_new)
+
+        resource = varvault.JsonResource(vault_file_new, mode="w+")
+        assert isinstance(resource.change_detector, varvault.TieredChangeDetector)
+        resource.create()
+        resource.update_state()
+        assert not resource.resource_has_changed()
+        json.dump({Keyring.key_valid_type_is_str: "valid"}, open(vault_file_new, "w"))
+        assert resource.resource_has_changed()
+
+    def test_tiered_granularity_is_told_by_the_modification_time(self):
+        detector = varvault.TieredChangeDetector()
+        # A modification time with nanoseconds in it comes from a filesystem that only needs the clock tick to have passed
+        self.write('{"a": 1}', mtime_ns=time.time_ns() - 500_000_001)
+        state = detector.state(vault_file_new)
+        assert detector.state(vault_file_new) == state
+        assert detector.hashes == 1
+
+        # A modification time of whole seconds could come from a filesystem that stores nothing finer, so a file modified within the second is hashed again
+        self.write('{"a": 22}', mtime_ns=time.time_ns() // 1_000_000_000 * 1_000_000_000)
+        changed = detector.state(vault_file_new)
+        assert changed != state
+        assert detector.state(vault_file_new) == changed
+        assert detector.hashes == 3
+
+    def test_json_resource_hashes_what_it_writes(self):
+        detector = varvault.TieredChangeDetector(timestamp_granularity=60)
+        resource = varvault.JsonResource(vault_file_new, mode="w", change_detector=detector)
+        vault = varvault.create(keyring=Keyring, resource=resource)
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        assert detector.hashes == 0, "The check after each write should rely on the digest of what was written"
+
+        # Checks after that still hash the file, since it was modified recently, and notice a change that keeps the stat
+        assert not resource.resource_has_changed()
+        assert detector.hashes == 1
+        st = os.stat(vault_file_new)
+        content = open(vault_file_new).read()
+        self.write(content.replace("valid", "VALID"), mtime_ns=st.st_mtime_ns)
+        assert os.stat(vault_file_new).st_ino == st.st_ino
+        assert resource.resource_has_changed()
@@ -0,0 +1,67 @@
+import json
+import tempfile
+
+import pytest
+
+from commons import *
+from varvault.codec import HEADER_PREFIX, CODECS, header
+
+vault_file_new = f"{DIR}/new-vault.json"
+
+
+class TestCodec:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        try:
+            os.remove(vault_file_new)
+        except:
+            pass
+
+    def write_vault(self, codec) -> varvault.VarVault:
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w", codec=codec))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        return vault
+
+    @pytest.mark.parametrize("codec", sorted(CODECS))
+    def test_round_trip(self, codec):
+        self.write_vault(codec)
+        raw = open(vault_file_new, "rb").read()
+        if varvault.get_codec(codec).json:
+            assert not raw.startswith(HEADER_PREFIX), "JSON should be written without a header"
+            assert json.loads(raw) == {Keyring.key_valid_type_is_str: "valid", Keyring.key_valid_type_is_int: 1}
+        else:
+            assert header(raw) == codec
+
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r", codec=codec))
+        assert vault.get(Keyring.key_valid_type_is_str) == "valid"
+        assert vault.get(Keyring.key_valid_type_is_int) == 1
+
+    def test_compact_json(self):
+        self.write_vault("json-compact")
+        assert open(vault_file_new).read() == json.dumps({Keyring.key_valid_type_is_str: "valid", Keyring.key_valid_type_is_int: 1}, separators=(",", ":"))
+
+    def test_header_decides_how_to_read(self):
+        self.write_vault("marshal")
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r"))
+        assert vault.get(Keyring.key_valid_type_is_int) == 1, "A file with a header should be read with the codec in the header"
+
+    def test_pickle_is_only_read_when_trusted(self):
+        self.write_vault("pickle")
+        with pytest.raises(varvault.ResourceNotFoundError) as e:
+            varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r"))
+        assert "not safe to read" in str(e.value.__cause__)
+
+    def test_codec_decides_what_is_writable(self):
+        resource = varvault.JsonResource(vault_file_new, mode="w", codec="pickle")
+        assert resource.writable({"key": {1, 2, 3}}), "A set can be pickled"
+        assert not varvault.JsonResource(vault_file_new, mode="w").writable({"key": {1, 2, 3}}), "A set can't be written as JSON"
+        assert not varvault.JsonResource(vault_file_new, mode="w", codec="marshal").writable({"key": varvault.MiniVault()}), "marshal only handles plain builtins"
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError):
+            varvault.JsonResource(vault_file_new, mode="w", codec="yaml")
@@ -0,0 +1,77 @@
+import io
+import json
+import tempfile
+
+import pytest
+
+from commons import *
+from varvault.compression import COMPRESSIONS, detect, read_file
+
+vault_file_new = f"{DIR}/new-vault.json"
+
+
+class TestCompression:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        try:
+            os.remove(vault_file_new)
+        except:
+            pass
+
+    @pytest.mark.parametrize("compression", sorted(COMPRESSIONS))
+    def test_round_trip(self, compression):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w", compression=compression))
+        # Long and repetitive, so that it's compressed through several chunks
+        value = "valid " * 100_000
+        vault.insert(Keyring.key_valid_type_is_str, value)
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+
+        assert detect(open(vault_file_new, "rb").read(8)) is COMPRESSIONS[compression]
+        assert os.path.getsize(vault_file_new) < len(value) // 10
+        assert json.loads(read_file(vault_file_new)) == {Keyring.key_valid_type_is_str: value, Keyring.key_valid_type_is_int: 1}
+
+        # Compression is detected when the file is read, so the resource that reads it doesn't have to know about it
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r"))
+        assert vault.get(Keyring.key_valid_type_is_str) == value
+        assert vault.get(Keyring.key_valid_type_is_int) == 1
+
+    def test_compression_with_codec(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w", codec="marshal", compression="lzma", compression_level=1))
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r"))
+        assert vault.get(Keyring.key_valid_type_is_int) == 1
+
+    def test_compressed_file_is_parsed_as_it_is_decompressed(self, monkeypatch):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w", compression="gzip"))
+        value = "valid " * 100_000
+        vault.insert(Keyring.key_valid_type_is_str, value)
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+
+        # Reading the file in full would hold the uncompressed file in memory, even though it's far below the stream threshold
+        monkeypatch.setattr(varvault, "read_file", lambda path: pytest.fail(f"{path} was read in full"))
+        resource = varvault.JsonResource(vault_file_new, mode="r", shared=False)
+        assert resource.streams()
+        assert resource.read() == {Keyring.key_valid_type_is_str: value, Keyring.key_valid_type_is_int: 1}
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r", shared=False))
+        assert vault.get(Keyring.key_valid_type_is_str) == value
+
+    def test_uncompressed_file_is_read_as_is(self):
+        json.dump({Keyring.key_valid_type_is_int: 1}, open(vault_file_new, "w"))
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r", compression="gzip"))
+        assert vault.get(Keyring.key_valid_type_is_int) == 1
+
+    def test_live_update(self):
+        vault_new = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w+", compression="gzip"))
+        vault_from = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r+", shared=False))
+        vault_new.insert(Keyring.key_valid_type_is_int, 1)
+        assert vault_from.get(Keyring.key_valid_type_is_int) == 1
+        vault_new.insert(Keyring.key_valid_type_is_int, 2, varvault.Flags.permit_modifications)
+        assert vault_from.get(Keyring.key_valid_type_is_int) == 2
+
+    def test_unknown_compression(self):
+        with pytest.raises(ValueError):
+            varvault.JsonResource(vault_file_new, mode="w", compression="zstd")
@@ -0,0 +1,132 @@
+import time
+import shutil
+import tempfile
+import threading
+
+import pytest
+
+from commons import *
+
+vault_dir_new = f"{DIR}/new-vault.dir"
+
+
+class TestDirectoryResource:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        shutil.rmtree(vault_dir_new, ignore_errors=True)
+
+    def mtimes(self):
+        return {name: os.stat(os.path.join(vault_dir_new, name)).st_mtime_ns for name in os.listdir(vault_dir_new)}
+
+    def test_write_and_read(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        assert sorted(os.listdir(vault_dir_new)) == [f"{Keyring.key_valid_type_is_int}.json", f"{Keyring.key_valid_type_is_str}.json"]
+
+        for workers in (None, 1):
+            vault_from = varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="r", workers=workers))
+            assert vault_from.get(Keyring.key_valid_type_is_str) == "valid"
+            assert vault_from.get(Keyring.key_valid_type_is_int) == 1
+
+    def test_only_changed_keys_are_written(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        before = self.mtimes()
+        time.sleep(0.01)
+        vault.insert(Keyring.key_valid_type_is_int, 2, varvault.Flags.permit_modifications)
+        after = self.mtimes()
+        assert after[f"{Keyring.key_valid_type_is_str}.json"] == before[f"{Keyring.key_valid_type_is_str}.json"]
+        assert after[f"{Keyring.key_valid_type_is_int}.json"] != before[f"{Keyring.key_valid_type_is_int}.json"]
+        assert [name for name in os.listdir(vault_dir_new) if name.startswith(".")] == [], "Temporary files should be renamed into place"
+
+        # A full write leaves files whose content hasn't changed alone as well
+        vault.resource.write(dict(vault.items()))
+        assert self.mtimes() == after
+
+    def test_remove_key(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        vault.resource.write_delta({}, [Keyring.key_valid_type_is_str])
+        assert os.listdir(vault_dir_new) == [f"{Keyring.key_valid_type_is_int}.json"]
+
+    def test_new_vault_replaces_existing(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="w"))
+        assert os.listdir(vault_dir_new) == []
+
+        vault = varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="a"))
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        vault = varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="a"))
+        assert vault.get(Keyring.key_valid_type_is_int) == 1
+
+    def test_keys_are_valid_filenames(self):
+        resource = varvault.DirectoryResource(vault_dir_new, mode="w", codec="marshal")
+        values = {"a/b": 1, "..": 2, ".hidden": 3, "with.dots": 4, "åäö": 5}
+        resource.write(values)
+        assert all(not name.startswith(".") and "/" not in name for name in os.listdir(vault_dir_new))
+        # The codec is part of the name of each file, so a resource with another codec reads it too
+        assert varvault.DirectoryResource(vault_dir_new, mode="r").read() == dict(sorted(values.items(), key=lambda item: resource.filename(item[0])))
+        assert varvault.DirectoryResource(vault_dir_new, mode="r").read_keys(["..", "missing"]) == {"..": 2}
+
+    def test_unwanted_keys_are_not_read(self):
+        resource = varvault.DirectoryResource(vault_dir_new, mode="w")
+        resource.write({Keyring.key_valid_type_is_int: 1, "not-in-keyring": 2})
+
+        resource = varvault.DirectoryResource(vault_dir_new, mode="r")
+        read = list()
+        read_file = resource._read_file
+        resource._read_file = lambda filename: read.append(filename) or read_file(filename)
+        assert resource.create_mv(**Keyring.get_keys()) == {Keyring.key_valid_type_is_int: 1}
+        assert read == [f"{Keyring.key_valid_type_is_int}.json"]
+
+    def test_live_update(self):
+        vault_new = varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="w+"))
+        vault_from = varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="r+"))
+        vault_new.insert(Keyring.key_valid_type_is_int, 1)
+        assert vault_from.get(Keyring.key_valid_type_is_int) == 1
+        vault_new.insert(Keyring.key_valid_type_is_int, 2, varvault.Flags.permit_modifications)
+        assert vault_from.get(Keyring.key_valid_type_is_int) == 2
+        state = vault_from.resource.state
+        assert vault_from.resource.state == state, "The state only changes when the directory does"
+
+    def test_changes_made_in_place_are_written(self):
+        class KeyringDict(varvault.Keyring):
+            key_dict = varvault.Key("key_dict", valid_type=dict)
+
+        vault = varvault.create(keyring=KeyringDict, resource=varvault.DirectoryResource(vault_dir_new, mode="w"), key_int=Keyring.key_valid_type_is_int)
+        vault.insert(KeyringDict.key_dict, {"x": 1})
+        vault.get(KeyringDict.key_dict)["x"] = 2
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        assert varvault.DirectoryResource(vault_dir_new, mode="r").read_key(KeyringDict.key_dict) == {"x": 2}
+
+        # A full write compares what's in the files with the values as they are now
+        vault.get(KeyringDict.key_dict)["x"] = 3
+        vault.resource.write(dict(vault.items()))
+        assert varvault.DirectoryResource(vault_dir_new, mode="r").read_key(KeyringDict.key_dict) == {"x": 3}
+
+    @pytest.mark.parametrize("use_inotify", [True, False])
+    def test_watcher(self, use_inotify):
+        vault = varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="w+"))
+        arrived = threading.Event()
+
+        @vault.automatic(input=Keyring.key_valid_type_is_int)
+        def _arrived(key_valid_type_is_int=varvault.AssignedByVault):
+            arrived.set()
+
+        watcher = vault.watch(interval=0.05, use_inotify=use_inotify)
+        try:
+            assert (watcher.inotify is not None) == (use_inotify and varvault.watcher.Inotify.available())
+            # Let the watcher catch up with the directory first, so that only watching it can find the change. The files are inside the directory.
+            time.sleep(0.2)
+            varvault.create(keyring=Keyring, resource=varvault.DirectoryResource(vault_dir_new, mode="a")).insert(Keyring.key_valid_type_is_int, 1)
+            assert arrived.wait(5), "The watcher never refreshed the vault"
+        finally:
+            vault.stop_watching()
@@ -0,0 +1,103 @@
+import json
+import tempfile
+
+from commons import *
+
+vault_file_new = f"{DIR}/new-vault.json"
+
+
+class KeyringHooks(varvault.Keyring):
+    trigger = varvault.Key("trigger", valid_type=str)
+    result = varvault.Key("result", valid_type=str)
+
+
+class TestHooks:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        try:
+            os.remove(vault_file_new)
+        except:
+            pass
+
+    def test_no_callbacks(self):
+        vault = varvault.create(keyring=KeyringHooks, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        assert not vault.hooks
+        for hook in varvault.Hooks:
+            assert hook not in vault.hooks
+        vault.insert(KeyringHooks.trigger, "go")
+
+    def test_call_events(self):
+        vault = varvault.create(keyring=KeyringHooks, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        events = list()
+        for hook in varvault.Hooks:
+            vault.hooks.register(hook, events.append)
+
+        @vault.manual(input=KeyringHooks.trigger, output=KeyringHooks.result)
+        def _func(trigger=varvault.AssignedByVault):
+            return trigger + "-done"
+
+        vault.insert(KeyringHooks.trigger, "go")
+        events.clear()
+        _func()
+
+        hooks = [event.hook for event in events]
+        assert hooks == [varvault.Hooks.lock_wait, varvault.Hooks.get, varvault.Hooks.pre_call,
+                         varvault.Hooks.lock_wait, varvault.Hooks.write, varvault.Hooks.insert, varvault.Hooks.post_call,
+                         varvault.Hooks.call], hooks
+        _, get, pre_call, _, write, insert, post_call, call = events
+        assert get.keys == (KeyringHooks.trigger,)
+        assert call.keys == (KeyringHooks.trigger, KeyringHooks.result)
+        assert call.extra == {"failed": False}
+        assert call.start <= pre_call.start and call.duration >= pre_call.duration + post_call.duration
+        assert pre_call.name == post_call.name == f"{_func.__module__}._func"
+        assert pre_call.keys == (KeyringHooks.trigger,)
+        assert post_call.keys == (KeyringHooks.result,)
+        assert insert.keys == (KeyringHooks.result,)
+        assert set(write.keys) == {KeyringHooks.trigger, KeyringHooks.result}
+        assert write.bytes == os.path.getsize(vault_file_new)
+        assert all(event.duration >= 0 for event in events)
+        assert post_call.start + post_call.duration >= insert.start + insert.duration
+
+    def test_dispatch_event(self):
+        vault = varvault.create(keyring=KeyringHooks, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        events = list()
+
+        @vault.hooks.on(varvault.Hooks.dispatch)
+        def on_dispatch(event: varvault.HookEvent):
+            events.append(event)
+
+        @vault.automatic(input=KeyringHooks.trigger, output=KeyringHooks.result)
+        def _auto(trigger=varvault.AssignedByVault):
+            return trigger
+
+        vault.insert(KeyringHooks.trigger, "go")
+        assert len(events) == 1
+        assert events[0].name == f"{_auto.__module__}._auto"
+        assert events[0].keys == (KeyringHooks.trigger,)
+        assert events[0].extra == {"threaded": False, "failed": False}
+
+        vault.hooks.unregister(varvault.Hooks.dispatch, on_dispatch)
+        assert varvault.Hooks.dispatch not in vault.hooks
+
+    def test_reload_event(self):
+        vault = varvault.create(keyring=KeyringHooks, resource=varvault.JsonResource(vault_file_new, mode="w+"))
+        events = list()
+        vault.hooks.register(varvault.Hooks.reload, events.append)
+        json.dump({KeyringHooks.trigger: "go"}, open(vault_file_new, "w"))
+        assert vault.get(KeyringHooks.trigger) == "go"
+        assert len(events) == 1
+        assert events[0].keys == (KeyringHooks.trigger,)
+        assert events[0].bytes == os.path.getsize(vault_file_new)
+
+    def test_failing_callback_does_not_break_vault(self):
+        vault = varvault.create(keyring=KeyringHooks, resource=varvault.JsonResource(vault_file_new, mode="w"))
+
+        def fail(event):
+            raise RuntimeError("callback failed")
+        vault.hooks.register(varvault.Hooks.insert, fail)
+        vault.insert(KeyringHooks.trigger, "go")
+        assert vault.get(KeyringHooks.trigger) == "go"
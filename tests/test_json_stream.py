@@ -0,0 +1,111 @@
+import io
+import json
+import tempfile
+
+import pytest
+
+from commons import *
+from varvault.json_stream import iter_object
+
+vault_file_new = f"{DIR}/new-vault.json"
+
+DOCUMENT = {
+    "str": "a \"quoted\" string with {braces}, [brackets] and a backslash \\",
+    "escaped": "\\\"",
+    "unicode": "åäö ☃ \U0001F600",
+    "int": -12,
+    "float": 1.5e-3,
+    "true": True,
+    "null": None,
+    "list": [1, [2, {"a": "]"}], []],
+    "dict": {"nested": {"deeper": ["}", "{"]}, "empty": {}},
+    "key with \"quotes\"": 1,
+}
+
+
+class TestJsonStream:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        try:
+            os.remove(vault_file_new)
+        except:
+            pass
+
+    @pytest.mark.parametrize("indent", [None, 2])
+    @pytest.mark.parametrize("chunk_size", [1, 3, 1 << 16])
+    def test_iter_object(self, indent, chunk_size):
+        text = json.dumps(DOCUMENT, indent=indent, ensure_ascii=False)
+        assert dict(iter_object(io.StringIO(text), chunk_size=chunk_size)) == DOCUMENT
+        # Multibyte characters may be split between chunks of a binary stream
+        assert dict(iter_object(io.BytesIO(text.encode()), chunk_size=chunk_size)) == DOCUMENT
+
+    def test_iter_object_empty(self):
+        assert list(iter_object(io.StringIO(" { } "))) == []
+
+    def test_iter_object_skips_values_without_decoding(self):
+        text = json.dumps(DOCUMENT)[:-1] + ', "invalid": [1, 2 3, {"a" "b"}]}'
+        items = list(iter_object(io.StringIO(text), wanted=lambda key: key in ("int", "list"), chunk_size=4))
+        assert items == [("int", -12), ("list", DOCUMENT["list"])]
+        # Values that are skipped aren't decoded, so they aren't checked either
+        with pytest.raises(ValueError):
+            dict(iter_object(io.StringIO(text)))
+
+    def test_iter_object_large_value(self):
+        value = {"list": list(range(100_000)), "str": "x" * 100_000}
+        assert dict(iter_object(io.StringIO(json.dumps({"a": 1, "large": value, "b": 2})), chunk_size=16)) == {"a": 1, "large": value, "b": 2}
+
+    @pytest.mark.parametrize("text", ["", "[1, 2]", '{"a": 1', '{"a" 1}', '{"a": 1 "b": 2}', '{"a": "1}', "{1: 2}"])
+    def test_iter_object_invalid(self, text):
+        with pytest.raises(ValueError):
+            dict(iter_object(io.StringIO(text)))
+
+    @pytest.mark.parametrize("compression", [None, "gzip"])
+    def test_create_mv_streams(self, compression):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w", compression=compression))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+
+        resource = varvault.JsonResource(vault_file_new, mode="r", stream_threshold=0)
+        assert resource.streams()
+        mv = resource.create_mv(**{Keyring.key_valid_type_is_int: Keyring.key_valid_type_is_int})
+        assert mv == {Keyring.key_valid_type_is_int: 1}
+        assert not resource.resource_has_changed()
+
+    def test_create_mv_with_codec_header(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w", codec="marshal"))
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        mv = varvault.JsonResource(vault_file_new, mode="r", stream_threshold=0).create_mv(**Keyring.get_keys())
+        assert mv == {Keyring.key_valid_type_is_int: 1}
+
+    @pytest.mark.parametrize("stream_threshold", [0, varvault.STREAM_THRESHOLD])
+    def test_read_items_releases_lock(self, stream_threshold):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+
+        resource = varvault.JsonResource(vault_file_new, mode="r", stream_threshold=stream_threshold)
+        def wanted(key):
+            # The file is read once the lock is released, one value at a time
+            assert not resource.lock.locked()
+            return True
+
+        items = list()
+        for key, value in resource.read_items(wanted):
+            # The items are yielded once the lock is released, so that a slow caller doesn't block other resources for the file
+            assert not resource.lock.locked()
+            items.append((key, value))
+        assert items == [(Keyring.key_valid_type_is_str, "valid"), (Keyring.key_valid_type_is_int, 1)]
+
+    def test_read_items_reads_the_file_it_opened(self):
+        json.dump({Keyring.key_valid_type_is_str: "valid", Keyring.key_valid_type_is_int: 1}, open(vault_file_new, "w"))
+        resource = varvault.JsonResource(vault_file_new, mode="r", stream_threshold=0)
+        items = resource.read_items()
+        first = next(items)
+        # The file is replaced the way a resource writes it while it's being read; the items still come from the file that was opened
+        json.dump({"other": 2}, open(vault_file_new + ".tmp", "w"))
+        os.replace(vault_file_new + ".tmp", vault_file_new)
+        assert [first] + list(items) == [(Keyring.key_valid_type_is_str, "valid"), (Keyring.key_valid_type_is_int, 1)]
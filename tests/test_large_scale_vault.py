@@ -1,5 +1,8 @@
 import json
 import time
+import concurrent.futures
+
+import pytest
 
 from commons import *
 
@@ -362,3 +365,199 @@ class TestLargeScaleVault:
         def _get(**kwargs):
             assert len([k for k in keys if k in kwargs]) == len(keys)
         _get()
+
+    def test_lazy_load(self):
+        built = list()
+        create = GroupInstallers.create.__func__
+
+        def _create(cls, vault_key, vault_value):
+            built.append(vault_key)
+            return create(cls, vault_key, vault_value)
+        GroupInstallers.create = classmethod(_create)
+        try:
+            vault = varvault.create(varvault.Flags.lazy_load, keyring=KeyringLargeScale, resource=varvault.JsonResource(large_vault_file, mode="r"))
+            assert built == [], "Nothing should be built until it's accessed"
+            assert KeyringLargeScale.group_installers in vault.lazy_keys
+
+            group_installers = vault.get(KeyringLargeScale.group_installers)
+            assert isinstance(group_installers, GroupInstallers)
+            assert built == [KeyringLargeScale.group_installers]
+            assert vault.get(KeyringLargeScale.group_installers) is group_installers, "A value should only be built once"
+            assert KeyringLargeScale.group_installers not in vault.lazy_keys
+
+            eager = varvault.create(keyring=KeyringLargeScale, resource=varvault.JsonResource(large_vault_file, mode="r"))
+            assert dict(vault.items()) == dict(eager.items()), "Iterating the items of a lazy vault should build all values"
+            assert not vault.lazy_keys
+        finally:
+            GroupInstallers.create = classmethod(create)
+
+    def test_lazy_load_dict_paths_build_values(self):
+        eager = varvault.create(keyring=KeyringLargeScale, resource=varvault.JsonResource(large_vault_file, mode="r"))
+        expected = dict(eager.items())
+        lazy = lambda: varvault.create(varvault.Flags.lazy_load, keyring=KeyringLargeScale, resource=varvault.JsonResource(large_vault_file, mode="r"))
+        is_built = lambda values: not any(isinstance(value, varvault.resource.LazyValue) for value in values)
+
+        assert dict(lazy()) == expected and is_built(dict(lazy()).values())
+        assert list(lazy().keys()) == list(expected)
+        assert {**lazy()} == expected
+        assert lazy().copy() == expected and is_built(lazy().copy().values())
+        assert lazy() | {} == expected and is_built((lazy() | {}).values())
+        assert {} | lazy() == expected
+        assert lazy() == expected and lazy() == eager and not lazy() != eager
+        assert "LazyValue" not in str(lazy()) and "LazyValue" not in repr(lazy())
+        assert json.loads(json.dumps(lazy())) == json.loads(json.dumps(eager))
+
+        vault = lazy()
+        assert is_built([vault.pop(KeyringLargeScale.logname)])
+        assert KeyringLargeScale.logname not in vault.lazy_keys
+        assert is_built([vault.setdefault(KeyringLargeScale.group_installers)])
+        assert is_built(vault.popitem())
+
+    def test_lazy_load_writes_raw_values(self):
+        contents = json.load(open(large_vault_file))
+        json.dump(contents, open(vault_file_new, "w"))
+        vault = varvault.create(varvault.Flags.lazy_load, keyring=KeyringLargeScale, resource=varvault.JsonResource(vault_file_new, mode="a"))
+        vault.insert(KeyringLargeScale.logname, "modified", varvault.Flags.permit_modifications)
+        assert vault.lazy_keys, "Inserting a key should not build the other values"
+        contents[KeyringLargeScale.logname] = "modified"
+        assert json.load(open(vault_file_new)) == contents
+
+    def test_lazy_load_fails_on_access(self):
+        contents = json.load(open(large_vault_file))
+        contents[KeyringLargeScale.start_time] = "not a float"
+        json.dump(contents, open(vault_file_new, "w"))
+        vault = varvault.create(varvault.Flags.lazy_load, keyring=KeyringLargeScale, resource=varvault.JsonResource(vault_file_new, mode="r"))
+        assert vault.get(KeyringLargeScale.logname)
+        try:
+            vault.get(KeyringLargeScale.start_time)
+            assert False, "Accessing a value that isn't valid for its key should fail"
+        except AssertionError as e:
+            assert "Key type missmatch" in str(e)
+
+    def test_parallel_load(self, monkeypatch):
+        monkeypatch.setattr(varvault.parallel, "MIN_BYTES", 0)
+        monkeypatch.setattr(varvault.parallel, "MIN_VALUES", 1)
+        monkeypatch.setattr(os, "cpu_count", lambda: 2)
+        eager = varvault.create(keyring=KeyringLargeScale, resource=varvault.JsonResource(large_vault_file, mode="r"))
+        vault = varvault.create(varvault.Flags.parallel_load, keyring=KeyringLargeScale, resource=varvault.JsonResource(large_vault_file, mode="r"))
+        assert vault.load_stats.parallel
+        assert list(dict(vault.items())) == list(dict(eager.items())), "The vault should keep the order of the resource"
+        assert dict(vault.items()) == dict(eager.items())
+        group_installers = vault.get(KeyringLargeScale.group_installers)
+        assert isinstance(group_installers, GroupInstallers)
+        assert all(isinstance(group, GroupInstallers.Group) for group in group_installers.values())
+
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            mv, stats = varvault.JsonResource(large_vault_file, mode="r").load(KeyringLargeScale.get_keys(), parallel=executor, workers=2)
+        assert stats.parallel
+        assert mv == dict(eager.items())
+
+    def test_parallel_load_heuristic(self):
+        # The resource is too small for building in parallel to pay off
+        vault = varvault.create(varvault.Flags.parallel_load, keyring=KeyringLargeScale, resource=varvault.JsonResource(large_vault_file, mode="r"))
+        assert not vault.load_stats.parallel
+        assert isinstance(vault.get(KeyringLargeScale.group_installers), GroupInstallers)
+
+    def test_parallel_load_errors(self, monkeypatch):
+        monkeypatch.setattr(varvault.parallel, "MIN_BYTES", 0)
+        monkeypatch.setattr(varvault.parallel, "MIN_VALUES", 1)
+        contents = json.load(open(large_vault_file))
+        contents[KeyringLargeScale.group_installers] = 1
+        contents[KeyringLargeScale.result] = "not a dict"
+        json.dump(contents, open(vault_file_new, "w"))
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            with pytest.raises(varvault.LoadError) as e:
+                varvault.JsonResource(vault_file_new, mode="r").load(KeyringLargeScale.get_keys(), parallel=executor, workers=2)
+        # All errors are reported, in the order of the resource
+        assert list(e.value.errors) == [KeyringLargeScale.group_installers, KeyringLargeScale.result]
+        assert e.value.__cause__ is e.value.errors[KeyringLargeScale.group_installers]
+
+    def test_parallel_load_errors_built_serially(self):
+        # The resource is too small to build in parallel, so the values are built one after the other, but the errors are reported the same way
+        contents = json.load(open(large_vault_file))
+        contents[KeyringLargeScale.group_installers] = 1
+        contents[KeyringLargeScale.result] = "not a dict"
+        json.dump(contents, open(vault_file_new, "w"))
+        with pytest.raises(varvault.LoadError) as e:
+            varvault.JsonResource(vault_file_new, mode="r").load(KeyringLargeScale.get_keys(), parallel="process")
+        assert list(e.value.errors) == [KeyringLargeScale.group_installers, KeyringLargeScale.result]
+        assert e.value.__cause__ is e.value.errors[KeyringLargeScale.group_installers]
+
+    def test_parallel_workers(self, monkeypatch):
+        monkeypatch.setattr(os, "cpu_count", lambda: 4)
+        assert varvault.parallel.workers("process") == 4
+        assert varvault.parallel.workers("process", 2) == 2
+        assert varvault.parallel.workers("thread", 2) == 2
+        # Threads don't build in parallel with the GIL
+        monkeypatch.setattr(varvault.parallel, "_gil_enabled", lambda: True)
+        assert varvault.parallel.workers("thread") == 1
+        monkeypatch.setattr(varvault.parallel, "_gil_enabled", lambda: False)
+        assert varvault.parallel.workers("thread") == 4
+
+    def test_warm_start(self):
+        contents = json.load(open(large_vault_file))
+        json.dump(contents, open(vault_file_new, "w"))
+        cache = varvault.WarmStartCache(vault_file_new)
+        cache.remove()
+
+        vault = varvault.create(keyring=KeyringLargeScale, resource=varvault.JsonResource(vault_file_new, mode="r", warm_start=True))
+        assert not vault.load_stats.warm_start
+        assert os.path.exists(cache.path)
+
+        built = list()
+        create = GroupInstallers.create.__func__
+
+        def _create(cls, vault_key, vault_value):
+            built.append(vault_key)
+            return create(cls, vault_key, vault_value)
+        GroupInstallers.create = classmethod(_create)
+        try:
+            warm = varvault.create(keyring=KeyringLargeScale, resource=varvault.JsonResource(vault_file_new, mode="r", warm_start=True))
+            assert warm.load_stats.warm_start
+            assert built == [], "The values should be loaded from the cache rather than built"
+            assert dict(warm.items()) == dict(vault.items())
+            assert isinstance(warm.get(KeyringLargeScale.group_installers), GroupInstallers)
+
+            # The cache is built for a keyring, so a vault with other keys doesn't use it
+            extra = varvault.Key("extra", valid_type=str)
+            other = varvault.create(keyring=KeyringLargeScale, resource=varvault.JsonResource(vault_file_new, mode="r", warm_start=True), extra=extra)
+            assert not other.load_stats.warm_start
+            assert built == [KeyringLargeScale.group_installers]
+
+            # The cache is built for the content of the file, so it's not used once the file has changed
+            contents[KeyringLargeScale.logname] = "modified"
+            json.dump(contents, open(vault_file_new, "w"))
+            changed = varvault.create(keyring=KeyringLargeScale, resource=varvault.JsonResource(vault_file_new, mode="r", warm_start=True))
+            assert not changed.load_stats.warm_start
+            assert changed.get(KeyringLargeScale.logname) == "modified"
+
+            # A cache that can't be read is ignored
+            open(cache.path, "wb").write(b"not a pickle")
+            broken = varvault.create(keyring=KeyringLargeScale, resource=varvault.JsonResource(vault_file_new, mode="r", warm_start=True))
+            assert not broken.load_stats.warm_start
+            assert broken.get(KeyringLargeScale.logname) == "modified"
+        finally:
+            GroupInstallers.create = classmethod(create)
+            cache.remove()
+
+    def test_warm_start_hashes_file_once(self, monkeypatch):
+        json.dump(json.load(open(large_vault_file)), open(vault_file_new, "w"))
+        cache = varvault.WarmStartCache(vault_file_new)
+        cache.remove()
+        digests = list()
+        digest = varvault.resource.digest
+        monkeypatch.setattr(varvault.resource, "digest", lambda path: digests.append(path) or digest(path))
+        try:
+            # A miss hashes the file once and stores what was loaded under that digest
+            vault = varvault.create(keyring=KeyringLargeScale, resource=varvault.JsonResource(vault_file_new, mode="r", warm_start=True))
+            assert not vault.load_stats.warm_start
+            assert len(digests) == 1
+
+            # A hit hashes the file once and never reads it
+            monkeypatch.setattr(varvault.JsonResource, "read_items", lambda *args, **kwargs: pytest.fail("The file should not be read"))
+            warm = varvault.create(keyring=KeyringLargeScale, resource=varvault.JsonResource(vault_file_new, mode="r", warm_start=True))
+            assert warm.load_stats.warm_start
+            assert len(digests) == 2
+            assert dict(warm.items()) == dict(vault.items())
+        finally:
+            cache.remove()
@@ -1,3 +1,5 @@
+import gc
+import array
 import json
 import tempfile
 import threading
@@ -119,3 +121,198 @@ class TestLiveUpdate:
         resource.update_state()
 
         assert resource.last_known_state == resource.cached_state
+
+    def test_reload_is_incremental(self):
+        class Struct(varvault.VaultStructDictBase):
+            created = 0
+
+            @classmethod
+            def create(cls, vault_key, vault_value):
+                cls.created += 1
+                return Struct(**vault_value)
+
+        class KeyringStruct(varvault.Keyring):
+            struct = varvault.Key("struct", valid_type=Struct)
+            key_valid_type_is_str = varvault.Key("key_valid_type_is_str", valid_type=str)
+            key_valid_type_is_int = varvault.Key("key_valid_type_is_int", valid_type=int)
+
+        json.dump({KeyringStruct.struct: {"a": 1}, KeyringStruct.key_valid_type_is_str: "valid"}, open(vault_file_new, "w"))
+        vault = varvault.create(keyring=KeyringStruct, resource=varvault.JsonResource(vault_file_new, mode="a+"))
+        struct = vault.get(KeyringStruct.struct)
+        assert Struct.created == 1
+
+        json.dump({KeyringStruct.struct: {"a": 1}, KeyringStruct.key_valid_type_is_str: "changed", KeyringStruct.key_valid_type_is_int: 1}, open(vault_file_new, "w"))
+        stat_before = os.stat(vault_file_new)
+        assert vault.get(KeyringStruct.key_valid_type_is_str) == "changed"
+        assert vault.get(KeyringStruct.key_valid_type_is_int) == 1
+        assert vault.get(KeyringStruct.struct) is struct, "The unchanged struct should not have been created again"
+        assert Struct.created == 1
+        stat_after = os.stat(vault_file_new)
+        assert (stat_before.st_ino, stat_before.st_mtime_ns) == (stat_after.st_ino, stat_after.st_mtime_ns), "The reload should not write back to the file"
+
+        json.dump({KeyringStruct.struct: {"a": 2}, KeyringStruct.key_valid_type_is_str: "changed", KeyringStruct.key_valid_type_is_int: 1}, open(vault_file_new, "w"))
+        assert vault.get(KeyringStruct.struct) == {"a": 2}
+        assert Struct.created == 2
+
+    def test_reload_removes_keys_in_read_only_vault(self):
+        json.dump({Keyring.key_valid_type_is_str: "valid", Keyring.key_valid_type_is_int: 1}, open(vault_file_new, "w"))
+        reader = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r+"))
+        writer = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="a+"))
+        assert reader.get(Keyring.key_valid_type_is_int) == 1
+
+        json.dump({Keyring.key_valid_type_is_str: "valid"}, open(vault_file_new, "w"))
+        assert reader.get(Keyring.key_valid_type_is_str) == "valid"
+        assert Keyring.key_valid_type_is_int not in reader
+        # A vault that can write keeps the key and writes it back to the file the next time it writes
+        assert writer.get(Keyring.key_valid_type_is_str) == "valid"
+        assert Keyring.key_valid_type_is_int in writer
+
+    def test_reload_keeps_keys_set_in_read_only_vault(self):
+        json.dump({Keyring.key_valid_type_is_str: "valid"}, open(vault_file_new, "w"))
+        reader = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r+"))
+        reader.insert(Keyring.key_valid_type_is_int, 1)
+
+        # The key was never in the file, so the file not having it doesn't remove it
+        json.dump({Keyring.key_valid_type_is_str: "changed"}, open(vault_file_new, "w"))
+        assert reader.get(Keyring.key_valid_type_is_str) == "changed"
+        assert reader.get(Keyring.key_valid_type_is_int) == 1
+
+    def _test_watcher(self, use_inotify):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w+"))
+        arrived = threading.Event()
+        values = list()
+
+        @vault.automatic(input=Keyring.key_valid_type_is_str)
+        def _arrived(key_valid_type_is_str=varvault.AssignedByVault):
+            values.append(key_valid_type_is_str)
+            arrived.set()
+
+        watcher = vault.watch(interval=0.05, use_inotify=use_inotify)
+        try:
+            assert (watcher.inotify is not None) == (use_inotify and varvault.watcher.Inotify.available())
+            # Simulate another process writing to the file
+            json.dump({Keyring.key_valid_type_is_str: "from-elsewhere"}, open(vault_file_new + ".tmp", "w"))
+            os.replace(vault_file_new + ".tmp", vault_file_new)
+            assert arrived.wait(5), "The automatic was never dispatched by the watcher"
+            assert values == ["from-elsewhere"]
+            assert dict.__contains__(vault, Keyring.key_valid_type_is_str), "The watcher should have loaded the key into the vault"
+        finally:
+            vault.stop_watching()
+        assert vault.watcher is None
+        assert not watcher.is_alive()
+
+    def test_watcher_inotify(self):
+        self._test_watcher(use_inotify=True)
+
+    def test_watcher_polling(self):
+        self._test_watcher(use_inotify=False)
+
+    def test_refresh_dispatches_automatics(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w+"))
+        values = list()
+
+        @vault.automatic(input=Keyring.key_valid_type_is_int)
+        def _arrived(key_valid_type_is_int=varvault.AssignedByVault):
+            values.append(key_valid_type_is_int)
+
+        json.dump({Keyring.key_valid_type_is_int: 1}, open(vault_file_new, "w"))
+        assert vault.refresh() == [Keyring.key_valid_type_is_int]
+        assert values == [1]
+        assert vault.refresh() == []
+
+        json.dump({Keyring.key_valid_type_is_int: 2}, open(vault_file_new, "w"))
+        assert vault.get(Keyring.key_valid_type_is_int) == 2
+        assert values == [1, 2], "A reload through get should dispatch automatics as well"
+
+    def test_watch_requires_live_update(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        try:
+            vault.watch()
+            assert False, "Watching a vault without live-update should fail"
+        except ValueError:
+            pass
+
+    def test_max_staleness(self):
+        writer = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w+"))
+        writer.insert(Keyring.key_valid_type_is_int, 1)
+        reader = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="r+", max_staleness=60))
+        state_checks = list()
+        reader.hooks.register(varvault.Hooks.state_check, state_checks.append)
+
+        writer.insert(Keyring.key_valid_type_is_int, 2, varvault.Flags.permit_modifications)
+        assert reader.get(Keyring.key_valid_type_is_int) == 1, "The resource was checked within its max_staleness; the value should be stale"
+        assert not state_checks, "The resource should not be checked within its max_staleness"
+
+        assert reader.refresh() == [Keyring.key_valid_type_is_int]
+        assert reader.get(Keyring.key_valid_type_is_int) == 2
+        assert len(state_checks) == 1, "Only the explicit refresh should have checked the resource"
+
+        reader.resource.last_checked -= 60
+        writer.insert(Keyring.key_valid_type_is_int, 3, varvault.Flags.permit_modifications)
+        assert reader.get(Keyring.key_valid_type_is_int) == 3, "The resource should be checked once max_staleness has passed"
+        assert len(state_checks) == 2
+
+    def test_shared_resource(self):
+        relative = os.path.relpath(vault_file_new)
+        resources = [varvault.JsonResource(vault_file_new, mode="w+"), varvault.JsonResource(relative, mode="r+"), varvault.JsonResource(vault_file_new, mode="r+")]
+        shared = resources[0].shared
+        assert shared is not None
+        for resource in resources:
+            assert resource.shared is shared, "Resources for the same file should share their state, regardless of how the path is written"
+            assert resource.lock is shared.lock
+            assert resource.change_detector is shared.change_detector
+        assert varvault.JsonResource(vault_file_new, mode="r+", shared=False).shared is None
+        assert varvault.JsonResource(vault_file_new_secondary, mode="w+").shared is not shared
+
+    def test_shared_resource_reads_once(self):
+        class ListKeyring(varvault.Keyring):
+            key_list = varvault.Key("key_list", valid_type=list)
+
+        writer = varvault.create(keyring=ListKeyring, resource=varvault.JsonResource(vault_file_new, mode="w+"))
+        readers = [varvault.create(keyring=ListKeyring, resource=varvault.JsonResource(vault_file_new, mode="r+")) for _ in range(3)]
+        shared = writer.resource.shared
+        writer.insert(ListKeyring.key_list, [1, 2, 3])
+
+        hits = shared.hits
+        values = [reader.get(ListKeyring.key_list) for reader in readers]
+        assert values == [[1, 2, 3]] * 3
+        assert shared.hits == hits + 2, "Only the first reader should have parsed the file; the others should use the shared snapshot"
+
+        values[0].append(4)
+        assert values[1] == [1, 2, 3], "Every vault should get its own copy of the data read from the file"
+
+        # A change to the file made outside of varvault must be picked up by all readers
+        json.dump({ListKeyring.key_list: [5]}, open(vault_file_new, "w"))
+        assert [reader.get(ListKeyring.key_list) for reader in readers] == [[5]] * 3
+
+    def test_shared_resource_snapshot_keeps_nested_types(self):
+        resources = [varvault.JsonResource(vault_file_new, mode="a", codec="pickle") for _ in range(2)]
+        data = {"nested": {"list": [bytearray(b"a"), (array.array("i", [1]),)]}}
+        resources[0].write(data)
+        # The second read would come from the snapshot of the first, but marshal would read the nested values back as bytes
+        for resource in resources:
+            assert resource.read() == data
+            assert type(resource.read()["nested"]["list"][0]) is bytearray
+        assert resources[0].shared.snapshot is None
+
+    def test_shared_resource_snapshot_needs_two_users(self):
+        # Resources for the file left over from other tests would count as users
+        gc.collect()
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w+"))
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        shared = vault.resource.shared
+        vault.resource.read()
+        assert shared.snapshot is None, "A resource that uses the shared state on its own has no one to share a snapshot with"
+
+        other = varvault.JsonResource(vault_file_new, mode="r+")
+        other.read()
+        assert shared.snapshot is not None
+        hits = shared.hits
+        vault.resource.read()
+        assert shared.hits == hits + 1
+
+        del other
+        gc.collect()
+        vault.insert(Keyring.key_valid_type_is_int, 2, varvault.Flags.permit_modifications)
+        vault.resource.read()
+        assert shared.snapshot is None
@@ -0,0 +1,109 @@
+import json
+import re
+import tempfile
+import urllib.request
+
+import pytest
+
+from commons import *
+
+vault_file_new = f"{DIR}/new-vault.json"
+metrics_file = f"{DIR}/metrics.prom"
+
+
+class KeyringMetrics(varvault.Keyring):
+    trigger = varvault.Key("trigger", valid_type=str)
+    result = varvault.Key("result", valid_type=str)
+    failing = varvault.Key("failing", valid_type=str)
+
+
+def parse(text):
+    samples = dict()
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        name, value = line.rsplit(" ", 1)
+        samples[name] = float(value)
+    return samples
+
+
+class TestMetrics:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        for path in (vault_file_new, metrics_file):
+            try:
+                os.remove(path)
+            except:
+                pass
+
+    def test_counters(self):
+        vault = varvault.create(keyring=KeyringMetrics, resource=varvault.JsonResource(vault_file_new, mode="w+"))
+        metrics = varvault.VaultMetrics().attach(vault)
+
+        @vault.automatic(input=KeyringMetrics.trigger, output=KeyringMetrics.result)
+        def _auto(trigger=varvault.AssignedByVault):
+            return trigger
+
+        @vault.automatic(varvault.Flags.no_error_logging, input=KeyringMetrics.result, output=KeyringMetrics.failing)
+        def _fail(result=varvault.AssignedByVault):
+            raise RuntimeError("failed")
+
+        with pytest.raises(RuntimeError):
+            vault.insert(KeyringMetrics.trigger, "go")
+
+        assert vault.get(KeyringMetrics.result) == "go"
+        text = metrics.render()
+        assert text.endswith("# EOF\n")
+        samples = parse(text)
+        assert samples["varvault_inserts_total"] == 2
+        assert samples["varvault_automatics_dispatched_total"] == 2
+        # _fail raises from within the post-call stage of _auto, so both of them fail
+        assert samples["varvault_automatics_failed_total"] == 2
+        assert samples["varvault_automatics_running"] == 0
+        assert samples["varvault_writes_total"] == 2
+        assert samples["varvault_written_bytes_total"] > 0
+        assert samples["varvault_gets_total"] == 3
+        assert samples["varvault_state_checks_total"] == 3
+        assert samples["varvault_lock_wait_seconds_count"] == 5
+        assert samples['varvault_lock_wait_seconds_bucket{le="+Inf"}'] == 5
+        assert samples["varvault_call_seconds_count"] == 2
+
+        json.dump({KeyringMetrics.trigger: "go", KeyringMetrics.result: "go", "failing": "reloaded"}, open(vault_file_new, "w"))
+        assert vault.get(KeyringMetrics.failing) == "reloaded"
+        samples = parse(metrics.render())
+        assert samples["varvault_reloads_total"] == 1
+        assert samples["varvault_reload_seconds_count"] == 1
+
+        metrics.detach(vault)
+        vault.insert(KeyringMetrics.failing, "ignored", varvault.Flags.permit_modifications)
+        assert parse(metrics.render())["varvault_inserts_total"] == 2
+
+    def test_buckets_are_cumulative(self):
+        vault = varvault.create(keyring=KeyringMetrics, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        metrics = varvault.VaultMetrics(prefix="app_vault").attach(vault)
+        vault.insert(KeyringMetrics.trigger, "go")
+        vault.insert(KeyringMetrics.result, "go")
+        buckets = [float(v) for v in re.findall(r'^app_vault_write_seconds_bucket\{le="[^"]+"\} (\d+)$', metrics.render(), re.MULTILINE)]
+        assert buckets == sorted(buckets)
+        assert buckets[-1] == 2
+
+    def test_write_and_serve(self):
+        vault = varvault.create(keyring=KeyringMetrics, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        metrics = varvault.VaultMetrics().attach(vault)
+        vault.insert(KeyringMetrics.trigger, "go")
+
+        metrics.write(metrics_file)
+        assert parse(open(metrics_file).read())["varvault_inserts_total"] == 1
+
+        host, port = metrics.serve()
+        try:
+            with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+                assert response.headers["Content-Type"].startswith("application/openmetrics-text")
+                assert parse(response.read().decode())["varvault_inserts_total"] == 1
+        finally:
+            metrics.stop()
+        assert metrics.server is None
@@ -0,0 +1,91 @@
+import json
+import tempfile
+import multiprocessing
+
+import pytest
+
+from commons import *
+
+vault_file_new = f"{DIR}/new-vault.mmap"
+vault_file_new_secondary = f"{DIR}/new-vault-secondary.mmap"
+
+
+class DictKeyring(varvault.Keyring):
+    key_dict = varvault.Key("key_dict", valid_type=dict)
+    key_list = varvault.Key("key_list", valid_type=list)
+
+
+def _read_in_child(queue):
+    vault = varvault.create(varvault.Flags.lazy_load, keyring=DictKeyring, resource=varvault.MmapResource(vault_file_new))
+    queue.put(vault.get(DictKeyring.key_dict))
+
+
+class TestMmapResource:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        for path in (vault_file_new, vault_file_new_secondary):
+            try:
+                os.remove(path)
+            except:
+                pass
+
+    def write_vault(self, codec="json"):
+        vault = varvault.create(keyring=DictKeyring, resource=varvault.MmapResource(vault_file_new, mode="w", codec=codec))
+        vault.insert(DictKeyring.key_dict, {"a": 1, "b": [1, 2, 3]})
+        vault.insert(DictKeyring.key_list, ["x", "y"])
+        return vault
+
+    @pytest.mark.parametrize("codec", ["json", "marshal", "pickle"])
+    def test_write_and_read(self, codec):
+        self.write_vault(codec)
+        assert open(vault_file_new, "rb").read(len(varvault.MmapResource.MAGIC)) == varvault.MmapResource.MAGIC
+        vault = varvault.create(keyring=DictKeyring, resource=varvault.MmapResource(vault_file_new, codec=codec))
+        assert vault.get(DictKeyring.key_dict) == {"a": 1, "b": [1, 2, 3]}
+        assert vault.get(DictKeyring.key_list) == ["x", "y"]
+
+    def test_lazy_load_decodes_on_access(self):
+        self.write_vault()
+        resource = varvault.MmapResource(vault_file_new)
+        vault = varvault.create(varvault.Flags.lazy_load, keyring=DictKeyring, resource=resource)
+        assert vault.lazy_keys == {DictKeyring.key_dict, DictKeyring.key_list}
+        assert vault.get(DictKeyring.key_list) == ["x", "y"]
+        assert vault.lazy_keys == {DictKeyring.key_dict}
+        assert resource.read_key(DictKeyring.key_dict) == {"a": 1, "b": [1, 2, 3]}
+        with pytest.raises(KeyError):
+            resource.read_key("missing")
+
+    def test_blobs_are_copied_without_decoding(self):
+        self.write_vault()
+        vault = varvault.create(varvault.Flags.lazy_load, keyring=DictKeyring, resource=varvault.MmapResource(vault_file_new, mode="a"))
+        vault.insert(DictKeyring.key_list, ["z"], varvault.Flags.permit_modifications)
+        assert DictKeyring.key_dict in vault.lazy_keys, "Writing the vault should not decode values that haven't been accessed"
+
+        vault = varvault.create(keyring=DictKeyring, resource=varvault.MmapResource(vault_file_new))
+        assert vault.get(DictKeyring.key_dict) == {"a": 1, "b": [1, 2, 3]}
+        assert vault.get(DictKeyring.key_list) == ["z"]
+
+    def test_pickle_is_only_read_when_trusted(self):
+        self.write_vault("pickle")
+        resource = varvault.MmapResource(vault_file_new)
+        with pytest.raises(ValueError):
+            resource.read_key(DictKeyring.key_dict)
+
+    def test_live_update(self):
+        vault_new = varvault.create(keyring=DictKeyring, resource=varvault.MmapResource(vault_file_new, mode="w+"))
+        vault_from = varvault.create(keyring=DictKeyring, resource=varvault.MmapResource(vault_file_new, mode="r+"))
+        vault_new.insert(DictKeyring.key_list, ["x"])
+        assert vault_from.get(DictKeyring.key_list) == ["x"]
+        vault_new.insert(DictKeyring.key_list, ["y"], varvault.Flags.permit_modifications)
+        assert vault_from.get(DictKeyring.key_list) == ["y"]
+
+    def test_read_from_other_process(self):
+        self.write_vault()
+        queue = multiprocessing.get_context("spawn").Queue()
+        process = multiprocessing.get_context("spawn").Process(target=_read_in_child, args=(queue,))
+        process.start()
+        assert queue.get(timeout=30) == {"a": 1, "b": [1, 2, 3]}
+        process.join(30)
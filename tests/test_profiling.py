@@ -0,0 +1,107 @@
+import json
+import tempfile
+import time
+
+import pytest
+
+from commons import *
+
+vault_file_new = f"{DIR}/new-vault.json"
+profile_file = f"{DIR}/profile.json"
+
+
+class TestProfiling:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        for path in (vault_file_new, profile_file):
+            try:
+                os.remove(path)
+            except:
+                pass
+
+    def test_times_taken_is_populated(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w"))
+
+        @vault.manual(output=Keyring.key_valid_type_is_str)
+        def _set():
+            time.sleep(0.01)
+            return "valid"
+
+        @vault.manual(input=Keyring.key_valid_type_is_str)
+        def _get(key_valid_type_is_str=varvault.AssignedByVault):
+            assert key_valid_type_is_str == "valid"
+
+        _set()
+        _get()
+        _get()
+
+        set_profile = vault.times_taken[f"{_set.__module__}._set"]
+        get_profile = vault.times_taken[f"{_get.__module__}._get"]
+        assert set_profile.calls == 1
+        assert get_profile.calls == 2
+        assert set_profile.body >= 0.01
+        assert set_profile.wall >= set_profile.body + set_profile.vault_overhead * 0.99
+        assert set_profile.overhead["resource_write"] > 0
+        assert set_profile.overhead["lock_wait"] > 0
+        assert get_profile.overhead["lock_wait"] > 0
+        assert get_profile.overhead["resource_write"] == 0
+        assert set_profile.latency.count == 1
+        assert set_profile.latency.quantile(0.99) <= set_profile.latency.max
+
+    def test_failures_are_recorded(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w"))
+
+        @vault.manual(varvault.Flags.no_error_logging)
+        def _fail():
+            raise RuntimeError("failed")
+
+        with pytest.raises(RuntimeError):
+            _fail()
+        profile = vault.times_taken[f"{_fail.__module__}._fail"]
+        assert profile.calls == 1
+        assert profile.failures == 1
+
+    def test_profile_report(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w"))
+
+        @vault.manual(output=Keyring.key_valid_type_is_str)
+        def _slow():
+            time.sleep(0.01)
+            return "valid"
+
+        @vault.manual(output=Keyring.key_valid_type_is_int)
+        def _fast():
+            return 1
+
+        _slow()
+        _fast()
+        table = vault.profile_report(sort_by="body")
+        lines = table.splitlines()
+        assert lines[0].startswith("name")
+        assert "_slow" in lines[2] and "_fast" in lines[3]
+        table = vault.profile_report(sort_by="body", reverse=False, limit=1)
+        assert len(table.splitlines()) == 3
+        assert "_fast" in table.splitlines()[2]
+        with pytest.raises(ValueError):
+            vault.profile_report(sort_by="not-a-column")
+
+        vault.export_profile(profile_file)
+        exported = json.load(open(profile_file))
+        assert set(exported["functions"].keys()) == set(vault.times_taken.keys())
+        assert exported["functions"][f"{_slow.__module__}._slow"]["calls"] == 1
+
+        vault.reset_profile()
+        assert vault.times_taken == {}
+
+    def test_histogram_memory_is_constant(self):
+        histogram = varvault.LatencyHistogram()
+        for i in range(10000):
+            histogram.record(i * 1e-5)
+        assert len(histogram.counts) == len(histogram.BOUNDS) + 1
+        assert histogram.count == 10000
+        assert 0.03 < histogram.quantile(0.5) <= 0.07
+        assert histogram.quantile(1) == histogram.max
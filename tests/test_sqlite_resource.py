@@ -0,0 +1,164 @@
+import sqlite3
+import tempfile
+import threading
+
+from commons import *
+
+vault_file_new = f"{DIR}/new-vault.db"
+
+
+class TestSqliteResource:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(vault_file_new + suffix)
+            except:
+                pass
+
+    def rows(self):
+        with sqlite3.connect(vault_file_new) as connection:
+            return {key: (value, type_tag, version) for key, value, type_tag, version in connection.execute("SELECT key, value, type, version FROM vault")}
+
+    def test_write_and_read(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+
+        with sqlite3.connect(vault_file_new) as connection:
+            journal_mode, = connection.execute("PRAGMA journal_mode").fetchone()
+        assert journal_mode == "wal"
+        assert self.rows() == {Keyring.key_valid_type_is_str: ('"valid"', "str", 1), Keyring.key_valid_type_is_int: ("1", "int", 1)}
+
+        vault_from = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="r"))
+        assert vault_from.get(Keyring.key_valid_type_is_str) == "valid"
+        assert vault_from.get(Keyring.key_valid_type_is_int) == 1
+
+    def test_versions_change_only_with_values(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        vault.insert(Keyring.key_valid_type_is_int, 2, varvault.Flags.permit_modifications)
+        rows = self.rows()
+        assert rows[Keyring.key_valid_type_is_str][2] == 1, "A row whose value hasn't changed should not be updated"
+        assert rows[Keyring.key_valid_type_is_int] == ("2", "int", 2)
+        assert vault.resource.version(Keyring.key_valid_type_is_int) == 2
+        assert vault.resource.version("missing") is None
+
+    def test_new_vault_replaces_existing(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="w"))
+        assert self.rows() == {}
+
+        vault = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="a"))
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        vault = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="a"))
+        assert vault.get(Keyring.key_valid_type_is_int) == 1
+
+    def test_read_keys(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+
+        resource = varvault.SqliteResource(vault_file_new, mode="r")
+        assert resource.read_key(Keyring.key_valid_type_is_int) == 1
+        assert resource.read_keys([Keyring.key_valid_type_is_str, "missing"]) == {Keyring.key_valid_type_is_str: "valid"}
+        try:
+            resource.read_key("missing")
+            assert False, "Reading a key that isn't in the database should fail"
+        except KeyError:
+            pass
+
+    def test_live_update(self):
+        vault_new = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="w+"))
+        vault_from = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="r+"))
+        state_checks = list()
+        vault_from.hooks.register(varvault.Hooks.state_check, state_checks.append)
+
+        vault_new.insert(Keyring.key_valid_type_is_str, "valid")
+        assert vault_from.get(Keyring.key_valid_type_is_str) == "valid"
+        assert state_checks[-1].extra["changed"]
+
+        assert vault_from.get(Keyring.key_valid_type_is_str) == "valid"
+        assert not state_checks[-1].extra["changed"], "Nothing has been written, so the state should not have changed"
+
+        vault_new.insert(Keyring.key_valid_type_is_str, "modified", varvault.Flags.permit_modifications)
+        assert vault_from.get(Keyring.key_valid_type_is_str) == "modified"
+
+    def test_live_update_before_database_exists(self):
+        vault_from = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="r+"))
+        assert vault_from.get(Keyring.key_valid_type_is_int, varvault.Flags.input_key_can_be_missing) is None
+        vault_new = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="w+"))
+        vault_new.insert(Keyring.key_valid_type_is_int, 1)
+        assert vault_from.get(Keyring.key_valid_type_is_int) == 1
+
+    def test_delta_writes(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="w"))
+        written = list()
+        vault.hooks.register(varvault.Hooks.write, written.append)
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+
+        # A row written by someone else must survive writes from the vault, as the vault only writes the keys that have changed
+        with sqlite3.connect(vault_file_new) as connection:
+            connection.execute("INSERT INTO vault (key, value, type, version) VALUES ('other', '1', 'int', 1)")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        assert [event.keys for event in written] == [(Keyring.key_valid_type_is_str,), (Keyring.key_valid_type_is_int,)]
+        assert set(self.rows()) == {Keyring.key_valid_type_is_str, Keyring.key_valid_type_is_int, "other"}
+
+    def test_delta_writes_delete_replaced_input_key(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "1")
+
+        @vault.manual(varvault.Flags.output_key_replaces_input_key, input=Keyring.key_valid_type_is_str, output=Keyring.key_valid_type_is_int)
+        def _replace(key_valid_type_is_str=varvault.AssignedByVault):
+            return int(key_valid_type_is_str)
+        _replace()
+
+        assert vault.dirty_keys == set() and vault.deleted_keys == set()
+        assert set(self.rows()) == {Keyring.key_valid_type_is_int}
+
+    def test_delta_writes_changes_made_in_place(self):
+        class DictKeyring(varvault.Keyring):
+            key_dict = varvault.Key("key_dict", valid_type=dict)
+            key_int = varvault.Key("key_int", valid_type=int)
+
+        vault = varvault.create(keyring=DictKeyring, resource=varvault.SqliteResource(vault_file_new, mode="w"))
+        vault.insert(DictKeyring.key_dict, {"a": 1})
+        vault.get(DictKeyring.key_dict)["a"] = 2
+        # Only the new key has been set, but the dict changed in place must be written too
+        vault.insert(DictKeyring.key_int, 1)
+        assert self.rows()[DictKeyring.key_dict][:2] == ('{"a": 2}', "dict")
+        assert varvault.SqliteResource(vault_file_new, mode="r").read_key(DictKeyring.key_dict) == {"a": 2}
+
+        # A value that hasn't changed isn't written again
+        vault.insert(DictKeyring.key_int, 2, varvault.Flags.permit_modifications)
+        assert self.rows()[DictKeyring.key_dict][2] == 2
+
+    def test_type_tag_restores_tuples(self):
+        resource = varvault.SqliteResource(vault_file_new, mode="w")
+        resource.write({"tuple": (1, 2), "list": [1, 2]})
+        assert self.rows()["tuple"] == ("[1, 2]", "tuple", 1)
+        resource = varvault.SqliteResource(vault_file_new, mode="r")
+        assert resource.read() == {"tuple": (1, 2), "list": [1, 2]}
+        assert resource.read_key("tuple") == (1, 2)
+
+    def test_watcher(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="a+"))
+        arrived = threading.Event()
+
+        @vault.automatic(input=Keyring.key_valid_type_is_int)
+        def _arrived(key_valid_type_is_int=varvault.AssignedByVault):
+            arrived.set()
+
+        watcher = vault.watch(interval=0.05)
+        try:
+            assert watcher.inotify is None, "Commits can't be seen through inotify, so the database should be polled"
+            varvault.create(keyring=Keyring, resource=varvault.SqliteResource(vault_file_new, mode="a")).insert(Keyring.key_valid_type_is_int, 1)
+            assert arrived.wait(5), "The watcher never refreshed the vault"
+        finally:
+            vault.stop_watching()
@@ -0,0 +1,75 @@
+import json
+import tempfile
+
+from commons import *
+
+vault_file_new = f"{DIR}/new-vault.json"
+trace_file = f"{DIR}/trace.json"
+
+
+class KeyringTracer(varvault.Keyring):
+    trigger = varvault.Key("trigger", valid_type=str)
+    threaded = varvault.Key("threaded", valid_type=str)
+    result = varvault.Key("result", valid_type=str)
+
+
+class TestTracer:
+
+    @classmethod
+    def setup_class(cls):
+        tempfile.tempdir = "/tmp" if sys.platform == "darwin" or sys.platform == "linux" else tempfile.gettempdir()
+
+    def setup_method(self):
+        for path in (vault_file_new, trace_file):
+            try:
+                os.remove(path)
+            except:
+                pass
+
+    def test_trace(self):
+        vault = varvault.create(keyring=KeyringTracer, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        tracer = varvault.Tracer().attach(vault)
+
+        @vault.automatic(input=KeyringTracer.trigger, output=KeyringTracer.threaded, threaded=True)
+        def _threaded(trigger=varvault.AssignedByVault):
+            return trigger + "-threaded"
+
+        @vault.manual(output=KeyringTracer.trigger)
+        def _start():
+            return "go"
+
+        _start()
+        vault.await_running_tasks(timeout=5)
+        tracer.write(trace_file)
+
+        trace = json.load(open(trace_file))
+        events = trace["traceEvents"]
+        spans = [e for e in events if e["ph"] == "X"]
+        metadata = [e for e in events if e["ph"] == "M"]
+        categories = {span["cat"] for span in spans}
+        assert {"call", "pre_call", "post_call", "insert", "write", "lock_wait", "dispatch", "thread"} <= categories, categories
+
+        calls = {span["name"]: span for span in spans if span["cat"] == "call"}
+        start = calls[f"{_start.__module__}._start"]
+        threaded = calls[f"{_threaded.__module__}._threaded"]
+        assert start["args"]["keys"] == ["trigger"]
+        assert threaded["args"]["keys"] == ["trigger", "threaded"]
+        assert start["tid"] != threaded["tid"], "The threaded automatic should have been traced on a separate thread"
+        thread_span = [span for span in spans if span["cat"] == "thread"][0]
+        assert thread_span["tid"] == threaded["tid"]
+        assert thread_span["dur"] >= threaded["dur"]
+        assert {m["tid"] for m in metadata} == {span["tid"] for span in spans}
+        assert [span["ts"] for span in spans] == sorted(span["ts"] for span in spans)
+        write = [span for span in spans if span["cat"] == "write"][0]
+        assert write["args"]["bytes"] > 0
+
+        tracer.detach(vault)
+        tracer.clear()
+        vault.insert(KeyringTracer.result, "done")
+        assert tracer.to_dict()["traceEvents"] == metadata
+
+    def test_selected_hooks(self):
+        vault = varvault.create(keyring=KeyringTracer, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        tracer = varvault.Tracer(hooks=(varvault.Hooks.write,)).attach(vault)
+        vault.insert(KeyringTracer.trigger, "go")
+        assert [span["cat"] for span in tracer.events] == ["write"]
@@ -1,3 +1,4 @@
+import copy
 import json
 import os.path
 import re
@@ -1070,3 +1071,127 @@ class TestVault:
         assert vault.get(KeyringKeyValidationFunction.name) == "will-be-modified-to-dashes", vault.get(KeyringKeyValidationFunction.name)
         assert vault.get(KeyringKeyValidationFunction.path) == "will_be_modified_to_underscores", vault.get(KeyringKeyValidationFunction.path)
 
+
+    def test_json_resource_serializes_values_once(self):
+        resource = varvault.JsonResource(vault_file_new, mode="w")
+        encoded = list()
+        encode_fragment = resource.encode_fragment
+
+        def _encode_fragment(value):
+            encoded.append(value)
+            return encode_fragment(value)
+        resource.encode_fragment = _encode_fragment
+
+        vault = varvault.create(keyring=Keyring, resource=resource)
+        vault.insert(Keyring.key_valid_type_is_str, "valid\nwith a newline")
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        vault.insert(Keyring.key_valid_type_is_int, 2, varvault.Flags.permit_modifications)
+        assert encoded == ["valid\nwith a newline", 1, 2], "Each value should be serialized exactly once, when it's set in the vault"
+
+        content = open(vault_file_new).read()
+        assert content == json.dumps({Keyring.key_valid_type_is_str: "valid\nwith a newline", Keyring.key_valid_type_is_int: 2}, indent=2)
+        assert list(resource.fragments) == [Keyring.key_valid_type_is_str, Keyring.key_valid_type_is_int]
+
+    def test_json_resource_writes_changes_made_in_place(self):
+        class KeyringDict(varvault.Keyring):
+            key_dict = varvault.Key("key_dict", valid_type=dict)
+
+        vault = varvault.create(keyring=KeyringDict, resource=varvault.JsonResource(vault_file_new, mode="w"), key_int=Keyring.key_valid_type_is_int)
+        vault.insert(KeyringDict.key_dict, {"x": 1})
+        vault.get(KeyringDict.key_dict)["x"] = 2
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        assert json.load(open(vault_file_new))[KeyringDict.key_dict] == {"x": 2}
+
+    def test_json_resource_serializes_values_once(self):
+        class KeyringDict(varvault.Keyring):
+            key_dict = varvault.Key("key_dict", valid_type=dict)
+
+        resource = varvault.JsonResource(vault_file_new, mode="w")
+        vault = varvault.create(keyring=KeyringDict, resource=resource, key_int=Keyring.key_valid_type_is_int)
+        encoded = list()
+        encode_fragment = resource.encode_fragment
+        resource.encode_fragment = lambda value: encoded.append(copy.deepcopy(value)) or encode_fragment(value)
+
+        # The value is serialized when it's checked, and what was serialized is written
+        vault.insert(KeyringDict.key_dict, {"x": 1})
+        assert encoded == [{"x": 1}]
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+        assert encoded == [{"x": 1}, 1], "A value that hasn't changed shouldn't be serialized again"
+
+        # A value that has been changed in place is serialized again
+        vault.get(KeyringDict.key_dict)["x"] = 2
+        vault.insert(Keyring.key_valid_type_is_int, 2, varvault.Flags.permit_modifications)
+        assert encoded == [{"x": 1}, 1, 2, {"x": 2}]
+        assert json.load(open(vault_file_new)) == {KeyringDict.key_dict: {"x": 2}, Keyring.key_valid_type_is_int: 2}
+
+    def test_read_only_json_resource_serializes_nothing(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_int, 1)
+
+        resource = varvault.JsonResource(vault_file_new, mode="r")
+        resource.codec.writable = resource.encode_fragment = lambda *args: pytest.fail("A resource that can't write shouldn't serialize values")
+        assert varvault.create(keyring=Keyring, resource=resource).get(Keyring.key_valid_type_is_int) == 1
+
+    @pytest.mark.parametrize("stream_threshold", [0, varvault.STREAM_THRESHOLD])
+    def test_load_reads_resource_once(self, stream_threshold):
+        resource = varvault.JsonResource(faulty_vault_key_missmatch, mode="r", shared=False, stream_threshold=stream_threshold)
+        states = list()
+        state = type(resource).state
+        type(resource).state = property(lambda r: states.append(r) or state.fget(r))
+        try:
+            with warns(UserWarning, match=".*Keys were found in the resource.*"):
+                vault = varvault.create(varvault.Flags.ignore_keys_not_in_keyring, keyring=Keyring, resource=resource)
+        finally:
+            type(resource).state = state
+        assert len(states) == 1, "The state of the resource should only be fetched once when the vault is loaded"
+
+        stats = vault.load_stats
+        assert stats.keys_read == 3
+        assert stats.keys_loaded == 2
+        assert stats.keys_not_in_keyring == ["this_key_doesnt_exist_in_keyring"]
+        assert stats.bytes == os.path.getsize(faulty_vault_key_missmatch)
+        assert 0 < stats.build_duration <= stats.duration
+        assert not stats.lazy
+
+    def test_keyring_decoder(self):
+        class KeyringDecoded(varvault.Keyring):
+            key_str = varvault.Key("key_str", valid_type=str)
+            key_none = varvault.Key("key_none", valid_type=int, can_be_none=True)
+            key_any = varvault.Key("key_any")
+
+        decoder = KeyringDecoded.decoder()
+        assert decoder == KeyringDecoded.get_keys()
+        assert KeyringDecoded.__dict__["_decoder"] is not decoder, "A copy of the cached decoder should be returned"
+        assert KeyringDecoded.decoder().builders[KeyringDecoded.key_str] is decoder.builders[KeyringDecoded.key_str], "The decoder should only be compiled once"
+
+        class KeyringDecodedChild(KeyringDecoded):
+            key_child = varvault.Key("key_child", valid_type=str)
+        assert KeyringDecodedChild.decoder() == {"key_child": KeyringDecodedChild.key_child}, "Each keyring should have its own decoder, like it has its own keys"
+
+        assert decoder.build(KeyringDecoded.key_str, "valid") == "valid"
+        assert decoder.build(KeyringDecoded.key_none, None) is None
+        assert decoder.build(KeyringDecoded.key_any, [1]) == [1]
+        with pytest.raises(AssertionError, match="Key type missmatch"):
+            decoder.build(KeyringDecoded.key_str, 1)
+        with pytest.raises(AssertionError, match="Key type missmatch"):
+            decoder.build(KeyringDecoded.key_none, "1")
+
+        extra = varvault.Key("extra", valid_type=int)
+        extended = KeyringDecoded.decoder({"extra": extra})
+        assert extended.build_all([("extra", 1), ("key_str", "valid")]) == {extra: 1, KeyringDecoded.key_str: "valid"}
+        assert "extra" not in KeyringDecoded.decoder()
+
+    def test_keys_is_dict_keys_and_a_deprecated_alias_of_keyring_keys(self):
+        vault = varvault.create(keyring=Keyring, resource=varvault.JsonResource(vault_file_new, mode="w"))
+        vault.insert(Keyring.key_valid_type_is_str, "valid")
+        assert list(vault.keys()) == [Keyring.key_valid_type_is_str]
+        assert dict(vault) == {Keyring.key_valid_type_is_str: "valid"}
+
+        with warns(DeprecationWarning, match="keyring_keys"):
+            assert vault.keys[Keyring.key_valid_type_is_int] is Keyring.key_valid_type_is_int
+        with warns(DeprecationWarning, match="keyring_keys"):
+            assert Keyring.key_valid_type_is_int in vault.keys
+        with warns(DeprecationWarning, match="keyring_keys"):
+            assert set(vault.keys) == set(vault.keyring_keys)
+        with warns(DeprecationWarning, match="keyring_keys"):
+            assert vault.keys.get(Keyring.key_valid_type_is_str) is Keyring.key_valid_type_is_str
@@ -2,15 +2,37 @@ __version__ = "6.0.2"
 
 import os
 import json
+import contextlib
 
-from typing import Dict, TextIO, AnyStr, Literal, Union
+from typing import Dict, List, TextIO, BinaryIO, AnyStr, Literal, Union, Tuple, Any, Callable, Iterator
 
 from .resource import ResourceModes
 from .resource import BaseResource
 from .resource import ResourceNotFoundError
+from .resource import SharedResource
+from .resource import LoadStats
+
+from .parallel import LoadError
+
+from .warm_start import WarmStartCache
+
+from .blob_store import BlobStore, is_buffer
 
 from .keyring import Key
 from .keyring import Keyring
+from .keyring import KeyringDecoder
+
+from .codec import Codec, JsonCodec, OrjsonCodec, PickleCodec, MarshalCodec, get_codec, encode_with_header, decode_with_header, HEADER_PREFIX
+
+from .compression import Compression, GzipCompression, Bz2Compression, LzmaCompression, ZlibCompression, get_compression, open_for_write, read_file, open_file, detect, MAGIC_SIZE
+
+from .json_stream import iter_object
+
+from .change_detection import ChangeDetector
+from .change_detection import Md5ChangeDetector
+from .change_detection import StatChangeDetector
+from .change_detection import TieredChangeDetector
+from .change_detection import HashingWriter
 
 from .validator import validator
 from .validator import modifier
@@ -23,8 +45,27 @@ from .vault import VarVault
 
 from .flags import Flags
 
+from .hooks import Hooks
+from .hooks import HookEvent
+from .hooks import HookRegistry
+
+from .tracer import Tracer
+
+from .metrics import VaultMetrics
+
+from .watcher import ResourceWatcher
+
+from .sqlite_resource import SqliteResource
+
+from .mmap_resource import MmapResource
+
+from .directory_resource import DirectoryResource
+
 from .factory import create
 
+from .profiling import FunctionProfile
+from .profiling import LatencyHistogram
+
 from .vaultstructs import VaultStructDictBase
 from .vaultstructs import VaultStructListBase
 from .vaultstructs import VaultStructFloatBase
@@ -34,6 +75,7 @@ from .vaultstructs import VaultStructStringBase
 from .utils import AssignedByVault
 from .utils import concurrent_execution
 from .utils import assert_and_raise
+from .utils import is_immutable
 
 
 def clear_logs():
@@ -46,9 +88,16 @@ def clear_logs():
         os.remove(f)
 
 
+# Files smaller than this are parsed in full, which is three to four times faster than parsing them as a stream. Above it, the file and the text of it
+# in memory cost more than the time saved, so only the value being read is kept in memory instead
+STREAM_THRESHOLD = 8 << 20
+
+
 class JsonResource(BaseResource):
 
-    def __init__(self, path: AnyStr, mode: Union[Literal["r", "w", "a", "r+", "w+", "a+"], ResourceModes] = "r"):
+    def __init__(self, path: AnyStr, mode: Union[Literal["r", "w", "a", "r+", "w+", "a+"], ResourceModes] = "r", change_detector: ChangeDetector = None,
+                 max_staleness: float = 0, shared: bool = True, codec: Union[str, Codec] = "json", compression: Union[str, Compression] = None,
+                 compression_level: int = None, stream_threshold: int = STREAM_THRESHOLD, warm_start: bool = False, blob_threshold: int = None):
         f"""
         Creates the JsonResource object.
         :param path: This should be the path to the JSON file that the vault should be using.
@@ -59,19 +108,46 @@ class JsonResource(BaseResource):
         r+: Read from existing resource and perform live-update
         w+: Create new resource and ignore existing resource and write to it, and perform live-update
         a+: Create a new resource if none exist, otherwise read from and write to existing resource, and perform live-update
+        :param change_detector: Optional. The {ChangeDetector} used to detect changes to the JSON file. Default is {TieredChangeDetector},
+         which uses 'os.stat' and only hashes the file when the stat is ambiguous.
+        :param max_staleness: Optional. The number of seconds that data read through live-update may be out of date; see {BaseResource}.
+        :param shared: Optional. Share the change detection and the parsed content of the JSON file with all other shared JsonResources for the same file
+         in this process, so that several vaults on one file cost about as much as one. Default is {True}.
+        :param codec: Optional. The {Codec}, or the name of the codec, used to serialize the vault: 'json' (default), 'json-compact', 'orjson' (if installed),
+         'marshal' or 'pickle'. Codecs that don't write JSON put a header in the file that names the codec, and a file with a header is read with the codec in it.
+         Files written with 'pickle' are only read by resources that use 'pickle', as loading a pickle can run arbitrary code.
+        :param compression: Optional. Compress the file with 'gzip', 'bz2', 'lzma' or 'zlib'. A compressed JSON file is always parsed as it's decompressed,
+         regardless of {stream_threshold}, so the uncompressed file is never in memory. Compressed files are recognized when they are read regardless of this.
+         Changes are detected on the compressed file. Default is {None}.
+        :param compression_level: Optional. The level to compress at. Default is the default level of the compression format.
+        :param stream_threshold: Optional. The size in bytes of the file from which a vault built from it is read as a stream, which keeps only the value
+         being read in memory but is slower than reading the file in full. Default is {STREAM_THRESHOLD}.
+        :param warm_start: Optional. Cache the values built when a vault is loaded from the file in a file next to it, so that loading the same file with the same
+         keyring again, in any process, unpickles the values instead of parsing the file and building them; see {WarmStartCache}. Default is {False}.
+        :param blob_threshold: Optional. The size in characters of a serialized value from which the value is stored in a {BlobStore} in a directory next to
+         the file, and only a reference to it is written to the file, so that writing the vault doesn't get slower with the number of large values in it.
+         Only for codecs that write JSON. References are resolved when a file is read regardless of this. Default is {None}, which means values are never stored apart.
         """
-        super(JsonResource, self).__init__(path, mode)
+        super(JsonResource, self).__init__(path, mode, max_staleness=max_staleness, shared=shared, codec=codec, compression=compression, compression_level=compression_level,
+                                           warm_start=warm_start)
+        if change_detector:
+            self.change_detector = change_detector
+        else:
+            self.change_detector = self.shared.change_detector if self.shared else TieredChangeDetector()
         self.file_io = None
+        self.stream_threshold = stream_threshold
+        self.blob_threshold = blob_threshold
+        self.blobs = BlobStore(f"{self.raw_path}.blobs", self.compression, self.compression_level)
+        # The serialized value for each key whose value can't change in place, together with the value it was serialized from
+        self.fragments: Dict[str, Tuple[Any, str]] = dict()
+        # The serialized value for each key whose value can change in place, together with the value and its compact encoding (see 'Codec.encode_value')
+        # when it was serialized. The compact encoding is much cheaper to make, and a value is only serialized again if it no longer matches.
+        self.mutable: Dict[str, Tuple[Any, bytes, str]] = dict()
 
     @property
     def state(self):
-        """Returns the state of the vault, which is the state of the JSON file"""
-        import hashlib
-        hash_md5 = hashlib.md5()
-        with open(self.path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        """Returns the state of the vault, which is the state of the JSON file according to the change detector"""
+        return self.change_detector.state(self.path)
 
     @property
     def resource(self) -> TextIO:
@@ -119,23 +195,155 @@ class JsonResource(BaseResource):
         return self.raw_path if os.path.exists(self.raw_path) else self.backup
 
     def writable(self, obj: Dict) -> bool:
-        f"""Checks if a key-value pair in a dict can be written to a file by attempting to serialize it by using {json.dumps}"""
+        f"""
+        Checks if a key-value pair in a dict can be written to a file by attempting to serialize it through the codec of the resource. Nothing is ever
+        written through a resource that can't write, so nothing is serialized to check it. If the codec serializes each value on its own, the values are
+        serialized the way they appear in the file, and {self.do_write} uses what was serialized here.
+        """
+        if not self.mode_properties.write:
+            return True
+        if not self.codec.supports_fragments or not all(isinstance(key, str) for key in obj):
+            return self.codec.writable(obj)
         try:
-            json.dumps(obj)
+            for key, value in obj.items():
+                self._encode(key, value)
             return True
-        except (TypeError, OverflowError) as e:
+        except (TypeError, ValueError, OverflowError):
             return False
 
+    def _encode(self, key: str, value: Any) -> str:
+        f"""
+        Returns the fragment for {value} of {key} (see {self.encode_fragment}). The fragment of a value that can't change in place is reused for as long as
+        the vault holds the same object, and so is the fragment of a value that can, for as long as its compact encoding hasn't changed.
+        """
+        cached = self.fragments.get(key)
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        if is_immutable(value):
+            fragment = self.encode_fragment(value)
+            self.fragments[key] = (value, fragment)
+            self.mutable.pop(key, None)
+            return fragment
+        self.fragments.pop(key, None)
+        if is_buffer(value):
+            # Buffers are hashed by the blob store anyway, which is as cheap as comparing them
+            self.mutable.pop(key, None)
+            return self.encode_fragment(value)
+        encoded = self.codec.encode_value(value)
+        tracked = self.mutable.get(key)
+        if tracked is not None and tracked[0] is value and tracked[1] == encoded:
+            return tracked[2]
+        fragment = self.encode_fragment(value)
+        self.mutable[key] = (value, encoded, fragment)
+        return fragment
+
+    def encode_fragment(self, value: Any) -> str:
+        f"""
+        Serializes a value the way it appears in the file, e.g. indented to sit at the first level of the vault. A value that is at least
+        {self.blob_threshold} characters long is stored in {self.blobs} and serialized as a reference to it. So is a value that supports the buffer
+        protocol, like 'bytes', 'array.array' or a NumPy array, which is stored as raw binary data (see {BlobStore.put_buffer}). The reference is
+        kept by {self._encode} like any other fragment, so a value is only stored, and hashed, again when it's set or changed in place.
+        """
+        if is_buffer(value):
+            # Buffers can't be serialized as JSON, but they can be stored as they are and memory-mapped back, regardless of their size
+            return self.codec.encode_fragment(self.blobs.put_buffer(value))
+        fragment = self.codec.encode_fragment(value)
+        if self.blob_threshold is not None and len(fragment) >= self.blob_threshold:
+            return self.codec.encode_fragment(self.blobs.put(fragment))
+        return fragment
+
     def exists(self) -> bool:
         """Returns a bool that determines if the JSON file exists by expanding user and potential vars"""
         return os.path.exists(self.path)
 
+    def size(self) -> Union[int, None]:
+        """Returns the size of the JSON file in bytes"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return None
+
     def do_write(self, vault: dict) -> None:
-        """Writes the vault to the JSON file"""
-        with open(self.backup, "w") as f:
-            json.dump(vault, f, indent=2)
+        f"""
+        Writes the vault to the file through the codec of the resource. If the codec serializes each value on its own, the file is assembled from
+        the serialized values (see {self._encode}): values that were serialized when they were set, by {self.writable}, aren't serialized again, and
+        values that can be changed in place (see {is_immutable}) are only serialized again if they have been. What's written is hashed for the change
+        detector if it asks for it (see {ChangeDetector.write_hash}), so that it doesn't read the file back to check it.
+        """
+        hash = self.change_detector.write_hash()
+        with open(self.backup, "wb") as f, open_for_write(HashingWriter(f, hash) if hash is not None else f, self.compression, self.compression_level) as out:
+            if not self.codec.supports_fragments or not all(isinstance(key, str) for key in vault):
+                out.write(encode_with_header(self.codec, vault))
+            else:
+                fragments = {key: self._encode(key, value) for key, value in vault.items()}
+                # Keys that are no longer in the vault are dropped from the caches
+                for cache in (self.fragments, self.mutable):
+                    for key in [key for key in cache if key not in fragments]:
+                        del cache[key]
+                # The file is written in pieces so that the entire content never has to be in memory, which matters most when it's compressed
+                for piece in self.codec.iter_join(fragments.items()):
+                    out.write(piece.encode())
         os.rename(self.backup, self.raw_path)
+        if hash is not None:
+            self.change_detector.written(self.raw_path, hash)
 
     def do_read(self) -> Dict:
-        """Reads the vault from the JSON file"""
-        return json.load(open(self.path))
+        f"""
+        Reads the vault from the file through the codec named in its header, or as JSON if it has none. A compressed JSON file is parsed as it's
+        decompressed (see {self.compressed}), so neither the uncompressed bytes nor the text decoded from them are ever in memory in full.
+        References to values in {self.blobs} are left as they are, so that a snapshot shared with other resources doesn't hold the values, and are
+        resolved through {self.resolve_value} by the callers.
+        """
+        if self.compressed():
+            return dict(self._stream(None))
+        return decode_with_header(self.codec, read_file(self.path))
+
+    def resolve_value(self, value: Any) -> Any:
+        f"""Reads the value from {self.blobs} if {value} is a reference to it, see {self.encode_fragment}."""
+        return self.blobs.resolve(value)
+
+    def prune_blobs(self) -> List[AnyStr]:
+        f"""Removes the values in {self.blobs} that the file no longer refers to, and returns the paths of the removed files. Only call this when no other vault is writing to the file."""
+        with self.lock:
+            references = [value for value in self.do_read().values() if BlobStore.is_reference(value)] if self.exists() else []
+            return self.blobs.prune(references)
+
+    def compressed(self) -> bool:
+        f"""Returns a bool that says if the file is compressed with any of the known formats (see {detect})."""
+        try:
+            with open(self.path, "rb") as f:
+                return detect(f.read(MAGIC_SIZE)) is not None
+        except OSError:
+            return False
+
+    def streams(self) -> bool:
+        f"""
+        Returns a bool that says if the file is at least {self.stream_threshold} bytes, or is compressed (see {self.compressed}), in which case a vault built
+        from it is read as a stream.
+        """
+        size = self.size()
+        return size is not None and (size >= self.stream_threshold or self.compressed())
+
+    def do_read_items(self, wanted: Callable[[str], bool] = None) -> Iterator[Tuple[str, Any]]:
+        f"""
+        Reads the vault from the file one key at a time. A large JSON file is parsed as a stream (see {self.streams}), so only the value that is being read
+        is kept in memory, and the values for keys that {wanted} returns {False} for are skipped without being decoded. Other files are read in full.
+        The file is opened before this returns and read from the open file, so the items come from the file as it was, even if it's replaced before they're read.
+        """
+        if not self.streams():
+            return ((key, value) for key, value in self.do_read().items() if wanted is None or wanted(key))
+        return self._stream(wanted)
+
+    def _stream(self, wanted: Union[Callable[[str], bool], None]) -> Iterator[Tuple[str, Any]]:
+        stack = contextlib.ExitStack()
+        f = stack.enter_context(open_file(self.path))
+        return self._iter_stream(stack, f, wanted)
+
+    def _iter_stream(self, stack: contextlib.ExitStack, f: BinaryIO, wanted: Union[Callable[[str], bool], None]) -> Iterator[Tuple[str, Any]]:
+        with stack:
+            head = f.read(len(HEADER_PREFIX))
+            if head == HEADER_PREFIX:
+                vault_file_data = decode_with_header(self.codec, head + f.read())
+                yield from ((key, value) for key, value in vault_file_data.items() if wanted is None or wanted(key))
+                return
+            yield from iter_object(f, wanted, head=head)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import mmap
+import array
+import hashlib
+
+from typing import *
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from .compression import Compression, read_file, open_for_write
+
+# The key of the object that is written to the vault in place of a value that is stored in the blob store
+REFERENCE_KEY = "$varvault-blob"
+
+# The key in a reference that describes a value that is stored as raw binary data, see 'BlobStore.put_buffer'
+BUFFER_KEY = "buffer"
+
+BUFFER_TYPES = (bytes, bytearray, memoryview, array.array) + ((numpy.ndarray,) if numpy is not None else ())
+
+
+def is_buffer(value: Any) -> bool:
+    f"""Returns a bool that says if {value} is stored as raw binary data by {BlobStore.put_buffer}: {BUFFER_TYPES}, but not subclasses of them."""
+    return type(value) in BUFFER_TYPES
+
+
+class BlobStore:
+    f"""
+    A directory of values that are stored outside the file of a vault, one file per value. Each file is named after the hash of its content,
+    so a value is only ever written once, and the vault file only holds a small reference to it ({{"{REFERENCE_KEY}": "<hash>"}}) which is cheap to write
+    again. Files are written before the vault that refers to them and never changed after that, so a reader never sees a reference to a missing or half-written
+    value. Values that are no longer referred to are only removed through 'prune'.
+
+    Values that support the buffer protocol, which can't be serialized as JSON, are stored as raw binary data, and the reference describes how to
+    turn the data back into the value. Those files are memory-mapped when they are read, so a 'memoryview' or a NumPy array is read without copying it.
+    """
+
+    SUFFIX = ".json"
+    BUFFER_SUFFIX = ".bin"
+
+    def __init__(self, directory: AnyStr, compression: Compression = None, compression_level: int = None):
+        f"""
+        :param directory: The directory to store the values in. It's created when the first value is stored.
+        :param compression: Optional. The {Compression} to compress the values with. Compressed values are recognized when they are read regardless of this.
+        :param compression_level: Optional. The level to compress at.
+        """
+        self.directory = directory
+        self.compression = compression
+        self.compression_level = compression_level
+
+    @staticmethod
+    def is_reference(value: Any) -> bool:
+        f"""Returns a bool that says if {value} is a reference to a value in a blob store."""
+        return type(value) is dict and REFERENCE_KEY in value and (len(value) == 1 or (len(value) == 2 and BUFFER_KEY in value))
+
+    def path(self, reference: Dict[str, Any]) -> AnyStr:
+        f"""Returns the path to the file of the value that {reference} refers to."""
+        return os.path.join(self.directory, f"{reference[REFERENCE_KEY]}{self.BUFFER_SUFFIX if BUFFER_KEY in reference else self.SUFFIX}")
+
+    def put(self, encoded: str) -> Dict[str, Any]:
+        f"""Stores {encoded}, a value serialized as JSON, unless it's already stored, and returns a reference to it."""
+        data = encoded.encode()
+        reference = {REFERENCE_KEY: hashlib.sha256(data).hexdigest()}
+        self._write(self.path(reference), data, self.compression)
+        return reference
+
+    def put_buffer(self, value: Any) -> Dict[str, Any]:
+        f"""
+        Stores {value}, which supports the buffer protocol (see {is_buffer}), as raw binary data unless it's already stored, and returns a reference to it
+        that holds the type of {value} and the format and the shape of its items. The data is never compressed, so that it can be memory-mapped.
+        """
+        if numpy is not None and isinstance(value, numpy.ndarray):  # pragma: no cover
+            assert not value.dtype.hasobject, f"NumPy arrays of objects can't be stored as binary data (dtype: {value.dtype})"
+            description = {"type": "numpy", "dtype": value.dtype.str, "shape": list(value.shape)}
+            data = memoryview(numpy.ascontiguousarray(value)).cast("B")
+        elif isinstance(value, array.array):
+            description = {"type": "array", "format": value.typecode, "byteorder": sys.byteorder}
+            data = memoryview(value).cast("B")
+        elif isinstance(value, memoryview):
+            description = {"type": "memoryview", "format": value.format, "shape": list(value.shape), "byteorder": sys.byteorder}
+            data = value.cast("B") if value.c_contiguous else memoryview(value.tobytes())
+        else:
+            description = {"type": type(value).__name__}
+            data = memoryview(value)
+        reference = {REFERENCE_KEY: hashlib.sha256(data).hexdigest(), BUFFER_KEY: description}
+        self._write(self.path(reference), data, None)
+        return reference
+
+    def _write(self, path: AnyStr, data: Union[bytes, memoryview], compression: Union[Compression, None]):
+        if os.path.exists(path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f, open_for_write(f, compression, self.compression_level) as out:
+            out.write(data)
+        os.replace(temp_path, path)
+
+    def get(self, reference: Dict[str, Any]) -> Any:
+        f"""Reads the value that {reference} refers to."""
+        if BUFFER_KEY in reference:
+            return self._get_buffer(self.path(reference), reference[BUFFER_KEY])
+        return json.loads(read_file(self.path(reference)))
+
+    def _get_buffer(self, path: AnyStr, description: Dict[str, Any]) -> Any:
+        f"""
+        Turns the binary data at {path} back into a value of the type in {description}. A 'memoryview' and a NumPy array refer to the memory-mapped file
+        instead of copying it, and are read-only; the map is closed once they, and any views of them, are released. Types that can't refer to a map,
+        like 'bytes' and 'array.array', are read from the file, so nothing is left mapped for them.
+        """
+        kind = description["type"]
+        assert description.get("byteorder", sys.byteorder) == sys.byteorder, f"The data at {path} was written on a machine with another byte order ({description['byteorder']})"
+        if kind in ("numpy", "memoryview"):
+            buffer = self._map(path)
+            if kind == "numpy":  # pragma: no cover
+                assert numpy is not None, f"The data at {path} is a NumPy array, but NumPy is not installed"
+                return numpy.frombuffer(buffer, dtype=numpy.dtype(description["dtype"])).reshape(description["shape"])
+            shape = description["shape"]
+            return buffer.cast(description["format"], shape) if len(shape) > 1 else buffer.cast(description["format"])
+        with open(path, "rb") as f:
+            data = f.read()
+        if kind == "array":
+            value = array.array(description["format"])
+            value.frombytes(data)
+            return value
+        if kind == "bytearray":
+            return bytearray(data)
+        return data
+
+    @staticmethod
+    def _map(path: AnyStr) -> memoryview:
+        if os.path.getsize(path) == 0:
+            # Empty files can't be memory-mapped
+            return memoryview(b"")
+        with open(path, "rb") as f:
+            # The map is only referred to by the view, so it's closed when the last view of it is released
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def resolve(self, value: Any) -> Any:
+        f"""Returns the value that {value} refers to if it's a reference, otherwise {value} itself."""
+        return self.get(value) if self.is_reference(value) else value
+
+    def prune(self, references: Iterable[Dict[str, str]]) -> List[AnyStr]:
+        f"""Removes the values that aren't referred to by {references} and returns the paths of the removed files."""
+        keep = {os.path.basename(self.path(reference)) for reference in references}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        removed = list()
+        for name in names:
+            if name.endswith((self.SUFFIX, self.BUFFER_SUFFIX)) and name not in keep:
+                path = os.path.join(self.directory, name)
+                os.remove(path)
+                removed.append(path)
+        return removed
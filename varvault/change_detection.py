@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import io
+import abc
+import os
+import time
+import hashlib
+import threading
+
+from typing import *
+
+# Filesystems that store the modification time of a file in nanoseconds take it from a clock that only ticks every few milliseconds:
+# every jiffy on Linux (at most 10 ms) and every 15.6 ms on Windows
+CLOCK_TICK_NS = 20_000_000
+
+
+def timestamp_granularity_ns(mtime_ns: int) -> int:
+    f"""
+    Returns the granularity of the modification time of a file in nanoseconds, as far as it can be told from {mtime_ns}: 2 seconds if it's a
+    multiple of 2 seconds, like on FAT, 1 second if it's a multiple of a second, like on ext3 or HFS+, and {CLOCK_TICK_NS} otherwise.
+    """
+    for granularity in (2_000_000_000, 1_000_000_000):
+        if mtime_ns % granularity == 0:
+            return granularity
+    return CLOCK_TICK_NS
+
+
+class HashingWriter(io.RawIOBase):
+    """Writes to a file and feeds everything written to a hash object, like the one a resource gets from 'ChangeDetector.write_hash'."""
+
+    def __init__(self, f: BinaryIO, hash: Any):
+        self.f = f
+        self.hash = hash
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self.hash.update(data)
+        return self.f.write(data)
+
+
+class ChangeDetector(abc.ABC):
+    """
+    Base class for detecting changes to a file. A change detector returns a state for a file, and if the state differs
+    from a state returned earlier, the file has changed. Live-update calls this on every access to the vault, so it should be cheap.
+    """
+
+    @abc.abstractmethod
+    def state(self, path: AnyStr) -> Hashable:
+        f"""Meant to return the state of the file at {path}. The state must change when the content of the file changes."""
+        raise NotImplementedError()
+
+    def write_hash(self) -> Any:
+        f"""
+        Returns a new hash object (see {hashlib}) that a resource feeds with the bytes it writes to the file and passes to {self.written} once the file
+        is written, so that the detector doesn't have to read the file to learn what's in it. Default is {None}, which means the detector has no use for it.
+        """
+        return None
+
+    def written(self, path: AnyStr, hash: Any) -> None:
+        f"""Called by a resource right after it has written the file at {path}, with the hash object from {self.write_hash} fed with what it wrote."""
+        pass
+
+
+class Md5ChangeDetector(ChangeDetector):
+    """Detects changes by hashing the entire file. Always correct, but reads the entire file every time."""
+
+    CHUNK_SIZE = 1 << 16
+
+    def new_hash(self) -> Any:
+        """Returns a new hash object whose hex digest of the content of a file is the state of the file."""
+        return hashlib.md5()
+
+    def state(self, path: AnyStr) -> str:
+        hash_md5 = self.new_hash()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                hash_md5.update(chunk)
+        return hash_md5.hexdigest()
+
+
+class StatChangeDetector(ChangeDetector):
+    """
+    Detects changes through 'os.stat' only; the state is the modification time, the size and the inode of the file.
+    This never reads the file, but it can miss a change that keeps the size of the file if it happens within the
+    timestamp granularity of the filesystem. Use TieredChangeDetector if that's not acceptable.
+    """
+
+    def state(self, path: AnyStr) -> Tuple[int, int, int]:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class TieredChangeDetector(ChangeDetector):
+    f"""
+    Detects changes through 'os.stat' first and only hashes the file when the stat is ambiguous:
+
+    - If the stat is identical to the last check and the file was modified well before the last check, the file hasn't changed. Nothing is read.
+    - If the size of the file has changed, the file has changed. Nothing is read, unless the file was modified so recently that the next
+      check will be ambiguous, in which case the file is hashed to have something to compare against.
+    - Otherwise, e.g. the file was replaced by a file of the same size, or it was modified so recently that another modification could have
+      happened within the timestamp granularity of the filesystem, the file is hashed and compared to the last hash.
+
+    A resource that writes the file hashes what it writes (see {ChangeDetector.write_hash}), so the check right after its own write needs nothing but the stat.
+
+    The state is a version number that is increased every time the file is found to have changed.
+    """
+
+    def __init__(self, timestamp_granularity: float = None, hasher: ChangeDetector = None):
+        f"""
+        :param timestamp_granularity: Optional. The granularity of the modification time of the filesystem in seconds. A file that was modified
+         less than this long before it was checked is hashed on the next check as well. Default is the granularity told by the modification time
+         of the file, see {timestamp_granularity_ns}.
+        :param hasher: Optional. The {ChangeDetector} used when the stat is ambiguous. Default is {Md5ChangeDetector}.
+        """
+        self.timestamp_granularity_ns = int(timestamp_granularity * 1e9) if timestamp_granularity is not None else None
+        self.hasher = hasher or Md5ChangeDetector()
+        self.hashes = 0
+        self._signature = None
+        self._racy = True
+        self._digest = None
+        self._written = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _stat(self, path: AnyStr) -> Tuple[Tuple[int, int, int], bool]:
+        st = os.stat(path)
+        checked_at = time.time_ns()
+        granularity_ns = self.timestamp_granularity_ns if self.timestamp_granularity_ns is not None else timestamp_granularity_ns(st.st_mtime_ns)
+        return (st.st_mtime_ns, st.st_size, st.st_ino), checked_at - st.st_mtime_ns < granularity_ns
+
+    def write_hash(self) -> Any:
+        # Only a hasher that hashes the bytes of the file can hash what is written instead
+        return self.hasher.new_hash() if isinstance(self.hasher, Md5ChangeDetector) else None
+
+    def written(self, path: AnyStr, hash: Any) -> None:
+        f"""
+        Records the digest of what was just written to the file at {path}. The next check trusts it if the stat is unchanged, which is as safe
+        as hashing the file right after it was written; checks after that hash the file as long as it was modified recently.
+        """
+        signature, racy = self._stat(path)
+        digest = hash.hexdigest()
+        with self._lock:
+            if digest != self._digest:
+                self._version += 1
+            self._signature = signature
+            self._racy = racy
+            self._digest = digest
+            self._written = signature
+
+    def state(self, path: AnyStr) -> int:
+        signature, racy = self._stat(path)
+        with self._lock:
+            written, self._written = self._written, None
+            if signature == self._signature and (not self._racy or signature == written):
+                return self._version
+            if self._signature is not None and signature[1] != self._signature[1] and not racy:
+                # The file has changed for sure, and the next check can rely on the stat alone
+                digest = None
+            else:
+                digest = self.hasher.state(path)
+                self.hashes += 1
+            if digest is None or digest != self._digest:
+                self._version += 1
+            self._signature = signature
+            self._racy = racy
+            self._digest = digest
+            return self._version
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import abc
+import json
+import pickle
+import marshal
+
+from typing import *
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+HEADER_PREFIX = b"#varvault:codec="
+
+
+class Codec(abc.ABC):
+    """
+    Base class for codecs that turn a vault into bytes and back. Resources that store the vault as a single blob, like JsonResource, use a codec
+    to serialize it, which makes it possible to trade the readability of pretty JSON for speed or size.
+
+    Files written with a codec that doesn't write JSON start with a header line that names the codec, so any resource can tell how to read them.
+    JSON is written without a header and stays plain JSON.
+    """
+
+    # The name of the codec, which is written in the header
+    name: str = None
+
+    # The codec writes JSON, which means no header is written and any JSON codec can read what it writes
+    json = False
+
+    # The codec is safe to use on data that isn't trusted. Files written with a codec that isn't safe are only read by resources that use that codec
+    safe = True
+
+    # The codec can serialize the value of each key on its own, see 'encode_fragment' and 'join'
+    supports_fragments = False
+
+    @abc.abstractmethod
+    def encode(self, data: Dict) -> bytes:
+        f"""Meant to serialize {data} to bytes."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def decode(self, raw: bytes) -> Dict:
+        f"""Meant to deserialize {raw} written by {self.encode}."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def encode_value(self, value: Any) -> bytes:
+        f"""Meant to serialize a single {value} to bytes, for resources that store each value on its own."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def decode_value(self, raw: bytes) -> Any:
+        f"""Meant to deserialize a single value written by {self.encode_value}."""
+        raise NotImplementedError()
+
+    def writable(self, obj: Dict) -> bool:
+        f"""Returns a bool that says if {obj} can be serialized by the codec."""
+        try:
+            self.encode(obj)
+            return True
+        except (TypeError, ValueError, OverflowError, AttributeError, pickle.PicklingError):
+            return False
+
+    def encode_fragment(self, value: Any) -> str:
+        f"""Serializes a single value so that it can be put in the output by {self.join}. Only for codecs that support fragments."""
+        raise NotImplementedError()
+
+    def join(self, fragments: Iterable[Tuple[str, str]]) -> str:
+        f"""Assembles the output from pairs of keys and fragments returned by {self.encode_fragment}. Only for codecs that support fragments."""
+        return "".join(self.iter_join(fragments))
+
+    def iter_join(self, fragments: Iterable[Tuple[str, str]]) -> Iterator[str]:
+        f"""Like {self.join}, but yields the output in pieces so that it can be written as a stream. Only for codecs that support fragments."""
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return f"{type(self).__name__}(name={self.name})"
+
+
+class JsonCodec(Codec):
+    f"""Serializes the vault as JSON through {json}. With an indent, the output is the same as 'json.dump(vault, f, indent=indent)'."""
+
+    json = True
+    supports_fragments = True
+
+    def __init__(self, indent: Union[int, None] = 2, name: str = "json"):
+        f"""
+        :param indent: The indent of the JSON. Default is 2. With {None}, the JSON is written as compactly as possible.
+        :param name: The name of the codec.
+        """
+        self.indent = indent
+        self.name = name
+        if indent is None:
+            self.separators = (",", ":")
+            self._padding = None
+            self._open, self._item, self._close = "{", ",", "}"
+        else:
+            self.separators = (",", ": ")
+            self._padding = "\n" + " " * indent
+            self._open, self._item, self._close = "{" + self._padding, "," + self._padding, "\n}"
+
+    def writable(self, obj: Dict) -> bool:
+        # Without an indent, json uses its C encoder, which accepts the same values and is several times faster
+        try:
+            json.dumps(obj)
+            return True
+        except (TypeError, ValueError, OverflowError):
+            return False
+
+    def encode(self, data: Dict) -> bytes:
+        return json.dumps(data, indent=self.indent, separators=self.separators).encode()
+
+    def decode(self, raw: bytes) -> Dict:
+        return json.loads(raw)
+
+    def encode_value(self, value: Any) -> bytes:
+        # A value on its own is never read by a human, so it's always compact
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def decode_value(self, raw: bytes) -> Any:
+        return json.loads(raw)
+
+    def encode_fragment(self, value: Any) -> str:
+        fragment = json.dumps(value, indent=self.indent, separators=self.separators)
+        return fragment.replace("\n", self._padding) if self._padding else fragment
+
+    def iter_join(self, fragments: Iterable[Tuple[str, str]]) -> Iterator[str]:
+        first = True
+        for key, fragment in fragments:
+            yield f"{self._open if first else self._item}{json.dumps(key)}{self.separators[1]}{fragment}"
+            first = False
+        yield "{}" if first else self._close
+
+
+class OrjsonCodec(Codec):  # pragma: no cover
+    """Serializes the vault as JSON through orjson, which is several times faster than the standard library. Requires orjson to be installed."""
+
+    name = "orjson"
+    json = True
+
+    def __init__(self, indent: bool = True):
+        f"""
+        :param indent: Indent the JSON by 2 spaces, like the default {JsonCodec}. Default is {True}.
+        """
+        assert orjson is not None, "orjson is not installed; install it to use the orjson codec (pip install orjson)"
+        self.option = orjson.OPT_INDENT_2 if indent else 0
+
+    def encode(self, data: Dict) -> bytes:
+        # orjson only accepts keys that are exactly of type str, and keys are of type Key
+        return orjson.dumps({str(key): value for key, value in data.items()}, option=self.option)
+
+    def decode(self, raw: bytes) -> Dict:
+        return orjson.loads(raw)
+
+    def encode_value(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    def decode_value(self, raw: bytes) -> Any:
+        return orjson.loads(raw)
+
+
+class PickleCodec(Codec):
+    """
+    Serializes the vault through pickle, which can store any picklable object, not just what JSON can represent.
+    Loading a pickle can run arbitrary code, so only use this for files that you trust.
+    """
+
+    name = "pickle"
+    safe = False
+
+    def encode(self, data: Dict) -> bytes:
+        return pickle.dumps({str(key): value for key, value in data.items()}, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, raw: bytes) -> Dict:
+        return pickle.loads(raw)
+
+    def encode_value(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode_value(self, raw: bytes) -> Any:
+        return pickle.loads(raw)
+
+
+class MarshalCodec(Codec):
+    f"""
+    Serializes the vault through {marshal}, which is the fastest codec, but only handles plain builtin types (not even subclasses of them),
+    and the format may change between versions of Python.
+    """
+
+    name = "marshal"
+
+    def encode(self, data: Dict) -> bytes:
+        return marshal.dumps({str(key): value for key, value in data.items()})
+
+    def decode(self, raw: bytes) -> Dict:
+        return marshal.loads(raw)
+
+    def encode_value(self, value: Any) -> bytes:
+        return marshal.dumps(value)
+
+    def decode_value(self, raw: bytes) -> Any:
+        return marshal.loads(raw)
+
+
+CODECS: Dict[str, Callable[[], Codec]] = {
+    "json": lambda: JsonCodec(indent=2, name="json"),
+    "json-compact": lambda: JsonCodec(indent=None, name="json-compact"),
+    "pickle": PickleCodec,
+    "marshal": MarshalCodec,
+}
+if orjson is not None:  # pragma: no cover
+    CODECS["orjson"] = OrjsonCodec
+
+
+def get_codec(codec: Union[str, Codec, None]) -> Codec:
+    f"""Returns the codec named {codec} (see {CODECS}), or {codec} itself if it's already a {Codec}. {None} means pretty JSON."""
+    if codec is None:
+        codec = "json"
+    if isinstance(codec, Codec):
+        return codec
+    if codec not in CODECS:
+        missing = " (orjson is not installed)" if codec == "orjson" else ""
+        raise ValueError(f"Unknown codec: {codec}{missing}. Must be one of the following: {list(CODECS)}")
+    return CODECS[codec]()
+
+
+def encode_with_header(codec: Codec, data: Dict) -> bytes:
+    f"""Serializes {data} through {codec} and puts a header in front of it unless {codec} writes JSON."""
+    payload = codec.encode(data)
+    if codec.json:
+        return payload
+    return HEADER_PREFIX + codec.name.encode() + b"\n" + payload
+
+
+def header(raw: bytes) -> Union[str, None]:
+    f"""Returns the name of the codec in the header of {raw}, or {None} if there is no header."""
+    if not raw.startswith(HEADER_PREFIX):
+        return None
+    return raw[len(HEADER_PREFIX):raw.index(b"\n")].decode()
+
+
+def codec_for(name: str, codec: Codec) -> Codec:
+    f"""
+    Returns the codec to read data written with the codec named {name} by a resource that uses {codec}.
+    A codec that isn't safe is only returned if it's {codec}.
+    """
+    if name == codec.name:
+        return codec
+    named = get_codec(name)
+    if not named.safe:
+        raise ValueError(f"The data was written with the codec '{name}', which is not safe to read unless the resource uses it (the resource uses '{codec.name}')")
+    return named
+
+
+def decode_with_header(codec: Codec, raw: bytes) -> Dict:
+    f"""
+    Deserializes {raw} through the codec named in its header, or as JSON if there is no header. {codec} is the codec of the resource; it's used
+    for JSON if it's a JSON codec, and a codec that isn't safe is only used if it's {codec}.
+    """
+    name = header(raw)
+    if name is None:
+        return (codec if codec.json else get_codec("json")).decode(raw)
+    return codec_for(name, codec).decode(raw[raw.index(b"\n") + 1:])
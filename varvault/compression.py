@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import io
+import bz2
+import gzip
+import lzma
+import zlib
+import contextlib
+
+from typing import *
+
+
+CHUNK_SIZE = 1 << 16
+
+
+class Compression:
+    """
+    A compression format for resources that are stored as files. Compressed files are recognized by their magic bytes when they are read.
+    Data is compressed and decompressed in chunks, so the whole of the compressed data is never in memory, but a file that is read in full
+    is decompressed in full; only readers that parse what they read as they go, like 'JsonResource' does for compressed JSON files, keep memory low.
+    """
+
+    # The name of the compression format
+    name: str = None
+
+    # The bytes that files compressed with this format start with
+    magic: Tuple[bytes, ...] = ()
+
+    # The default compression level
+    default_level: int = None
+
+    def writer(self, f: BinaryIO, level: int = None) -> BinaryIO:
+        f"""Meant to return a writable file object that compresses everything written to it into {f}, at {level} if given."""
+        raise NotImplementedError()
+
+    def reader(self, f: BinaryIO) -> BinaryIO:
+        f"""Meant to return a readable file object that decompresses what is read from {f}."""
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return f"{type(self).__name__}(name={self.name})"
+
+
+class GzipCompression(Compression):
+    name = "gzip"
+    magic = (b"\x1f\x8b",)
+    default_level = 6
+
+    def writer(self, f: BinaryIO, level: int = None) -> BinaryIO:
+        # mtime is fixed so that the same vault always compresses to the same bytes
+        return gzip.GzipFile(fileobj=f, mode="wb", compresslevel=self.default_level if level is None else level, mtime=0)
+
+    def reader(self, f: BinaryIO) -> BinaryIO:
+        return gzip.GzipFile(fileobj=f, mode="rb")
+
+
+class Bz2Compression(Compression):
+    name = "bz2"
+    magic = (b"BZh",)
+    default_level = 9
+
+    def writer(self, f: BinaryIO, level: int = None) -> BinaryIO:
+        return bz2.BZ2File(f, mode="wb", compresslevel=self.default_level if level is None else level)
+
+    def reader(self, f: BinaryIO) -> BinaryIO:
+        return bz2.BZ2File(f, mode="rb")
+
+
+class LzmaCompression(Compression):
+    name = "lzma"
+    magic = (b"\xfd7zXZ\x00",)
+    default_level = 6
+
+    def writer(self, f: BinaryIO, level: int = None) -> BinaryIO:
+        return lzma.LZMAFile(f, mode="wb", format=lzma.FORMAT_XZ, preset=self.default_level if level is None else level)
+
+    def reader(self, f: BinaryIO) -> BinaryIO:
+        return lzma.LZMAFile(f, mode="rb")
+
+
+class ZlibCompression(Compression):
+    f"""Raw {zlib} streams, which have the smallest header of the formats and are the fastest to decompress."""
+
+    name = "zlib"
+    # The second byte of a zlib header depends on the compression level
+    magic = (b"\x78\x01", b"\x78\x5e", b"\x78\x9c", b"\x78\xda")
+    default_level = 6
+
+    def writer(self, f: BinaryIO, level: int = None) -> BinaryIO:
+        return _ZlibWriter(f, self.default_level if level is None else level)
+
+    def reader(self, f: BinaryIO) -> BinaryIO:
+        return _ZlibReader(f)
+
+
+class _ZlibWriter(io.RawIOBase):
+    def __init__(self, f: BinaryIO, level: int):
+        self.f = f
+        self.compressor = zlib.compressobj(level)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self.f.write(self.compressor.compress(data))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.f.write(self.compressor.flush())
+        super(_ZlibWriter, self).close()
+
+
+class _ZlibReader(io.RawIOBase):
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.decompressor = zlib.decompressobj()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = b""
+        while not data and not self.decompressor.eof:
+            chunk = self.decompressor.unconsumed_tail or self.f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            data = self.decompressor.decompress(chunk, len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+COMPRESSIONS: Dict[str, Compression] = {compression.name: compression for compression in (GzipCompression(), Bz2Compression(), LzmaCompression(), ZlibCompression())}
+
+# The longest magic of any format; this many bytes are enough to detect the format of a file
+MAGIC_SIZE = max(len(magic) for compression in COMPRESSIONS.values() for magic in compression.magic)
+
+
+def get_compression(compression: Union[str, Compression, None]) -> Union[Compression, None]:
+    f"""Returns the compression format named {compression} (see {COMPRESSIONS}), or {compression} itself if it's already a {Compression} or {None}."""
+    if compression is None or isinstance(compression, Compression):
+        return compression
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}. Must be one of the following: {list(COMPRESSIONS)}")
+    return COMPRESSIONS[compression]
+
+
+def detect(head: bytes) -> Union[Compression, None]:
+    f"""Returns the compression format that {head}, the first bytes of a file, was compressed with, or {None} if it isn't compressed."""
+    for compression in COMPRESSIONS.values():
+        if head.startswith(compression.magic):
+            return compression
+    return None
+
+
+def read_file(path: AnyStr) -> bytes:
+    f"""Reads the file at {path} and decompresses it if it's compressed with any of the known formats. The whole of the decompressed data is returned."""
+    with open_file(path) as f:
+        return f.read()
+
+
+@contextlib.contextmanager
+def open_file(path: AnyStr) -> ContextManager[BinaryIO]:
+    f"""Opens the file at {path} for reading as a stream that decompresses it as it's read if it's compressed with any of the known formats."""
+    with open(path, "rb") as f:
+        compression = detect(f.read(MAGIC_SIZE))
+        f.seek(0)
+        if compression is None:
+            yield f
+        else:
+            with compression.reader(f) as reader:
+                yield reader
+
+
+def open_for_write(f: BinaryIO, compression: Union[Compression, None], level: int = None) -> BinaryIO:
+    f"""Returns a file object that writes to {f}, through {compression} at {level} if {compression} is given. Closing it doesn't close {f}."""
+    if compression is None:
+        return _Uncompressed(f)
+    return compression.writer(f, level)
+
+
+class _Uncompressed(io.RawIOBase):
+    def __init__(self, f: BinaryIO):
+        self.f = f
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        return self.f.write(data)
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import os
+import threading
+import urllib.parse
+import concurrent.futures
+
+from typing import *
+
+from .codec import Codec, codec_for
+from .resource import BaseResource, ResourceModes, ResourceNotFoundError
+from .utils import is_immutable
+
+# Returned for a file that was removed after the directory was scanned
+_REMOVED = object()
+
+
+class DirectoryResource(BaseResource):
+    """
+    A resource that stores the vault in a directory with one file per key, named after the key and the codec the value was written with.
+    Each file is written to a temporary file first and renamed over the old one, so a reader never sees a half-written value, and a write
+    only touches the files of the keys that have changed. Values that never change after they were written are never written again.
+
+    Files are read on a pool of threads, and values for keys that aren't in the keyring are never read at all. Changes are detected through a
+    stat of every file in the directory, so nothing is read to find out if the vault has changed. Like 'StatChangeDetector', this can miss a change
+    that keeps the size of a file if it happens within the timestamp granularity of the filesystem.
+
+    This suits vaults where a few small keys change often and many large keys are written once.
+    """
+
+    supports_delta_writes = True
+
+    def __init__(self, path: AnyStr, mode: Union[Literal["r", "w", "a", "r+", "w+", "a+"], ResourceModes] = "r", codec: Union[str, Codec] = "json",
+                 max_staleness: float = 0, shared: bool = False, workers: int = None):
+        f"""
+        Creates the DirectoryResource object.
+        :param path: The path to the directory.
+        :param mode: Sets the mode of the resource. The mode can be one of the following: 'r', 'w', 'a', 'r+', 'w+', 'a+'.
+        r: Read from existing resource (default)
+        w: Create new resource and ignore existing resource and write to it
+        a: Create a new resource if none exist, otherwise read from and write to existing resource
+        r+: Read from existing resource and perform live-update
+        w+: Create new resource and ignore existing resource and write to it, and perform live-update
+        a+: Create a new resource if none exist, otherwise read from and write to existing resource, and perform live-update
+        :param codec: Optional. The {Codec}, or the name of the codec, used to encode each value: 'json' (default), 'orjson' (if installed), 'marshal' or 'pickle'.
+         The codec is part of the name of each file, so a directory can be read regardless of the codec of the resource, except that values written with
+         'pickle' are only read by resources that use 'pickle'.
+        :param max_staleness: Optional. The number of seconds that data read through live-update may be out of date; see {BaseResource}.
+        :param shared: Optional. Share the lock and the data read from the directory with other shared resources for the same path; see {BaseResource}.
+        :param workers: Optional. The number of threads that read and write files. Default is {None}, which means the default of
+         {concurrent.futures.ThreadPoolExecutor}. With 1, files are read and written one at a time on the calling thread.
+        """
+        self.created = False
+        self.workers = workers
+        # The encoded values by key for values that can't change in place, together with the values they were encoded from, so that a value that was
+        # checked by 'writable' isn't encoded again
+        self.encoded: Dict[str, Tuple[Any, bytes]] = dict()
+        # The values written through this resource that can change in place, together with what was written for them. The vault only passes the keys
+        # that have been set to 'do_write_delta', so these are checked on every write to catch values that have been changed without being set again.
+        self.mutable: Dict[str, Tuple[Any, bytes]] = dict()
+        super(DirectoryResource, self).__init__(path, mode, max_staleness=max_staleness, shared=shared, codec=codec)
+
+    @property
+    def resource(self) -> Union[AnyStr, None]:
+        """Returns the path to the directory once the resource has been created."""
+        return self.raw_path if self.created else None
+
+    @property
+    def path(self) -> AnyStr:
+        """Returns the path to the directory."""
+        return self.raw_path
+
+    @property
+    def state(self) -> Union[Tuple[int, int], None]:
+        """Returns the state of the vault, which is the number of files in the directory and a hash of their names, modification times, sizes and inodes"""
+        if not self.exists():
+            return None
+        entries = frozenset((entry.name, st.st_mtime_ns, st.st_size, st.st_ino) for entry, st in self._scan())
+        return len(entries), hash(entries)
+
+    def watched_files(self) -> Tuple[AnyStr, None]:
+        """Returns the directory itself, as every file in it belongs to the vault"""
+        return os.path.abspath(self.path), None
+
+    def create(self) -> None:
+        """Creates the directory if the mode says so. A new vault removes the values in an existing directory, like a new JSON file would."""
+        path = self.path
+        assert path, "Path is not defined"
+
+        if self.mode_properties.create:
+            os.makedirs(path, exist_ok=True)
+            if not self.mode_properties.load:
+                for entry, _ in self._scan():
+                    os.remove(entry.path)
+                self.encoded.clear()
+        elif not self.exists():
+            if not self.mode_properties.live_update:
+                raise ResourceNotFoundError(f"Unable to read from resource at {path} (mode is {self.mode})", self)
+            return
+        self.created = True
+
+    def filename(self, key: str, codec: str = None) -> str:
+        f"""
+        Returns the name of the file for {key} written with the codec named {codec}, or the codec of the resource. The key is quoted so that any key
+        is a valid name, and a leading dot is quoted too, since names that start with a dot are temporary files.
+        """
+        name = urllib.parse.quote(str(key), safe="")
+        if name.startswith("."):
+            name = "%2E" + name[1:]
+        return f"{name}.{codec or self.codec.name}"
+
+    @staticmethod
+    def parse_filename(filename: str) -> Tuple[str, str]:
+        f"""Returns the key and the name of the codec of a file named by {DirectoryResource.filename}."""
+        name, codec = filename.rsplit(".", 1)
+        return urllib.parse.unquote(name), codec
+
+    def _scan(self) -> List[Tuple[os.DirEntry, os.stat_result]]:
+        # Temporary files start with a dot; a file that is removed while the directory is scanned is left out
+        entries = list()
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.startswith(".") or "." not in entry.name:
+                    continue
+                try:
+                    entries.append((entry, entry.stat()))
+                except FileNotFoundError:
+                    pass
+        return entries
+
+    def files(self) -> Dict[str, str]:
+        """Returns the names of the files in the directory by the keys they hold, in the order of the names."""
+        files = dict()
+        for entry, _ in sorted(self._scan(), key=lambda item: item[0].name):
+            key, _ = self.parse_filename(entry.name)
+            files[key] = entry.name
+        return files
+
+    def _map(self, function: Callable, items: List) -> List:
+        f"""Calls {function} for each of {items} on a pool of threads, and returns the results in the order of {items}."""
+        if len(items) <= 1 or self.workers == 1:
+            return [function(item) for item in items]
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            return list(executor.map(function, items))
+
+    def writable(self, obj: Dict) -> bool:
+        f"""
+        Checks if a key-value pair in a dict can be written to the directory by attempting to encode it through the codec of the resource. Nothing is
+        ever written through a resource that can't write, so nothing is encoded to check it. Values that can't be changed in place (see {is_immutable})
+        are cached and reused by {self.do_write_delta} for as long as the vault holds the same objects; other values are encoded on every write.
+        """
+        if not self.mode_properties.write:
+            return True
+        try:
+            for key, value in obj.items():
+                encoded = self.codec.encode_value(value)
+                if is_immutable(value):
+                    self.encoded[str(key)] = (value, encoded)
+            return True
+        except Exception:
+            return False
+
+    def _encode(self, key: str, value: Any) -> bytes:
+        cached = self.encoded.get(key)
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        encoded = self.codec.encode_value(value)
+        if is_immutable(value):
+            self.encoded[key] = (value, encoded)
+        else:
+            self.encoded.pop(key, None)
+        return encoded
+
+    def exists(self) -> bool:
+        """Returns a bool that says if the directory exists"""
+        return os.path.isdir(self.path)
+
+    def size(self) -> Union[int, None]:
+        """Returns the total size of the files in the directory in bytes"""
+        try:
+            return sum(st.st_size for _, st in self._scan())
+        except OSError:
+            return None
+
+    def _write_file(self, item: Tuple[str, bytes, Union[str, None], bool]):
+        key, data, old_filename, compare = item
+        filename = self.filename(key)
+        path = os.path.join(self.path, filename)
+        if compare and old_filename == filename and os.path.getsize(path) == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return
+        temp_path = os.path.join(self.path, f".{filename}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        if old_filename is not None and old_filename != filename:
+            # The value was written with another codec before
+            os.remove(os.path.join(self.path, old_filename))
+
+    def do_write(self, vault: dict) -> None:
+        """Writes the vault to the directory. Files whose content hasn't changed are left alone, and files for keys that aren't in the vault are removed."""
+        files = self.files()
+        self.mutable.clear()
+        items = [(str(key), self._encode(str(key), value), files.get(str(key)), True) for key, value in vault.items()]
+        self._map(self._write_file, items)
+        self._track(vault, items)
+        removed = set(files).difference(key for key, _, _, _ in items)
+        self._remove(files, removed)
+
+    def do_write_delta(self, upserts: dict, deletes: Iterable[Any]) -> None:
+        f"""
+        Writes the files of the keys that have changed and removes the files of the keys that have been removed. Values written earlier that can be
+        changed in place are encoded again, and written if they have been (see 'mutable'). Other files are left alone.
+        """
+        files = self.files()
+        deletes = [str(key) for key in deletes]
+        upserts = {str(key): value for key, value in upserts.items()}
+        items = [(key, self._encode(key, value), files.get(key), False) for key, value in upserts.items()]
+        for key, (value, written) in list(self.mutable.items()):
+            if key not in upserts and key not in deletes:
+                encoded = self.codec.encode_value(value)
+                if encoded != written:
+                    upserts[key] = value
+                    items.append((key, encoded, files.get(key), False))
+        self._map(self._write_file, items)
+        self._track(upserts, items)
+        self._remove(files, deletes)
+
+    def _track(self, values: Dict, items: List[Tuple[str, bytes, Union[str, None], bool]]):
+        for (key, encoded, _, _), value in zip(items, values.values()):
+            if is_immutable(value):
+                self.mutable.pop(key, None)
+            else:
+                self.mutable[key] = (value, encoded)
+
+    def _remove(self, files: Dict[str, str], keys: Iterable[str]):
+        for key in keys:
+            self.encoded.pop(key, None)
+            self.mutable.pop(key, None)
+            if key in files:
+                try:
+                    os.remove(os.path.join(self.path, files[key]))
+                except FileNotFoundError:
+                    pass
+
+    def _read_file(self, filename: str) -> Any:
+        _, codec = self.parse_filename(filename)
+        try:
+            with open(os.path.join(self.path, filename), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return _REMOVED
+        return codec_for(codec, self.codec).decode_value(data)
+
+    def do_read(self) -> Dict:
+        """Reads the vault from the directory by reading every file"""
+        return dict(self.do_read_items())
+
+    def do_read_items(self, wanted: Callable[[str], bool] = None) -> Iterator[Tuple[str, Any]]:
+        f"""Reads the vault from the directory; the files are read on a pool of threads, and files for keys that {wanted} returns {False} for are never read"""
+        files = [(key, filename) for key, filename in self.files().items() if wanted is None or wanted(key)]
+        values = self._map(self._read_file, [filename for _, filename in files])
+        return ((key, value) for (key, _), value in zip(files, values) if value is not _REMOVED)
+
+    def read_key(self, key: str) -> Any:
+        f"""Reads the value for {key} without reading the rest of the vault. Raises {KeyError} if the key isn't in the directory."""
+        values = self.read_keys([key])
+        if str(key) not in values:
+            raise KeyError(f"Key {key} is not in the directory at {self.path}")
+        return values[str(key)]
+
+    def read_keys(self, keys: Iterable[str]) -> Dict[str, Any]:
+        f"""Reads the values for {keys} without reading the rest of the vault. Keys that aren't in the directory are left out."""
+        if not self.exists():
+            return {}
+        keys = {str(key) for key in keys}
+        return dict(self.do_read_items(lambda key: key in keys))
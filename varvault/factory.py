@@ -34,14 +34,12 @@ def create(*flags: Flags,
     extra_keys_cleaned = {str(v.key_name): v for _, v in extra_keys.items()}
     extra_keys = extra_keys_cleaned
     initial_vars = None
+    load_stats = None
     if resource and resource.mode_properties.load:
-        vault_file_data = resource.read()
-
-        assert isinstance(vault_file_data, dict), f"It appears we were not able to load a Dict from {resource}. Are you sure this is a valid resource? (content={vault_file_data})"
-        keys_in_keyring = keyring.get_keys()
-        keys_in_keyring.update(extra_keys)
-        keys_in_file = vault_file_data.keys()
-        _keys_not_in_keyring = [k for k in keys_in_file if k not in keys_in_keyring]
+        keys_in_keyring = keyring.decoder(extra_keys)
+        # The resource is read once; values are validated and built as they are read and keys that aren't in the keyring are skipped
+        initial_vars, load_stats = resource.load(keys_in_keyring, lazy=Flags.is_set(Flags.lazy_load, *flags), parallel=Flags.is_set(Flags.parallel_load, *flags))
+        _keys_not_in_keyring = load_stats.keys_not_in_keyring
         if _keys_not_in_keyring and not Flags.is_set((Flags.ignore_keys_not_in_keyring,), *flags) and not resource.mode_properties.read_only:
             raise ValueError(f"Some keys in the resource were not in the keyring: {_keys_not_in_keyring}\n"
                              f"You can set to ignore this through the flag {Flags.ignore_keys_not_in_keyring}, "
@@ -51,7 +49,6 @@ def create(*flags: Flags,
                           f"but you have set to ignore keys found that are not in the keyring. "
                           f"These ignored keys will not be loaded to the vault.\n"
                           f"Keys not in the keyring: {_keys_not_in_keyring}")
-        initial_vars = resource.create_mv(**keys_in_keyring)
 
     vault = VarVault(*flags,
                      keyring=keyring,
@@ -60,5 +57,6 @@ def create(*flags: Flags,
                      logger=logger,
                      initial_vars=initial_vars,
                      **extra_keys)
+    vault.load_stats = load_stats
 
     return vault
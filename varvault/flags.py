@@ -79,4 +79,14 @@ class Flags(enum.Enum):
         intermediate['key'] = 'value'
         return intermediate
     """
-    output_key_replaces_input_key = enum.auto()
\ No newline at end of file
+    output_key_replaces_input_key = enum.auto()
+
+    f"""Flag to tell varvault to load the values in the resource lazily when the vault is created. The vault then holds the raw values read from the resource, and each value is
+    validated and built (e.g. through 'VaultStructBase.create') the first time it's accessed, so creating a vault from a large resource only costs what the keys that are used cost.
+    Note that a value in the resource that isn't valid for its key causes an error when the key is accessed rather than when the vault is created. Can only be defined for the entire vault."""
+    lazy_load = enum.auto()
+
+    f"""Flag to tell varvault to build the values for keys that are VaultStructs in a pool of processes when the vault is created, which pays off when building them is expensive.
+    The values are only built in parallel if there are enough of them and the resource is large enough (see 'varvault.parallel'), and the struct classes must be picklable.
+    Errors from building the values are collected for all keys and raised together as a 'varvault.LoadError'. Has no effect together with 'Flags.lazy_load'. Can only be defined for the entire vault."""
+    parallel_load = enum.auto()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import enum
+import logging
+import threading
+
+from typing import *
+
+
+class Hooks(enum.Enum):
+    """Events in a vault that callbacks can be registered to through a vault's hook registry."""
+
+    # Emitted when the pre-call stage of a decorated function is done, i.e. when the input keys have been fetched from the vault. 'keys' are the input keys.
+    pre_call = enum.auto()
+
+    # Emitted when the post-call stage of a decorated function is done, i.e. when the return values have been inserted into the vault. 'keys' are the output keys.
+    post_call = enum.auto()
+
+    # Emitted when a MiniVault has been inserted into the vault through 'insert' or 'insert_minivault'. 'keys' are the inserted keys.
+    insert = enum.auto()
+
+    # Emitted when the vault has been written to the resource. 'keys' are the written keys and 'bytes' is the size of the resource after the write, if known.
+    write = enum.auto()
+
+    # Emitted when the vault has been reloaded from the resource through live-update. 'keys' are the reloaded keys and 'bytes' is the size of the resource, if known.
+    reload = enum.auto()
+
+    # Emitted when a call to a decorated function is done, whether it failed or not. 'keys' are the input keys followed by the output keys,
+    # 'duration' is the time of the entire call including the pre- and post-call stages and 'extra' says if the call 'failed'.
+    call = enum.auto()
+
+    # Emitted when the lock of the vault has been acquired. 'duration' is the time spent waiting for the lock and 'keys' are the keys the lock was needed for.
+    lock_wait = enum.auto()
+
+    # Emitted from a thread running a threaded automatic function when the thread is about to stop. 'duration' is the lifetime of the thread and 'extra' says if the function 'failed'.
+    thread = enum.auto()
+
+    # Emitted when 'get' is done. 'keys' are the keys that were requested.
+    get = enum.auto()
+
+    # Emitted when live-update has checked if the resource has changed. 'duration' is the time of the check and 'extra' says if the resource had 'changed'.
+    state_check = enum.auto()
+
+    # Emitted when an automatic function has been dispatched. 'name' is the function and 'keys' are the keys that triggered it.
+    # For threaded automatics, 'duration' is the time it took to start the thread, otherwise it's the time it took to run the function.
+    # 'extra' says if the function was 'threaded' and if it 'failed'; a threaded function never fails here, see 'thread' instead.
+    dispatch = enum.auto()
+
+
+class HookEvent:
+    """The payload sent to callbacks registered for a hook. Times are in seconds and 'start' is taken from 'time.perf_counter'."""
+
+    __slots__ = ("hook", "start", "duration", "name", "keys", "bytes", "thread_id", "extra")
+
+    def __init__(self, hook: Hooks, start: float, duration: float, name: str = None, keys: Iterable = (), bytes: int = None, **extra):
+        self.hook = hook
+        self.start = start
+        self.duration = duration
+        self.name = name
+        self.keys = tuple(keys)
+        self.bytes = bytes
+        self.thread_id = threading.get_ident()
+        self.extra = extra
+
+    @property
+    def key_count(self) -> int:
+        return len(self.keys)
+
+    def __repr__(self):
+        return f"HookEvent(hook={self.hook.name}, name={self.name}, duration={self.duration:.6f}, keys={self.keys}, bytes={self.bytes}, extra={self.extra})"
+
+
+class HookRegistry:
+    f"""
+    A registry of callbacks for {Hooks}. Callbacks are called with a {HookEvent} on the thread that emitted it.
+
+    The registry is designed to have no overhead when it's empty; the vault checks if a hook has any callbacks
+    (``hook in registry``) before it builds the {HookEvent}, so nothing is done for hooks without callbacks.
+    Exceptions raised by callbacks are logged and then ignored to not break the vault.
+    """
+
+    def __init__(self, logger: logging.Logger = None):
+        self.logger = logger
+        self._callbacks: Dict[Hooks, List[Callable[[HookEvent], Any]]] = dict()
+
+    def register(self, hook: Hooks, callback: Callable[[HookEvent], Any]) -> Callable[[HookEvent], Any]:
+        f"""Registers {callback} to be called whenever {hook} is emitted. Returns {callback} to make it possible to use this as a decorator through {self.on}."""
+        assert isinstance(hook, Hooks), f"Hook {hook} is not of type {Hooks} (type: {type(hook)})"
+        assert callable(callback), f"Callback {callback} is not callable"
+        # Replace the list rather than appending to it so that emit never iterates a list that is being changed
+        self._callbacks[hook] = self._callbacks.get(hook, []) + [callback]
+        return callback
+
+    def on(self, hook: Hooks) -> Callable:
+        f"""Decorator to register the decorated function as a callback for {hook}."""
+        return lambda callback: self.register(hook, callback)
+
+    def unregister(self, hook: Hooks, callback: Callable[[HookEvent], Any]):
+        f"""Unregisters {callback} from {hook}."""
+        callbacks = [c for c in self._callbacks.get(hook, []) if c != callback]
+        if callbacks:
+            self._callbacks[hook] = callbacks
+        else:
+            self._callbacks.pop(hook, None)
+
+    def clear(self):
+        """Unregisters all callbacks for all hooks."""
+        self._callbacks.clear()
+
+    def __contains__(self, hook: Hooks) -> bool:
+        return hook in self._callbacks
+
+    def __bool__(self):
+        return bool(self._callbacks)
+
+    def emit(self, event: HookEvent):
+        """Calls all callbacks registered for the hook of the event."""
+        for callback in self._callbacks.get(event.hook, ()):
+            try:
+                callback(event)
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Callback {callback} for hook {event.hook.name} failed: {e}")
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import re
+import json
+import codecs
+
+from typing import *
+
+CHUNK_SIZE = 1 << 16
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+STRUCTURAL = re.compile(r'[{}\[\]"]')
+SCALAR_END = re.compile(r"[,}\]\s]")
+
+
+class _Scanner:
+    """Finds the extent of JSON values in a stream that is read in chunks. Only the text from the current value and onwards is kept in memory."""
+
+    def __init__(self, f: Union[TextIO, BinaryIO], chunk_size: int, head: bytes = b""):
+        self.f = f
+        self.chunk_size = chunk_size
+        # Binary streams are decoded as UTF-8 as they are read; a character may be split between two chunks
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = self.decoder.decode(head)
+        self.pos = 0
+        self.eof = False
+
+    def more(self, size: int = None) -> bool:
+        chunk = self.f.read(size or self.chunk_size)
+        if isinstance(chunk, bytes):
+            self.buffer += self.decoder.decode(chunk, final=not chunk)
+        else:
+            self.buffer += chunk
+        self.eof = not chunk
+        return bool(chunk)
+
+    def more_or_fail(self, what: str):
+        if not self.more():
+            raise ValueError(f"Unexpected end of the JSON document while reading {what}")
+
+    def compact(self):
+        f"""Drops the text that has been consumed, once there's enough of it to be worth copying the rest. Positions are relative to the start of the buffer, so this is only done between values."""
+        if self.pos > self.chunk_size:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+
+    def decode(self, raw_decode: Callable[[str, int], Tuple[Any, int]]) -> Any:
+        f"""Decodes the value at the current position through {raw_decode} and moves past it, reading more of the document until the value is complete."""
+        if self.buffer[self.pos] in "-0123456789":
+            # A number can be cut off anywhere, even where the start of it is a valid number, so make sure the entire number has been read
+            self.value_end(self.pos)
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise ValueError(f"Invalid JSON document: {e}") from e
+            # The value is read again from its start, so read twice as much each time to keep large values linear
+            self.more(size)
+            size *= 2
+
+    def skip_whitespace(self) -> bool:
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return True
+            if not self.more():
+                return False
+
+    def next_char(self, what: str) -> str:
+        if not self.skip_whitespace():
+            raise ValueError(f"Unexpected end of the JSON document while expecting {what}")
+        return self.buffer[self.pos]
+
+    def expect(self, chars: str, what: str) -> str:
+        char = self.next_char(what)
+        if char not in chars:
+            raise ValueError(f"Expected {what} at position {self.pos} of the buffer, found {char!r}")
+        self.pos += 1
+        return char
+
+    def string_end(self, start: int) -> int:
+        f"""Returns the position after the string that starts with the quote at {start}."""
+        i = start + 1
+        while True:
+            j = self.buffer.find('"', i)
+            if j == -1:
+                i = len(self.buffer)
+                self.more_or_fail("a string")
+                continue
+            # The quote is escaped if it's preceded by an odd number of backslashes
+            k = j - 1
+            while self.buffer[k] == "\\":
+                k -= 1
+            if (j - 1 - k) % 2 == 0:
+                return j + 1
+            i = j + 1
+
+    def value_end(self, start: int) -> int:
+        f"""Returns the position after the value that starts at {start}."""
+        char = self.buffer[start]
+        if char == '"':
+            return self.string_end(start)
+        if char in "{[":
+            depth = 0
+            i = start
+            while True:
+                match = STRUCTURAL.search(self.buffer, i)
+                if not match:
+                    i = len(self.buffer)
+                    self.more_or_fail("an object or an array")
+                    continue
+                char = match.group()
+                if char == '"':
+                    i = self.string_end(match.start())
+                    continue
+                depth += 1 if char in "{[" else -1
+                i = match.end()
+                if depth == 0:
+                    return i
+        while True:
+            match = SCALAR_END.search(self.buffer, start)
+            if match:
+                return match.start()
+            if not self.more():
+                return len(self.buffer)
+
+
+def iter_object(f: Union[TextIO, BinaryIO], wanted: Callable[[str], bool] = None, decoder: json.JSONDecoder = None, chunk_size: int = CHUNK_SIZE,
+                head: bytes = b"") -> Iterator[Tuple[str, Any]]:
+    f"""
+    Reads a JSON document that is an object from {f}, which is a text stream or a binary stream of UTF-8, and yields its keys and decoded values one at a time,
+    in the order they appear in the document. The document is read in chunks of {chunk_size} characters or bytes and only the text of the current value is kept,
+    so the memory used is about the size of the largest value rather than the size of the document. Values for keys that {wanted} returns {False} for are
+    skipped without being decoded, and aren't checked to be valid JSON.
+    The values are decoded through {decoder}, which is a plain {json.JSONDecoder} by default.
+    {head} is the start of the document if it has already been read from {f}.
+    """
+    raw_decode = (decoder or json.JSONDecoder()).raw_decode
+    scanner = _Scanner(f, chunk_size, head)
+    scanner.expect("{", "the start of an object")
+    if scanner.next_char("a key") == "}":
+        return
+    while True:
+        if scanner.next_char("a key") != '"':
+            raise ValueError(f"Expected a key at position {scanner.pos} of the buffer, found {scanner.buffer[scanner.pos]!r}")
+        key = scanner.decode(raw_decode)
+        scanner.expect(":", "':' after a key")
+        scanner.next_char("a value")
+        if wanted is None or wanted(key):
+            yield key, scanner.decode(raw_decode)
+        else:
+            scanner.pos = scanner.value_end(scanner.pos)
+        scanner.compact()
+        if scanner.expect(",}", "',' or '}' after a value") == "}":
+            return
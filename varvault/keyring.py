@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import hashlib
+
 from typing import *
 
 from .utils import assert_and_raise
 from .validator import validator, modifier, _VALIDATOR, _MODIFIER
+from .vaultstructs import VaultStructBase
 
 
 class Key(str):
@@ -144,6 +147,74 @@ class Key(str):
                 return False
 
 
+class KeyringDecoder(dict):
+    f"""
+    The keys of a keyring by name, together with a function for each key that builds its value from the value read from a resource: it creates the
+    {VaultStructBase} for the key, or validates the type of the value. The functions are specialized for each key when the decoder is created, so building
+    a value doesn't have to look at the definition of the key. Get the decoder for a keyring through 'Keyring.decoder', which caches it on the keyring.
+    """
+
+    def __init__(self, keys: Dict[str, Key]):
+        super(KeyringDecoder, self).__init__(keys)
+        self.builders: Dict[str, Callable[[Any], Any]] = {name: self.compile(key) for name, key in keys.items()}
+        self._fingerprint: Union[str, None] = None
+        # The decoder this is a copy of, which has the same fingerprint
+        self._base: Union[KeyringDecoder, None] = None
+
+    @staticmethod
+    def compile(key: Key) -> Callable[[Any], Any]:
+        f"""Returns a function that builds the value for {key} from a value read from a resource."""
+        valid_type, key_name = key.valid_type, key.key_name
+        if valid_type is None:
+            return lambda value: value
+        if issubclass(valid_type, VaultStructBase):
+            # 'create' is looked up on every call, so that it can be replaced after the decoder has been created
+            return lambda value: valid_type.create(key_name, value)
+
+        def build(value):
+            assert isinstance(value, valid_type), f"Key type missmatch ({key}; Valid type {valid_type}, actual type: {type(value)}"
+            return value
+
+        def build_or_none(value):
+            if value is None:
+                return None
+            assert isinstance(value, valid_type), f"Key type missmatch ({key}; Valid type {valid_type}, actual type: {type(value)}"
+            return value
+        return build_or_none if key.can_be_none else build
+
+    def extend(self, keys: Dict[str, Key]) -> KeyringDecoder:
+        f"""Returns a new decoder for the keys in this decoder and {keys}. Only the functions for {keys} are compiled."""
+        keys = keys or dict()
+        decoder = KeyringDecoder.__new__(KeyringDecoder)
+        dict.__init__(decoder, self)
+        decoder.update(keys)
+        decoder.builders = dict(self.builders)
+        decoder.builders.update((name, self.compile(key)) for name, key in keys.items())
+        decoder._fingerprint = None
+        decoder._base = None if keys else self
+        return decoder
+
+    def fingerprint(self) -> str:
+        """Returns a hash of the definitions of the keys that affect how values are built: their names, their types and if they can be None."""
+        if self._fingerprint is not None:
+            return self._fingerprint
+        if self._base is not None:
+            self._fingerprint = self._base.fingerprint()
+            return self._fingerprint
+        definitions = sorted((name, f"{key.valid_type.__module__}.{key.valid_type.__qualname__}" if key.valid_type else "", key.can_be_none) for name, key in self.items())
+        self._fingerprint = hashlib.md5(repr(definitions).encode()).hexdigest()
+        return self._fingerprint
+
+    def build(self, key: Union[Key, str], value: Any) -> Any:
+        f"""Builds the value for {key} from {value} read from the resource."""
+        return self.builders[key](value)
+
+    def build_all(self, items: Iterable[Tuple[str, Any]]) -> Dict[Key, Any]:
+        f"""Builds the values for the pairs of names and values in {items}. All names must be in the decoder."""
+        builders = self.builders
+        return {self[name]: builders[name](value) for name, value in items}
+
+
 class Keyring(object):
     """Base class for keys to be used for a vault. A class which extends
     this class must be used for defining your own keyring.
@@ -161,6 +232,19 @@ class Keyring(object):
             keys[key] = value
         return keys
 
+    @classmethod
+    def decoder(cls, extra_keys: Dict[str, Key] = None) -> KeyringDecoder:
+        f"""
+        Returns a {KeyringDecoder} for the keys in the keyring, extended with {extra_keys}. The decoder for the keyring is compiled the first
+        time it's needed and cached on the keyring, so keys must not be added to the keyring after that; a copy of it is returned.
+        """
+        # Looked up in the class itself, as a keyring that inherits from another keyring doesn't share its keys
+        decoder = cls.__dict__.get("_decoder")
+        if decoder is None:
+            decoder = KeyringDecoder(cls.get_keys())
+            cls._decoder = decoder
+        return decoder.extend(extra_keys)
+
     @classmethod
     def get_key_by_matching_string(cls, key_str: str) -> Key:
         """Returns a key in the keyring that matches the string passed to the function"""
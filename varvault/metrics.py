@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import os
+import threading
+import http.server
+
+from typing import *
+
+from .hooks import Hooks, HookEvent
+from .profiling import LatencyHistogram
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: Union[int, float] = 1):
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> List[str]:
+        return [f"# TYPE {self.name} counter",
+                f"# HELP {self.name} {self.help}",
+                f"{self.name}_total {_number(self.value)}"]
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, function: Callable[[], Union[int, float]]):
+        self.name = name
+        self.help = help
+        self.function = function
+
+    @property
+    def value(self) -> Union[int, float]:
+        return self.function()
+
+    def render(self) -> List[str]:
+        return [f"# TYPE {self.name} gauge",
+                f"# HELP {self.name} {self.help}",
+                f"{self.name} {_number(self.value)}"]
+
+
+class Histogram:
+    f"""A histogram in seconds that uses the buckets of {LatencyHistogram}, which means the memory used is constant."""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.histogram = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.histogram.record(seconds)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            counts = list(self.histogram.counts)
+            total = self.histogram.total
+            count = self.histogram.count
+        lines = [f"# TYPE {self.name} histogram",
+                 f"# HELP {self.name} {self.help}"]
+        cumulative = 0
+        for bound, bucket_count in zip(LatencyHistogram.BOUNDS, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {_number(total)}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+def _number(value: Union[int, float]) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class VaultMetrics:
+    f"""
+    Maintains counters and histograms for one or more vaults and renders them in the OpenMetrics text format, which Prometheus can scrape.
+    The metrics are collected through the vaults' hooks, so attaching to a vault is all that is needed.
+
+    Example:
+    ```
+    metrics = VaultMetrics().attach(vault)
+    metrics.serve(port=9464)           # Serves the metrics on http://127.0.0.1:9464/metrics
+    metrics.write("/var/lib/node_exporter/varvault.prom")
+    ```
+    """
+
+    def __init__(self, prefix: str = "varvault"):
+        f"""
+        :param prefix: The prefix for the name of all metrics. Default is 'varvault'.
+        """
+        self.prefix = prefix
+        self.vaults = list()
+        self.server: Union[http.server.ThreadingHTTPServer, None] = None
+
+        self.inserts = Counter(f"{prefix}_inserts", "Number of keys inserted into the vault.")
+        self.gets = Counter(f"{prefix}_gets", "Number of keys fetched from the vault.")
+        self.writes = Counter(f"{prefix}_writes", "Number of times the vault has been written to its resource.")
+        self.bytes_written = Counter(f"{prefix}_written_bytes", "Number of bytes written to the resource.")
+        self.reloads = Counter(f"{prefix}_reloads", "Number of times the vault has been reloaded from its resource through live-update.")
+        self.state_checks = Counter(f"{prefix}_state_checks", "Number of times live-update has checked if the resource has changed.")
+        self.automatics_dispatched = Counter(f"{prefix}_automatics_dispatched", "Number of automatic functions that have been dispatched.")
+        self.automatics_failed = Counter(f"{prefix}_automatics_failed", "Number of automatic functions that have failed.")
+        self.automatics_running = Gauge(f"{prefix}_automatics_running", "Number of threaded automatic functions currently running.",
+                                        lambda: sum(len(vault.running_tasks) for vault in self.vaults))
+        self.lock_wait = Histogram(f"{prefix}_lock_wait_seconds", "Time spent waiting for the lock of the vault.")
+        self.write_latency = Histogram(f"{prefix}_write_seconds", "Time spent writing the vault to its resource.")
+        self.reload_latency = Histogram(f"{prefix}_reload_seconds", "Time spent reloading the vault from its resource through live-update.")
+        self.state_check_latency = Histogram(f"{prefix}_state_check_seconds", "Time spent checking if the resource has changed.")
+        self.call_latency = Histogram(f"{prefix}_call_seconds", "Time of calls to decorated functions, including the time spent by varvault.")
+
+        self.callbacks: Dict[Hooks, Callable[[HookEvent], Any]] = {
+            Hooks.insert: lambda event: self.inserts.inc(event.key_count),
+            Hooks.get: lambda event: self.gets.inc(event.key_count),
+            Hooks.write: self._on_write,
+            Hooks.reload: self._on_reload,
+            Hooks.state_check: self._on_state_check,
+            Hooks.dispatch: self._on_dispatch,
+            Hooks.thread: lambda event: self.automatics_failed.inc() if event.extra.get("failed") else None,
+            Hooks.lock_wait: lambda event: self.lock_wait.observe(event.duration),
+            Hooks.call: lambda event: self.call_latency.observe(event.duration),
+        }
+
+    @property
+    def metrics(self) -> List[Union[Counter, Gauge, Histogram]]:
+        return [self.inserts, self.gets, self.writes, self.bytes_written, self.reloads, self.state_checks,
+                self.automatics_dispatched, self.automatics_failed, self.automatics_running,
+                self.lock_wait, self.write_latency, self.reload_latency, self.state_check_latency, self.call_latency]
+
+    def attach(self, vault) -> VaultMetrics:
+        f"""Starts collecting metrics for {vault}. Returns the metrics object."""
+        for hook, callback in self.callbacks.items():
+            vault.hooks.register(hook, callback)
+        self.vaults.append(vault)
+        return self
+
+    def detach(self, vault) -> VaultMetrics:
+        f"""Stops collecting metrics for {vault}. Returns the metrics object."""
+        for hook, callback in self.callbacks.items():
+            vault.hooks.unregister(hook, callback)
+        self.vaults.remove(vault)
+        return self
+
+    def _on_write(self, event: HookEvent):
+        self.writes.inc()
+        self.write_latency.observe(event.duration)
+        if event.bytes:
+            self.bytes_written.inc(event.bytes)
+
+    def _on_reload(self, event: HookEvent):
+        self.reloads.inc()
+        self.reload_latency.observe(event.duration)
+
+    def _on_state_check(self, event: HookEvent):
+        self.state_checks.inc()
+        self.state_check_latency.observe(event.duration)
+
+    def _on_dispatch(self, event: HookEvent):
+        self.automatics_dispatched.inc()
+        if event.extra.get("failed"):
+            self.automatics_failed.inc()
+
+    def render(self) -> str:
+        """Returns all metrics in the OpenMetrics text format."""
+        lines = list()
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: AnyStr):
+        f"""Writes the metrics to {path} in the OpenMetrics text format. The file is replaced atomically so a scraper never sees a partially written file."""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+    def serve(self, port: int = 0, host: str = "127.0.0.1") -> Tuple[str, int]:
+        f"""
+        Serves the metrics over HTTP on {host}:{port} from a daemon thread. Any path returns the metrics.
+
+        :param port: The port to listen on. Default is 0, which means a free port is picked.
+        :param host: The host to listen on. Default is localhost; be careful about exposing the metrics to other hosts.
+        :return: The host and port the metrics are served on.
+        """
+        assert self.server is None, "The metrics are already being served"
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Don't log every scrape to stderr
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name=f"{self.prefix}-metrics", daemon=True).start()
+        return self.server.server_address[:2]
+
+    def stop(self):
+        f"""Stops serving the metrics if {self.serve} has been called."""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import os
+import mmap
+import time
+import json
+import struct
+import concurrent.futures
+
+from typing import *
+
+from .codec import Codec, codec_for
+from .keyring import Key, KeyringDecoder
+from .minivault import MiniVault
+from .resource import BaseResource, ResourceModes, ResourceNotFoundError, LazyValue, LoadStats
+from .change_detection import ChangeDetector, TieredChangeDetector
+
+
+class Blob:
+    """A value in a memory-mapped MmapResource that hasn't been decoded. Copying a blob to another file doesn't decode it."""
+
+    __slots__ = ("buffer", "start", "length", "codec")
+
+    def __init__(self, buffer: mmap.mmap, start: int, length: int, codec: str):
+        self.buffer = buffer
+        self.start = start
+        self.length = length
+        self.codec = codec
+
+    def bytes(self) -> bytes:
+        """Returns the encoded value."""
+        return self.buffer[self.start:self.start + self.length]
+
+    def decode(self, codec: Codec) -> Any:
+        f"""Decodes the value; {codec} is the codec of the resource, see 'varvault.codec.codec_for'."""
+        return codec_for(self.codec, codec).decode_value(self.bytes())
+
+    def __repr__(self):
+        return f"Blob(start={self.start}, length={self.length}, codec={self.codec})"
+
+
+class MmapResource(BaseResource):
+    """
+    A resource that stores the vault in a binary file made for large vaults that are read by many processes. The file starts with an index that maps
+    each key to the offset, the length and the codec of its value, followed by the encoded values. The file is opened through 'mmap', so reading a value
+    only decodes that value, straight from the page cache, and processes that read the same file share the pages instead of each having a copy.
+
+    Create the vault with 'Flags.lazy_load' to get the full benefit; the vault then only reads the index when it's created and decodes a value the first
+    time it's accessed. Without it, every value is decoded when the vault is created, like with any other resource.
+
+    The file is written in full and replaced atomically on every write, so this is meant for vaults that are written once and read many times.
+    """
+
+    MAGIC = b"VVMMAP1\n"
+    # The length of the index that follows
+    HEADER = struct.Struct("<Q")
+
+    def __init__(self, path: AnyStr, mode: Union[Literal["r", "w", "a", "r+", "w+", "a+"], ResourceModes] = "r", codec: Union[str, Codec] = "json",
+                 change_detector: ChangeDetector = None, max_staleness: float = 0):
+        f"""
+        Creates the MmapResource object.
+        :param path: The path to the file.
+        :param mode: Sets the mode of the resource. The mode can be one of the following: 'r', 'w', 'a', 'r+', 'w+', 'a+'.
+        r: Read from existing resource (default)
+        w: Create new resource and ignore existing resource and write to it
+        a: Create a new resource if none exist, otherwise read from and write to existing resource
+        r+: Read from existing resource and perform live-update
+        w+: Create new resource and ignore existing resource and write to it, and perform live-update
+        a+: Create a new resource if none exist, otherwise read from and write to existing resource, and perform live-update
+        :param codec: Optional. The {Codec}, or the name of the codec, used to encode each value: 'json' (default), 'orjson' (if installed), 'marshal' or 'pickle'.
+         The codec is stored for each value, so a file can be read regardless of the codec of the resource, except that values written with 'pickle'
+         are only read by resources that use 'pickle'.
+        :param change_detector: Optional. The {ChangeDetector} used to detect changes to the file. Default is {TieredChangeDetector}.
+        :param max_staleness: Optional. The number of seconds that data read through live-update may be out of date; see {BaseResource}.
+        """
+        self.mmap: Union[mmap.mmap, None] = None
+        self.index: Dict[str, Blob] = dict()
+        self.mapped_signature = None
+        self.created = False
+        super(MmapResource, self).__init__(path, mode, change_detector=change_detector or TieredChangeDetector(), max_staleness=max_staleness, codec=codec)
+
+    @property
+    def resource(self) -> Union[mmap.mmap, None]:
+        """Returns the memory map of the file once the resource has been created."""
+        return self.mmap if self.created else None
+
+    @property
+    def path(self) -> AnyStr:
+        """Returns the path to the file."""
+        return self.raw_path
+
+    @property
+    def state(self):
+        """Returns the state of the vault, which is the state of the file according to the change detector"""
+        return self.change_detector.state(self.path)
+
+    def create(self) -> None:
+        """Creates the file if the mode says so and maps it into memory."""
+        path = self.path
+        assert path, "Path is not defined"
+        dirname = os.path.dirname(path)
+
+        if self.mode_properties.create and (not self.mode_properties.load or not self.exists()):
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self.do_write({})
+        elif not self.exists():
+            if not self.mode_properties.live_update:
+                raise ResourceNotFoundError(f"Unable to read from resource at {path} (mode is {self.mode})", self)
+            return
+        self._map()
+        self.created = True
+
+    def _map(self):
+        f"""Maps the file into memory and reads its index, unless the file that is mapped is still the current one."""
+        st = os.stat(self.path)
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if self.mmap is not None and signature == self.mapped_signature:
+            return
+        with open(self.path, "rb") as f:
+            # The map stays valid after the file is closed or replaced; blobs that refer to an old map keep it alive
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        assert buffer[:len(self.MAGIC)] == self.MAGIC, f"{self.path} is not a file written by {MmapResource.__name__}"
+        start = len(self.MAGIC) + self.HEADER.size
+        index_length, = self.HEADER.unpack_from(buffer, len(self.MAGIC))
+        base = start + index_length
+        index = json.loads(buffer[start:base])
+        self.index = {key: Blob(buffer, base + offset, length, codec) for key, (offset, length, codec) in index.items()}
+        self.mmap = buffer
+        self.mapped_signature = signature
+
+    def writable(self, obj: Dict) -> bool:
+        """Checks if a key-value pair in a dict can be written to the file by attempting to encode it through the codec of the resource"""
+        try:
+            for value in obj.values():
+                self.codec.encode_value(value)
+            return True
+        except Exception:
+            return False
+
+    def exists(self) -> bool:
+        """Returns a bool that says if the file exists"""
+        return os.path.exists(self.path)
+
+    def size(self) -> Union[int, None]:
+        """Returns the size of the file in bytes"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return None
+
+    def do_write(self, vault: dict) -> None:
+        f"""Writes the vault to a new file that replaces the current one. Values that are still {Blob}s are copied without being decoded."""
+        index = dict()
+        blobs = list()
+        offset = 0
+        for key, value in vault.items():
+            if isinstance(value, Blob):
+                data, codec = value.bytes(), value.codec
+            else:
+                data, codec = self.codec.encode_value(value), self.codec.name
+            index[str(key)] = (offset, len(data), codec)
+            blobs.append(data)
+            offset += len(data)
+        encoded_index = json.dumps(index, separators=(",", ":")).encode()
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(self.MAGIC)
+            f.write(self.HEADER.pack(len(encoded_index)))
+            f.write(encoded_index)
+            f.writelines(blobs)
+        os.replace(temp_path, self.path)
+
+    def do_read(self) -> Dict:
+        """Reads the vault from the file by decoding every value"""
+        self._map()
+        return {key: blob.decode(self.codec) for key, blob in self.index.items()}
+
+    def do_read_items(self, wanted: Callable[[str], bool] = None) -> Iterator[Tuple[str, Any]]:
+        f"""Reads the vault from the file one key at a time; values for keys that {wanted} returns {False} for are never decoded"""
+        self._map()
+        return ((key, blob.decode(self.codec)) for key, blob in self.index.items() if wanted is None or wanted(key))
+
+    def load(self, keys: Dict[str, Key], lazy: bool = False, parallel: Union[bool, str, concurrent.futures.Executor] = False,
+             workers: int = None) -> Tuple[MiniVault, LoadStats]:
+        f"""
+        Loads the vault from the file like {BaseResource.load}. With {lazy}, only the index is read and each value is a {LazyValue} that holds
+        the {Blob} of the value, which is decoded when it's accessed in a vault.
+        """
+        if not lazy:
+            return super(MmapResource, self).load(keys, lazy, parallel, workers)
+        if not self.resource:
+            self.create()
+        stats = LoadStats(lazy)
+        start = time.perf_counter()
+        with self.lock:
+            if not self.exists():
+                return MiniVault(), stats
+            self._map()
+            self.update_state()
+            decoder = keys if isinstance(keys, KeyringDecoder) else KeyringDecoder(keys)
+            build = lambda key, blob: decoder.build(key, blob.decode(self.codec))
+            data = {keys[name]: LazyValue(keys[name], blob, build) for name, blob in self.index.items() if name in keys}
+        stats.keys_read = len(self.index)
+        stats.keys_loaded = len(data)
+        stats.keys_not_in_keyring = [name for name in self.index if name not in keys]
+        stats.duration = time.perf_counter() - start
+        stats.bytes = self.size()
+        return MiniVault(data), stats
+
+    def read_key(self, key: str) -> Any:
+        f"""Decodes the value for {key} without decoding the rest of the vault. Raises {KeyError} if the key isn't in the file."""
+        with self.lock:
+            self._map()
+            blob = self.index.get(str(key))
+        if blob is None:
+            raise KeyError(f"Key {key} is not in the file at {self.path}")
+        return blob.decode(self.codec)
+
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import os
+import sys
+import concurrent.futures
+
+from typing import *
+
+from .keyring import Key
+from .vaultstructs import VaultStructBase
+
+# Building values in parallel only pays off when there's enough to build to make up for starting the pool and, for processes,
+# sending the values to the workers and the built values back. The size of the resource is used as a cheap estimate of the work.
+MIN_BYTES = 1 << 20
+MIN_VALUES = 4
+
+# The kind of pool used by 'Flags.parallel_load': 'process' or 'thread'. Threads only build in parallel on builds of Python without the GIL
+DEFAULT_POOL = "process"
+
+
+class LoadError(Exception):
+    """
+    Raised when values couldn't be built while loading a vault in parallel. All values are built before this is raised, and 'errors'
+    holds the error for each key that failed, in the order the keys were read from the resource, so the error is the same regardless of
+    the order in which the workers finished.
+    """
+
+    def __init__(self, errors: Dict[str, BaseException]):
+        self.errors = errors
+        details = "\n".join(f"  {key}: {type(e).__name__}: {e}" for key, e in errors.items())
+        super(LoadError, self).__init__(f"Failed to build the values for {len(errors)} key(s) from the resource:\n{details}")
+
+
+def is_struct(key: Key) -> bool:
+    f"""Returns a bool that says if the value for {key} is built through 'VaultStructBase.create', which is what's worth building in parallel."""
+    return key.valid_type is not None and issubclass(key.valid_type, VaultStructBase)
+
+
+def should_parallelize(values: int, size: Union[int, None], workers: int) -> bool:
+    f"""Returns a bool that says if building {values} values read from a resource of {size} bytes is worth spreading over {workers} workers."""
+    return workers > 1 and values >= MIN_VALUES and size is not None and size >= MIN_BYTES
+
+
+def workers(pool: Union[bool, str, concurrent.futures.Executor], count: int = None) -> int:
+    f"""
+    Returns the number of workers that build values in parallel in {pool}: {count} if it's given, or else the number of workers a pool of
+    that kind is created with, which is the number of CPUs. An executor can't be asked how many workers it has, so pass {count} with one.
+    Threads only build in parallel on builds of Python without the GIL, so a pool of threads has a single worker by default on builds with it.
+    """
+    if count is not None:
+        return count
+    if pool == "thread" and _gil_enabled():
+        return 1
+    return os.cpu_count() or 1
+
+
+def build_values(pending: List[Tuple[Key, Any]], pool: Union[bool, str, concurrent.futures.Executor], count: int = None) -> Dict[Key, Any]:
+    f"""
+    Builds the struct values in {pending}, which are pairs of keys and the values read from the resource for them, in {pool}. {pool} is
+    'process', 'thread', {True} for {DEFAULT_POOL}, or an executor; pools created here have {count} workers (see {workers}) and are shut
+    down when the values have been built. The struct classes and the values must be picklable for a pool of processes. Raises {LoadError}
+    if any value couldn't be built.
+    """
+    jobs = [(key.valid_type, key.key_name, value) for key, value in pending]
+    count = min(workers(pool, count), len(jobs))
+    executor = pool if isinstance(pool, concurrent.futures.Executor) else _create_pool(pool, count)
+    try:
+        # Sending the jobs in a few large chunks rather than one at a time keeps the overhead of a pool of processes down
+        chunksize = max(1, len(jobs) // (count * 4))
+        results = list(executor.map(_build, jobs, chunksize=chunksize))
+    finally:
+        if executor is not pool:
+            executor.shutdown()
+    return _collect(pending, results)
+
+
+def build_serially(pending: List[Tuple[Key, Any]]) -> Dict[Key, Any]:
+    f"""Builds the struct values in {pending} one after the other, like {build_values} does in a pool. Raises {LoadError} if any value couldn't be built."""
+    return _collect(pending, [_build((key.valid_type, key.key_name, value)) for key, value in pending])
+
+
+def _collect(pending: List[Tuple[Key, Any]], results: List[Tuple[bool, Any]]) -> Dict[Key, Any]:
+    errors = {key.key_name: result for (key, _), (ok, result) in zip(pending, results) if not ok}
+    if errors:
+        raise LoadError(errors) from next(iter(errors.values()))
+    return {key: result for (key, _), (_, result) in zip(pending, results)}
+
+
+def _gil_enabled() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is None or is_gil_enabled()
+
+
+def _create_pool(kind: Union[bool, str], count: int) -> concurrent.futures.Executor:
+    kind = DEFAULT_POOL if kind is True else kind
+    if kind == "process":
+        return concurrent.futures.ProcessPoolExecutor(count)
+    if kind == "thread":
+        return concurrent.futures.ThreadPoolExecutor(count)
+    raise ValueError(f"Unknown kind of pool: {kind}. Must be one of the following: ['process', 'thread']")
+
+
+def _build(job: Tuple[Type[VaultStructBase], str, Any]) -> Tuple[bool, Any]:
+    # Runs in the workers; errors are returned rather than raised so that every value is built and all errors can be reported
+    valid_type, key_name, value = job
+    try:
+        return True, valid_type.create(key_name, value)
+    except Exception as e:
+        return False, e
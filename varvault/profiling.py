@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import time
+import bisect
+import threading
+
+from typing import *
+
+from .utils import assert_and_raise
+
+
+_local = threading.local()
+
+
+def _active_calls() -> List[ProfiledCall]:
+    try:
+        return _local.calls
+    except AttributeError:
+        _local.calls = list()
+        return _local.calls
+
+
+def record_overhead(category: str, seconds: float):
+    f"""
+    Adds {seconds} to {category} for the innermost vaulted function currently running on this thread.
+    Nothing is recorded if no vaulted function is running (e.g. a plain call to 'insert' or 'get').
+
+    :param category: The overhead category to add to; one of {FunctionProfile.OVERHEAD_CATEGORIES}
+    :param seconds: The time in seconds to add to the category.
+    """
+    calls = _active_calls()
+    if calls:
+        profile = calls[-1].profile
+        with profile._lock:
+            profile.overhead[category] += seconds
+
+
+class LatencyHistogram:
+    """
+    A histogram of latencies using fixed, logarithmically spaced buckets. The memory used by the histogram is constant
+    regardless of how many samples are recorded. Buckets go from 1 µs and double in size up to roughly 35 minutes.
+    """
+
+    BOUNDS: Tuple[float, ...] = tuple(1e-6 * 2 ** i for i in range(32))
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds: float):
+        """Records a sample in seconds"""
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        f"""Returns an estimate of the {q}-quantile (0 <= {q} <= 1) as the upper bound of the bucket the quantile falls into, clamped to the observed max."""
+        assert 0 <= q <= 1, f"'q' must be between 0 and 1, not {q}"
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                upper = self.BOUNDS[i] if i < len(self.BOUNDS) else self.max
+                return min(upper, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> Dict:
+        return {"count": self.count,
+                "total": self.total,
+                "min": self.min,
+                "max": self.max,
+                "mean": self.mean,
+                "p50": self.quantile(0.5),
+                "p90": self.quantile(0.9),
+                "p99": self.quantile(0.99),
+                "buckets": {str(bound): count for bound, count in zip(self.BOUNDS + ("+Inf",), self.counts) if count}}
+
+
+class FunctionProfile:
+    """The profile of a single function decorated by 'manual' or 'automatic'. Times are in seconds."""
+
+    OVERHEAD_CATEGORIES = ("pre_call", "post_call", "lock_wait", "resource_write")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.failures = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.body = 0.0
+        self.overhead: Dict[str, float] = {category: 0.0 for category in self.OVERHEAD_CATEGORIES}
+        self.latency = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    @property
+    def vault_overhead(self) -> float:
+        """The time spent by varvault around the function body. Lock wait and resource write are part of the pre- and post-call time."""
+        return self.overhead["pre_call"] + self.overhead["post_call"]
+
+    def as_dict(self) -> Dict:
+        return {"name": self.name,
+                "calls": self.calls,
+                "failures": self.failures,
+                "wall": self.wall,
+                "cpu": self.cpu,
+                "body": self.body,
+                "vault_overhead": self.vault_overhead,
+                "overhead": dict(self.overhead),
+                "latency": self.latency.as_dict()}
+
+
+class ProfiledCall:
+    """Measures a single call to a vaulted function and adds the result to its profile when the call is done."""
+
+    def __init__(self, profile: FunctionProfile):
+        self.profile = profile
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        self.lap_start = self.wall_start
+        _active_calls().append(self)
+
+    def lap(self, category: str = None) -> float:
+        f"""Ends the current lap and adds its time to {category}, or to the function body if {category} is {None}. Returns the time of the lap."""
+        now = time.perf_counter()
+        elapsed = now - self.lap_start
+        self.lap_start = now
+        with self.profile._lock:
+            if category is None:
+                self.profile.body += elapsed
+            else:
+                self.profile.overhead[category] += elapsed
+        return elapsed
+
+    def stop(self, failed: bool = False):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.thread_time() - self.cpu_start
+        calls = _active_calls()
+        if self in calls:
+            # Coroutines can finish in a different order than they started, so this isn't necessarily the last call
+            calls.remove(self)
+        profile = self.profile
+        with profile._lock:
+            profile.calls += 1
+            profile.failures += 1 if failed else 0
+            profile.wall += wall
+            profile.cpu += cpu
+            profile.latency.record(wall)
+
+
+def report(profiles: Iterable[FunctionProfile], sort_by: str = "wall", reverse: bool = True, limit: int = None) -> str:
+    f"""
+    Renders {profiles} as a plain-text table.
+
+    :param profiles: The profiles to render.
+    :param sort_by: The column to sort by. Any column in the table can be used, e.g. 'calls', 'wall', 'cpu', 'body', 'vault_overhead', 'lock_wait', 'p99'.
+    :param reverse: Sort in descending order if {True} (default).
+    :param limit: Optional. Only render the first {limit} rows.
+    :return: The table as a str.
+    """
+    columns = ("name", "calls", "failures", "wall", "cpu", "body", "vault_overhead") + FunctionProfile.OVERHEAD_CATEGORIES + ("mean", "p50", "p99", "max")
+
+    def row(profile: FunctionProfile) -> Dict:
+        r = profile.as_dict()
+        r.update(r.pop("overhead"))
+        latency = r.pop("latency")
+        r.update({k: latency[k] or 0.0 for k in ("mean", "p50", "p99", "max")})
+        return r
+
+    assert_and_raise(sort_by in columns, ValueError(f"Cannot sort by '{sort_by}'; must be one of {columns}"))
+    rows = sorted((row(p) for p in profiles), key=lambda r: r[sort_by], reverse=reverse)
+    if limit is not None:
+        rows = rows[:limit]
+
+    def fmt(value):
+        if isinstance(value, float):
+            return f"{value:.6f}"
+        return str(value)
+
+    table = [list(columns)] + [[fmt(r[c]) for c in columns] for r in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    lines = ["  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(line)) for line in table]
+    lines.insert(1, "-" * len(lines[0]))
+    return "\n".join(lines)
+
+
+def to_json(profiles: Iterable[FunctionProfile], **kwargs) -> str:
+    """Returns the profiles as a JSON str that is suitable for comparing runs across builds."""
+    return json.dumps({"functions": {p.name: p.as_dict() for p in profiles}}, **kwargs)
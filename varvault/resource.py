@@ -1,16 +1,44 @@
 from __future__ import annotations
 
 import abc
+import array
 import enum
+import marshal
 import os.path
+import time
 import warnings
 import threading
+import weakref
+import concurrent.futures
 
-from typing import Union, Dict, Any, AnyStr, Literal
+from typing import Union, Dict, List, Set, Any, AnyStr, Literal, Iterable, Iterator, Tuple, Callable
 
-from .keyring import Key
+from .keyring import Key, KeyringDecoder
+from .change_detection import ChangeDetector, TieredChangeDetector
+from .codec import Codec, get_codec
+from .compression import Compression, get_compression
 from .minivault import MiniVault
+from .parallel import LoadError, is_struct, should_parallelize, workers as pool_workers, build_values, build_serially
 from .vaultstructs import VaultStructBase
+from .warm_start import WarmStartCache, digest
+
+# Types that marshal serializes, but reads back as 'bytes'
+MARSHAL_COERCED = (bytearray, memoryview, array.array)
+
+# Containers that marshal serializes item by item; marshal refuses subclasses of them, like it refuses any other type it doesn't know
+MARSHAL_CONTAINERS = (list, tuple, set, frozenset)
+
+
+def marshal_coerces(value: Any) -> bool:
+    """Returns a bool that says if marshal would read 'value' back as other types, as it holds one of 'MARSHAL_COERCED' at any depth."""
+    kind = type(value)
+    if kind in MARSHAL_COERCED:
+        return True
+    if kind is dict:
+        return any(marshal_coerces(key) or marshal_coerces(item) for key, item in value.items())
+    if kind in MARSHAL_CONTAINERS:
+        return any(marshal_coerces(item) for item in value)
+    return False
 
 
 class ModeProperties(dict):
@@ -40,6 +68,122 @@ class ResourceModes(enum.Enum):
     APPEND_W_LIVE_UPDATE = "a+"    # Create a new resource if none exist, otherwise read from and write to existing resource, and perform live-update
 
 
+class LazyValue:
+    f"""A value read from a resource that hasn't been built yet. A vault created with 'Flags.lazy_load' holds these until the values are accessed."""
+
+    __slots__ = ("key", "raw", "build")
+
+    def __init__(self, key: Key, raw: Any, build: Callable[[Key, Any], Any]):
+        self.key = key
+        self.raw = raw
+        self.build = build
+
+    def materialize(self) -> Any:
+        """Validates and builds the value."""
+        return self.build(self.key, self.raw)
+
+    def __repr__(self):
+        return f"LazyValue(key={self.key})"
+
+
+class LoadStats:
+    """Statistics from loading a vault from a resource through 'BaseResource.load'. Times are in seconds."""
+
+    __slots__ = ("keys_read", "keys_loaded", "keys_not_in_keyring", "bytes", "duration", "build_duration", "lazy", "parallel", "warm_start")
+
+    def __init__(self, lazy: bool = False):
+        # The number of keys found in the resource, including keys that weren't loaded
+        self.keys_read = 0
+        self.keys_loaded = 0
+        self.keys_not_in_keyring: List[str] = list()
+        # The size of the resource, if known
+        self.bytes: Union[int, None] = None
+        # The time it took to read the resource and build the values, and the part of that spent building the values
+        self.duration = 0.0
+        self.build_duration = 0.0
+        self.lazy = lazy
+        # The struct values were built in parallel, see 'BaseResource.load'
+        self.parallel = False
+        # The values were loaded from the warm-start cache, see 'varvault.warm_start'
+        self.warm_start = False
+
+    def as_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return (f"LoadStats(keys_read={self.keys_read}, keys_loaded={self.keys_loaded}, keys_not_in_keyring={len(self.keys_not_in_keyring)}, "
+                f"bytes={self.bytes}, duration={self.duration:.6f}, build_duration={self.build_duration:.6f}, lazy={self.lazy}, parallel={self.parallel}, warm_start={self.warm_start})")
+
+
+class SharedResource:
+    f"""
+    State shared by all resources of the same class for the same path in this process: the lock that serializes reading and writing,
+    a change detector, and a snapshot of the data last read from the resource together with the state it was read at.
+
+    When several vaults use the same file, the file is hashed and parsed once per change rather than once per vault. The snapshot is kept
+    serialized through {marshal} so every resource gets its own copy of the data, as the data ends up in vaults that may change it in place.
+    A resource that uses the state on its own has no one to share the data with, so the snapshot is only kept while more than one resource uses it.
+    Shared state lives as long as any resource uses it.
+    """
+
+    _registry: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+    _registry_lock = threading.Lock()
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.change_detector = TieredChangeDetector()
+        self.snapshot: Union[bytes, None] = None
+        self.snapshot_state = None
+        self.snapshot_detector = None
+        self.hits = 0
+        # The resources that use the state; see 'register'
+        self.users = weakref.WeakSet()
+
+    @classmethod
+    def get(cls, resource_class: type, path: Union[AnyStr, Any]) -> SharedResource:
+        f"""Returns the shared state for resources of type {resource_class} at {path}, creating it if no resource uses it yet."""
+        try:
+            path = os.path.realpath(path)
+        except TypeError:
+            pass
+        with cls._registry_lock:
+            shared = cls._registry.get((resource_class, path))
+            if shared is None:
+                shared = cls()
+                cls._registry[(resource_class, path)] = shared
+            return shared
+
+    def register(self, resource: BaseResource):
+        """Registers 'resource' as a user of the state. It's left out again when it's garbage collected."""
+        with self._registry_lock:
+            self.users.add(resource)
+
+    def load(self, change_detector: Union[ChangeDetector, None], state: Any) -> Union[Dict, None]:
+        f"""Returns a copy of the snapshot if it was read at {state} according to {change_detector}, otherwise None. Must be called with the lock held."""
+        if self.snapshot is None or self.snapshot_detector is not change_detector or self.snapshot_state != state:
+            return None
+        self.hits += 1
+        return marshal.loads(self.snapshot)
+
+    def store(self, change_detector: Union[ChangeDetector, None], state: Any, data: Dict):
+        f"""
+        Stores {data} as the snapshot read at {state}. Data that can't be serialized through {marshal}, or that {marshal} would turn into other types
+        (see {marshal_coerces}), isn't stored, and nothing is stored while a single resource uses the state. Must be called with the lock held.
+        """
+        if len(self.users) < 2:
+            self.snapshot = None
+            return
+        try:
+            if marshal_coerces(data):
+                raise ValueError("The snapshot would change the type of some values")
+            self.snapshot = marshal.dumps(data)
+        except ValueError:
+            self.snapshot = None
+            return
+        self.snapshot_state = state
+        self.snapshot_detector = change_detector
+
+
 class BaseResource(abc.ABC):
 
     POSSIBLE_MODES = {
@@ -60,7 +204,12 @@ class BaseResource(abc.ABC):
         ResourceModes.APPEND_W_LIVE_UPDATE.value:  ModeProperties(read_only=False, live_update=True,  create=True,  load=True,  write=True)
     }
 
-    def __init__(self, path: Union[AnyStr, Any], mode: Union[Literal["r", "w", "a", "r+", "w+", "a+"], ResourceModes] = "r"):
+    # Set this to True in resources that implement 'do_write_delta' to have the vault write only the keys that have changed
+    supports_delta_writes = False
+
+    def __init__(self, path: Union[AnyStr, Any], mode: Union[Literal["r", "w", "a", "r+", "w+", "a+"], ResourceModes] = "r", change_detector: ChangeDetector = None,
+                 max_staleness: float = 0, shared: bool = False, codec: Union[str, Codec] = None, compression: Union[str, Compression] = None,
+                 compression_level: int = None, warm_start: bool = False):
         """
         Creates an object that can be used to read and write to a resource.
 
@@ -72,10 +221,20 @@ class BaseResource(abc.ABC):
         r+: Read from existing resource and perform live-update
         w+: Create new resource and ignore existing resource and write to it, and perform live-update
         a+: Create a new resource if none exist, otherwise read from and write to existing resource, and perform live-update
-
+        :param change_detector: Optional. A ChangeDetector that implementations of 'state' can use to detect changes to the resource cheaply.
+        :param max_staleness: Optional. The number of seconds that data read through live-update may be out of date. Within this long after the
+         resource was last checked, accessing the vault doesn't check the resource again. Default is 0, which means the resource is checked on every access.
+        :param shared: Optional. Share the lock and the data read from the resource with all other shared resources of the same class for the same path
+         in this process (see SharedResource). This requires that the state of the resource changes whenever its content changes. Default is False.
+        :param codec: Optional. The codec, or the name of the codec, that implementations of 'do_write' and 'do_read' can use to serialize the vault
+         (see varvault.codec). Default is None, which means the resource doesn't use a codec.
+        :param compression: Optional. The compression format, or the name of it, that file-based implementations of 'do_write' can compress the vault with:
+         'gzip', 'bz2', 'lzma' or 'zlib' (see varvault.compression). Default is None, which means no compression.
+        :param compression_level: Optional. The level to compress at. Default is None, which means the default level of the compression format.
+        :param warm_start: Optional. Store the values built when a vault is loaded from the file at 'path' in a cache next to it, and load them from the cache
+         instead of reading the file when neither the file nor the keyring has changed (see varvault.warm_start.WarmStartCache). Only for resources that are
+         stored in a single file. Default is False.
         """
-        self.lock = threading.Lock()
-
         if isinstance(mode, ResourceModes):
             mode = mode.value
         self.mode = mode
@@ -84,6 +243,18 @@ class BaseResource(abc.ABC):
 
         self.raw_path = os.path.expanduser(os.path.expandvars(path))
 
+        self.shared: Union[SharedResource, None] = SharedResource.get(type(self), self.raw_path) if shared else None
+        if self.shared:
+            self.shared.register(self)
+        self.lock = self.shared.lock if self.shared else threading.Lock()
+        self.change_detector = change_detector
+        self.codec: Union[Codec, None] = get_codec(codec) if codec is not None else None
+        self.compression: Union[Compression, None] = get_compression(compression)
+        self.compression_level = compression_level
+        self.warm_start: Union[WarmStartCache, None] = WarmStartCache(self.raw_path) if warm_start else None
+        self.max_staleness = max_staleness
+        self.last_checked: Union[float, None] = None
+
         self.mode_properties: ModeProperties = self.MODE_MAPPING[self.mode]
         self.last_known_state = None
         self.cached_state = None
@@ -92,42 +263,164 @@ class BaseResource(abc.ABC):
 
     def resource_has_changed(self):
         """Returns a bool that says if the resource has changed since the last time it was read."""
+        self.last_checked = time.monotonic()
         self.last_known_state = self.state
         return self.cached_state != self.last_known_state
 
     def update_state(self, fetch_state=True):
         """Updates the state by fetching the current state."""
         if fetch_state:
+            self.last_checked = time.monotonic()
             self.last_known_state = self.state
         self.cached_state = self.last_known_state
 
-    def create_mv(self, **keys: Key) -> MiniVault:
-        f"""Creates a {MiniVault}-object from a file by loading the vault from the file using the keyring."""
-        from varvault import concurrent_execution
-
-        vault_file_data = self.read()
-
-        assert isinstance(vault_file_data, dict), f"'vault_file_data' from the filehandler is not a dict: {vault_file_data}"
+    def is_fresh(self) -> bool:
+        f"""Returns a bool that says if the resource was checked less than {self.max_staleness} seconds ago, in which case live-update doesn't have to check it again."""
+        return self.max_staleness > 0 and self.last_checked is not None and time.monotonic() - self.last_checked < self.max_staleness
 
-        # Get the keys from the keyring as a list.
-        return_vault_data = dict()
+    def watched_files(self) -> Union[Tuple[AnyStr, Union[Set[str], None]], None]:
+        f"""
+        Returns the directory that a 'ResourceWatcher' watches through inotify to find out that the resource has changed, and the names of the files in it
+        that belong to the resource, or {None} if every file in it does. By default, that's the file at the path of the resource and its backup.
+        Returns {None} if changes to the resource can't be seen through inotify, in which case the resource is polled.
+        """
+        name = os.path.basename(self.raw_path)
+        return os.path.dirname(os.path.abspath(self.raw_path)), {name, f"{name}.bak"}
 
-        async def build(key_in_file: str):
-            if key_in_file not in keys:
-                return
-            key: Key = keys[key_in_file]
-            if key.valid_type and issubclass(key.valid_type, VaultStructBase):
-                return_vault_data[key] = key.valid_type.create(key_in_file, vault_file_data[key_in_file])
+    def create_mv(self, **keys: Key) -> MiniVault:
+        f"""
+        Creates a {MiniVault}-object from a file by loading the vault from the file using the keyring. The vault is read through {self.read_items},
+        so each value is built as soon as it has been read, and keys that aren't in {keys} may not be decoded at all.
+        """
+        return self.load(keys)[0]
+
+    def create_lazy_mv(self, **keys: Key) -> MiniVault:
+        f"""Creates a {MiniVault}-object from a file like {self.create_mv}, but the values are {LazyValue}-objects that are built when they are accessed in a vault."""
+        return self.load(keys, lazy=True)[0]
+
+    def load(self, keys: Dict[str, Key], lazy: bool = False, parallel: Union[bool, str, concurrent.futures.Executor] = False,
+             workers: int = None) -> Tuple[MiniVault, LoadStats]:
+        f"""
+        Loads the vault from the resource in a single pass: the resource is read once, and each key is checked against {keys} and its value built
+        as soon as it has been read. Keys that aren't in {keys} are counted in the returned {LoadStats} but not loaded. Pass a {KeyringDecoder}
+        (see 'Keyring.decoder') as {keys} to not have to compile one for every load. With {lazy}, the values are {LazyValue}-objects that are built when they are accessed in a vault instead.
+
+        With {parallel}, values that are {VaultStructBase}s are built after the resource has been read, spread over a pool of workers, if there are enough
+        of them and the resource is large enough to make it worth it (see 'varvault.parallel'). {parallel} is the kind of pool, 'process' or 'thread',
+        an executor to use, or {True} for 'varvault.parallel.DEFAULT_POOL'. {workers} is the number of workers of the pool; pass it with an executor,
+        as it can't be asked for it (see 'varvault.parallel.workers'). Errors for all struct values are raised together as a {LoadError}, whether they
+        were built in parallel or not.
+        """
+        stats = LoadStats(lazy)
+        start = time.perf_counter()
+        decoder = keys if isinstance(keys, KeyringDecoder) else KeyringDecoder(keys)
+        builders = decoder.builders
+
+        file_digest = None
+        if self.warm_start and not lazy:
+            cached, file_digest, file_stat = self._load_warm_start(decoder)
+            if cached is not None:
+                values, stats.keys_not_in_keyring = cached
+                stats.keys_read = len(values) + len(stats.keys_not_in_keyring)
+                stats.keys_loaded = len(values)
+                stats.bytes = self.size()
+                stats.warm_start = True
+                stats.duration = time.perf_counter() - start
+                return MiniVault({decoder[name]: value for name, value in values.items()}), stats
+
+        def wanted(name: str) -> bool:
+            stats.keys_read += 1
+            if name in keys:
+                return True
+            stats.keys_not_in_keyring.append(name)
+            return False
+
+        build_lazy = lambda key, raw: decoder.build(key, self.resolve_value(raw))
+        data = dict()
+        # Struct values that are put off to be built in parallel; the vault keeps the order of the resource, so their keys are added with a placeholder
+        pending: List[Tuple[Key, Any]] = list()
+        for name, value in self.read_items(wanted):
+            key = keys[name]
+            if parallel and not lazy and is_struct(key):
+                pending.append((key, self.resolve_value(value)))
+                data[key] = None
+                continue
+            build_start = time.perf_counter()
+            data[key] = LazyValue(key, value, build_lazy) if lazy else builders[name](self.resolve_value(value))
+            stats.build_duration += time.perf_counter() - build_start
+        stats.bytes = self.size()
+
+        if pending:
+            build_start = time.perf_counter()
+            if should_parallelize(len(pending), stats.bytes, pool_workers(parallel, workers)):
+                data.update(build_values(pending, parallel, workers))
+                stats.parallel = True
             else:
-                if key.can_be_none and vault_file_data[key_in_file] is None:
-                    return_vault_data[key] = None
-                else:
-                    assert key.valid_type is None or isinstance(vault_file_data[key_in_file], key.valid_type), f"Key type missmatch ({key}; Valid type {key.valid_type}, actual type: {type(vault_file_data[key_in_file])}"
-                    return_vault_data[key] = vault_file_data[key_in_file]
+                data.update(build_serially(pending))
+            stats.build_duration += time.perf_counter() - build_start
+        stats.keys_loaded = len(data)
+        mv = MiniVault(data)
+        if file_digest is not None:
+            self._store_warm_start(decoder, file_digest, file_stat, mv, stats.keys_not_in_keyring)
+        stats.duration = time.perf_counter() - start
+        return mv, stats
+
+    def _load_warm_start(self, decoder: KeyringDecoder) -> Tuple[Union[Tuple[Dict[str, Any], List[str]], None], Union[str, None], Union[Tuple, None]]:
+        f"""
+        Returns what's in the warm-start cache for the file and {decoder}, or {None}, the digest of the file and the signature of the file when it was
+        hashed (see {self._file_signature}). The digest and the signature are {None} if the file doesn't exist.
+        """
+        if not self.resource:
+            self.create()
+        with self.lock:
+            if not self.exists():
+                return None, None, None
+            # The state is fetched before the digest; if the file changes in between, the next check will just find it changed
+            self.update_state()
+            file_stat = self._file_signature()
+            file_digest = digest(self.path)
+            return self.warm_start.load(file_digest, decoder.fingerprint()), file_digest, file_stat
+
+    def _store_warm_start(self, decoder: KeyringDecoder, file_digest: str, file_stat: Tuple, mv: MiniVault, keys_not_in_keyring: List[str]):
+        f"""
+        Stores {mv} in the warm-start cache, unless the file has changed since it was hashed, in which case {mv} may not match {file_digest}. The file
+        is compared through {file_stat} rather than hashed again, so a load that misses the cache only reads the file twice: once to hash it and once to load it.
+        """
+        with self.lock:
+            if self.exists() and self._file_signature() == file_stat:
+                self.warm_start.store(file_digest, decoder.fingerprint(), mv, keys_not_in_keyring)
+
+    def _file_signature(self) -> Tuple[int, int, int]:
+        """Returns the modification time, size and inode of the file, which change when the file is written or replaced"""
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def build_mv(self, vault_file_data: Dict, keys: Dict[str, Key]) -> MiniVault:
+        f"""
+        Builds a {MiniVault}-object from {vault_file_data} read from the resource. Only keys in {keys} are added to the {MiniVault}.
+        Pass a {KeyringDecoder} (see 'Keyring.decoder') as {keys} to not have to compile one for every call.
+        """
+        assert isinstance(vault_file_data, dict), f"'vault_file_data' from the filehandler is not a dict: {vault_file_data}"
+        decoder = keys if isinstance(keys, KeyringDecoder) else KeyringDecoder(keys)
+        return MiniVault(decoder.build_all((name, value) for name, value in vault_file_data.items() if name in decoder))
+
+    def resolve_value(self, value: Any) -> Any:
+        f"""
+        Returns the value that {value}, as returned by '{self.do_read}' or yielded by '{self.do_read_items}', stands for. Resources that store some values
+        outside the vault and only return references to them override this to read the values; it's called when a value is built, so for a vault
+        created with 'Flags.lazy_load' it's only called when the value is accessed.
+        """
+        return value
 
-        concurrent_execution(build, vault_file_data.keys())
+    def resolve_values(self, data: Dict) -> Dict:
+        f"""Returns {data}, as returned by '{self.do_read}', with every value resolved through '{self.resolve_value}'. Not meant to be overridden."""
+        if type(self).resolve_value is BaseResource.resolve_value:
+            return data
+        return {key: self.resolve_value(value) for key, value in data.items()}
 
-        return MiniVault(**return_vault_data)
+    def size(self) -> Union[int, None]:
+        """Returns the size of the resource in bytes, or None if the size is unknown. Override this if the size of the resource can be determined."""
+        return None
 
     @property
     @abc.abstractmethod
@@ -138,7 +431,11 @@ class BaseResource(abc.ABC):
     @property
     @abc.abstractmethod
     def state(self):
-        """Meant to return the state of the resource, such as a hash of the resource."""
+        """
+        Meant to return the state of the resource. If the content of the resource changes, the state must change.
+        Live-update fetches the state every time the vault is accessed, so it should be cheap to fetch. File-based resources
+        should use 'self.change_detector' (see varvault.change_detection), which avoids reading the file when possible.
+        """
         raise NotImplementedError()
 
     @abc.abstractmethod
@@ -199,25 +496,139 @@ class BaseResource(abc.ABC):
         """
         raise NotImplementedError()
 
+    def write_delta(self, upserts: dict, deletes: Iterable[Any]) -> None:
+        f"""
+        Writes only the changes to the vault to the database by calling the implemented '{self.do_write_delta}' method. Not meant to be overridden.
+        The vault only calls this if '{self.supports_delta_writes}' is {True}; otherwise it calls '{self.write}' with the entire vault.
+        """
+        if not upserts and not deletes:
+            return
+
+        if self.mode_properties.read_only:
+            warnings.warn("Tried to write to a resource defined as read-only. This is not permitted by varvault.")
+            return
+
+        if not self.resource:
+            self.create()
+        try:
+            with self.lock:
+                self.do_write_delta(upserts, deletes)
+        except Exception as e:
+            raise ResourceNotFoundError(f"Failed to write to the resource: {e}", self)
+        self.update_state()
+
+    def do_write_delta(self, upserts: dict, deletes: Iterable[Any]) -> None:
+        """
+        Optional. A function to write only the changes to a vault to a database, for resources that can update single keys. Varvault will call this function
+        internally instead of 'do_write' if 'supports_delta_writes' is True. Keys in the database that are in neither 'upserts' nor 'deletes' must be left as they are.
+
+        :param upserts: The keys that have been added or changed since the last write, and their values.
+        :param deletes: The keys that have been removed from the vault since the last write.
+        :return: None. Varvault will not use the return value from this function
+        """
+        raise NotImplementedError()
+
     # ================================================================================================================
     # Read
     # ================================================================================================================
     def read(self) -> Dict:
-        f"""Reads the vault from the database by calling the implemented '{self.do_read}' method. Not meant to be overridden."""
+        f"""
+        Reads the vault from the database by calling the implemented '{self.do_read}' method, and resolves the values through '{self.resolve_value}'.
+        Not meant to be overridden.
+        """
         if not self.resource:
             self.create()
         with self.lock:
             if self.exists():
                 try:
+                    if self.shared:
+                        return self.resolve_values(self._read_shared())
                     data = self.do_read()
                     self.update_state()
-                    return data
+                    return self.resolve_values(data)
                 except Exception as e:
                     raise ResourceNotFoundError(f"Failed to read from the resource (mode is {self.mode}): {e}", self)
             if self.mode_properties.live_update:
                 return {}
             raise ResourceNotFoundError(f"Resource not found at: {self.raw_path} (mode is {self.mode})", self)
 
+    def _read_shared(self) -> Dict:
+        f"""Reads the vault from the snapshot shared with other resources for the same path, or from the resource if the snapshot is out of date."""
+        # The state is fetched before reading; if the resource changes while it's being read, the next check will just find it changed again
+        self.last_checked = time.monotonic()
+        state = self.state
+        data = self.shared.load(self.change_detector, state)
+        if data is None:
+            data = self.do_read()
+            self.shared.store(self.change_detector, state, data)
+        self.last_known_state = state
+        self.cached_state = state
+        return data
+
+    def read_items(self, wanted: Callable[[str], bool] = None) -> Iterator[Tuple[str, Any]]:
+        f"""
+        Reads the vault from the database one key at a time by calling the '{self.do_read_items}' method, and yields the keys and their values.
+        Keys that {wanted} returns {False} for are left out. The lock is only held while the state is fetched and the resource is opened (see
+        '{self.do_read_items}'); the items are read and yielded once it's released, so a caller that takes its time with each of them doesn't hold up
+        other resources for the same path, and only one value at a time has to be in memory. Not meant to be overridden.
+        """
+        if not self.resource:
+            self.create()
+        with self.lock:
+            items = self._open_items(wanted)
+        yield from items
+
+    def _open_items(self, wanted: Union[Callable[[str], bool], None]) -> Iterator[Tuple[str, Any]]:
+        if self.exists():
+            try:
+                if self.shared and not self.streams():
+                    # The vault is read in full anyway, so it might as well be shared with other resources for the same path
+                    return ((key, value) for key, value in self._read_shared().items() if wanted is None or wanted(key))
+                # The state is fetched before the resource is opened; if the resource changes in between, the next check will just find it changed again
+                self.last_checked = time.monotonic()
+                state = self.state
+                data = self.shared.load(self.change_detector, state) if self.shared else None
+                if data is not None:
+                    items = ((key, value) for key, value in data.items() if wanted is None or wanted(key))
+                else:
+                    items = self.do_read_items(wanted)
+                self.last_known_state = state
+                self.cached_state = state
+                return self._read_errors(items)
+            except Exception as e:
+                raise ResourceNotFoundError(f"Failed to read from the resource (mode is {self.mode}): {e}", self)
+        if self.mode_properties.live_update:
+            return iter(())
+        raise ResourceNotFoundError(f"Resource not found at: {self.raw_path} (mode is {self.mode})", self)
+
+    def _read_errors(self, items: Iterator[Tuple[str, Any]]) -> Iterator[Tuple[str, Any]]:
+        # The resource is read after the lock has been released, so errors from reading it are raised from here
+        try:
+            yield from items
+        except Exception as e:
+            raise ResourceNotFoundError(f"Failed to read from the resource (mode is {self.mode}): {e}", self)
+
+    def streams(self) -> bool:
+        f"""
+        Returns a bool that says if '{self.do_read_items}' currently reads the resource as a stream rather than in full. A stream isn't stored in
+        the snapshot shared with other resources for the same path. Override this together with '{self.do_read_items}'.
+        """
+        return False
+
+    def do_read_items(self, wanted: Callable[[str], bool] = None) -> Iterator[Tuple[str, Any]]:
+        f"""
+        Optional. A function to read a vault from a database one key at a time, for resources that can do so without reading the entire vault into memory.
+        Varvault will call this function internally when it builds a vault from the resource. The default implementation reads the vault through '{self.do_read}'.
+
+        :param wanted: A function that returns a bool that says if a key is wanted, or {None} if all keys are wanted. Values for keys that aren't wanted
+         should be skipped without being decoded, if possible.
+        :return: An iterator of the keys in the database and their values. It's called with the lock held, but the iterator is consumed after the lock has
+         been released, so the resource must be opened before this returns, such that the iterator reads the resource as it was when it was opened.
+        """
+        vault_file_data = self.do_read()
+        assert isinstance(vault_file_data, dict), f"'vault_file_data' from the filehandler is not a dict: {vault_file_data}"
+        return ((key, value) for key, value in vault_file_data.items() if wanted is None or wanted(key))
+
     @abc.abstractmethod
     def do_read(self) -> Dict:
         """
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import os
+import json
+import sqlite3
+import pathlib
+import threading
+
+from typing import *
+
+from .resource import BaseResource, ResourceModes, ResourceNotFoundError
+from .utils import is_immutable
+
+
+class SqliteResource(BaseResource):
+    """
+    A resource that stores the vault in an SQLite database with one row per key. Each row holds the key, the value serialized as JSON,
+    the name of the type of the value, which turns values that JSON can't tell apart from other types back into the type they were written as,
+    and a version that is increased every time the value changes.
+
+    The database is used in WAL mode, so readers in other processes are never blocked by a writer and a crash never leaves a half-written vault behind.
+    Writes are done as a single transaction of batched upserts where rows that haven't changed are left alone. Changes made by other connections
+    are detected through 'PRAGMA data_version', which doesn't read any data, so live-update is cheap. The vault only writes the keys that have changed. Single keys can be read through
+    'read_key'/'read_keys' without loading the entire vault.
+    """
+
+    TABLE = "vault"
+
+    supports_delta_writes = True
+
+    # Rows whose value hasn't changed are left alone, which keeps their version
+    UPSERT = (f"INSERT INTO {TABLE} (key, value, type, version) VALUES (?, ?, ?, 1) "
+              f"ON CONFLICT (key) DO UPDATE SET value = excluded.value, type = excluded.type, version = version + 1 "
+              f"WHERE value != excluded.value")
+
+    def __init__(self, path: AnyStr, mode: Union[Literal["r", "w", "a", "r+", "w+", "a+"], ResourceModes] = "r", max_staleness: float = 0, timeout: float = 30.0):
+        f"""
+        Creates the SqliteResource object.
+        :param path: The path to the SQLite database file.
+        :param mode: Sets the mode of the resource. The mode can be one of the following: 'r', 'w', 'a', 'r+', 'w+', 'a+'.
+        r: Read from existing resource (default)
+        w: Create new resource and ignore existing resource and write to it
+        a: Create a new resource if none exist, otherwise read from and write to existing resource
+        r+: Read from existing resource and perform live-update
+        w+: Create new resource and ignore existing resource and write to it, and perform live-update
+        a+: Create a new resource if none exist, otherwise read from and write to existing resource, and perform live-update
+        :param max_staleness: Optional. The number of seconds that data read through live-update may be out of date; see {BaseResource}.
+        :param timeout: Optional. The number of seconds to wait for another connection to release a lock on the database. Default is 30.
+        """
+        self.connection: Union[sqlite3.Connection, None] = None
+        self.created = False
+        self.timeout = timeout
+        # Commits made through our own connection don't change 'PRAGMA data_version', so they are counted separately
+        self.local_version = 0
+        # The values written through this resource that can change in place, together with what was written for them. The vault only passes the keys
+        # that have been set to 'do_write_delta', so these are checked on every write to catch values that have been changed without being set again.
+        self.mutable: Dict[str, Tuple[Any, str]] = dict()
+        self._connection_lock = threading.RLock()
+        super(SqliteResource, self).__init__(path, mode, max_staleness=max_staleness)
+
+    @property
+    def resource(self) -> sqlite3.Connection:
+        """Returns the connection to the database once the resource has been created."""
+        return self.connection if self.created else None
+
+    @property
+    def path(self) -> AnyStr:
+        """Returns the path to the database file."""
+        return self.raw_path
+
+    def create(self) -> None:
+        """Connects to the database and creates the table for the vault if needed. A new vault is created empty, like a new JSON file would be."""
+        path = self.path
+        assert path, "Path is not defined"
+        dirname = os.path.dirname(path)
+
+        if self.mode_properties.create:
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            connection = self._connect()
+            with self._connection_lock, connection:
+                connection.execute(f"CREATE TABLE IF NOT EXISTS {self.TABLE} (key TEXT PRIMARY KEY, value TEXT NOT NULL, type TEXT NOT NULL, version INTEGER NOT NULL)")
+                if not self.mode_properties.load:
+                    connection.execute(f"DELETE FROM {self.TABLE}")
+                self.local_version += 1
+        elif not self.exists():
+            if not self.mode_properties.live_update:
+                raise ResourceNotFoundError(f"Unable to read from resource at {path} (mode is {self.mode})", self)
+            return
+        else:
+            self._connect()
+        self.created = True
+
+    def _connect(self) -> sqlite3.Connection:
+        with self._connection_lock:
+            if self.connection is None:
+                if self.mode_properties.read_only:
+                    connection = sqlite3.connect(f"{pathlib.Path(os.path.abspath(self.path)).as_uri()}?mode=ro", uri=True, timeout=self.timeout, check_same_thread=False)
+                else:
+                    connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.execute("PRAGMA synchronous=NORMAL")
+                self.connection = connection
+            return self.connection
+
+    def close(self):
+        """Closes the connection to the database. The connection is opened again if the resource is used after this."""
+        with self._connection_lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    @property
+    def state(self) -> Union[Tuple[int, int], None]:
+        """Returns the state of the database, which is the data version of the database according to SQLite and the number of commits made through this resource"""
+        if not self.exists():
+            return None
+        with self._connection_lock:
+            data_version, = self._connect().execute("PRAGMA data_version").fetchone()
+            return data_version, self.local_version
+
+    def watched_files(self) -> None:
+        """
+        Returns None, so that a 'ResourceWatcher' polls the database. In WAL mode, a commit is written to the write-ahead log before it's made visible
+        to readers through the shared-memory index of the log, which inotify doesn't see, so an event for the log can arrive before the commit can be read.
+        """
+        return None
+
+    @staticmethod
+    def decode(value: str, type_tag: str) -> Any:
+        f"""Decodes {value} from a row. JSON writes a tuple as a list, so {type_tag}, the name of the type of the value that was written, turns it back into one."""
+        decoded = json.loads(value)
+        return tuple(decoded) if type_tag == "tuple" and isinstance(decoded, list) else decoded
+
+    def writable(self, obj: Dict) -> bool:
+        f"""Checks if a key-value pair in a dict can be written to the database by attempting to serialize it by using {json.dumps}"""
+        try:
+            json.dumps(obj)
+            return True
+        except (TypeError, OverflowError):
+            return False
+
+    def exists(self) -> bool:
+        """Returns a bool that says if the database file exists"""
+        return os.path.exists(self.path)
+
+    def size(self) -> Union[int, None]:
+        """Returns the size of the database in bytes, including the write-ahead log"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return None
+        wal = f"{self.path}-wal"
+        return size + os.path.getsize(wal) if os.path.exists(wal) else size
+
+    def do_write(self, vault: dict) -> None:
+        """Writes the vault to the database as a single transaction. Rows whose values haven't changed are not touched, and rows for keys that aren't in the vault are deleted."""
+        vault = {str(key): value for key, value in vault.items()}
+        rows = [(key, json.dumps(value), type(value).__name__) for key, value in vault.items()]
+        connection = self._connect()
+        with self._connection_lock, connection:
+            existing = {key for key, in connection.execute(f"SELECT key FROM {self.TABLE}")}
+            connection.executemany(self.UPSERT, rows)
+            removed = existing.difference(vault)
+            connection.executemany(f"DELETE FROM {self.TABLE} WHERE key = ?", [(key,) for key in removed])
+            self.local_version += 1
+        self.mutable.clear()
+        self._track(vault, rows)
+
+    def do_write_delta(self, upserts: dict, deletes: Iterable[Any]) -> None:
+        """
+        Writes the keys that have changed to the database as a single transaction and deletes the keys that have been removed. Values written earlier that
+        can be changed in place are serialized again, and written if they have been (see 'mutable'). Other rows are left alone.
+        """
+        deletes = [str(key) for key in deletes]
+        upserts = {str(key): value for key, value in upserts.items()}
+        rows = [(key, json.dumps(value), type(value).__name__) for key, value in upserts.items()]
+        for key, (value, written) in list(self.mutable.items()):
+            if key not in upserts and key not in deletes:
+                encoded = json.dumps(value)
+                if encoded != written:
+                    upserts[key] = value
+                    rows.append((key, encoded, type(value).__name__))
+        connection = self._connect()
+        with self._connection_lock, connection:
+            connection.executemany(self.UPSERT, rows)
+            connection.executemany(f"DELETE FROM {self.TABLE} WHERE key = ?", [(key,) for key in deletes])
+            self.local_version += 1
+        self._track(upserts, rows)
+        for key in deletes:
+            self.mutable.pop(key, None)
+
+    def _track(self, values: Dict, rows: List[Tuple[str, str, str]]):
+        for (key, encoded, _), value in zip(rows, values.values()):
+            if is_immutable(value):
+                self.mutable.pop(key, None)
+            else:
+                self.mutable[key] = (value, encoded)
+
+    def do_read(self) -> Dict:
+        """Reads the vault from the database"""
+        with self._connection_lock:
+            connection = self._connect()
+            if not self._table_exists(connection):
+                # The database has been created by a writer that hasn't created the table yet
+                return {}
+            return {key: self.decode(value, type_tag) for key, value, type_tag in connection.execute(f"SELECT key, value, type FROM {self.TABLE}")}
+
+    def _table_exists(self, connection: sqlite3.Connection) -> bool:
+        return connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.TABLE,)).fetchone() is not None
+
+    def read_key(self, key: str) -> Any:
+        f"""Reads the value for {key} from the database without reading the rest of the vault. Raises {KeyError} if the key isn't in the database."""
+        values = self.read_keys([key])
+        if key not in values:
+            raise KeyError(f"Key {key} is not in the database at {self.path}")
+        return values[key]
+
+    def read_keys(self, keys: Iterable[str]) -> Dict[str, Any]:
+        f"""Reads the values for {keys} from the database without reading the rest of the vault. Keys that aren't in the database are left out."""
+        keys = [str(key) for key in keys]
+        if not self.exists():
+            return {}
+        values = dict()
+        with self._connection_lock:
+            connection = self._connect()
+            if not self._table_exists(connection):
+                return {}
+            # Stay well below the limit for the number of parameters in a statement
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                query = f"SELECT key, value, type FROM {self.TABLE} WHERE key IN ({', '.join('?' * len(chunk))})"
+                values.update((key, self.decode(value, type_tag)) for key, value, type_tag in connection.execute(query, chunk))
+        return values
+
+    def version(self, key: str) -> Union[int, None]:
+        f"""Returns the version of {key} in the database, which is increased every time its value changes, or None if the key isn't in the database."""
+        if not self.exists():
+            return None
+        with self._connection_lock:
+            connection = self._connect()
+            row = connection.execute(f"SELECT version FROM {self.TABLE} WHERE key = ?", (str(key),)).fetchone() if self._table_exists(connection) else None
+        return row[0] if row else None
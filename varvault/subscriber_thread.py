@@ -1,3 +1,4 @@
+import time
 import threading
 
 
@@ -10,6 +11,8 @@ class SubscriberThread(threading.Thread):
 
     def run(self):
         from .vault import VarVault
+        from .hooks import Hooks
+        start = time.perf_counter()
         self.varvault.logger.debug(f"Starting subscriber thread for {self.subscriber.__name__}...")
         try:
             self.subscriber()
@@ -18,4 +21,6 @@ class SubscriberThread(threading.Thread):
             self.exception = e
         finally:
             self.varvault: VarVault
+            if Hooks.thread in self.varvault.hooks:
+                self.varvault._emit(Hooks.thread, start, name=f"{self.subscriber.__module__}.{self.subscriber.__name__}", failed=self.exception is not None)
             self.varvault.purge_stopped_thread(self)
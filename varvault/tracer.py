@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import os
+import json
+import threading
+import time
+
+from typing import *
+
+from .hooks import Hooks, HookEvent
+
+
+class Tracer:
+    f"""
+    Records the activity of one or more vaults as spans and writes them as a Chrome trace-event JSON file.
+    The file can be opened in Perfetto (https://ui.perfetto.dev) or in chrome://tracing to see the activity of the vaults on a timeline.
+
+    A span is recorded for each call to a decorated function, each stage of the call, automatic dispatches, the lifetime of
+    threads running threaded automatics, waits for the vault's lock, writes to the resource and live-update reloads.
+    Each span is tagged with the thread it ran on and the keys it touched.
+
+    Example:
+    ```
+    tracer = Tracer()
+    tracer.attach(vault)
+    run_pipeline()
+    tracer.write("trace.json")
+    ```
+    """
+
+    def __init__(self, hooks: Iterable[Hooks] = tuple(Hooks)):
+        f"""
+        Creates a tracer. Nothing is recorded until the tracer is attached to a vault through {self.attach}.
+
+        :param hooks: Optional. The {Hooks} to record spans for. Default is all of them.
+        """
+        self.hooks: Tuple[Hooks, ...] = tuple(hooks)
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.events: List[Dict] = list()
+        self.thread_names: Dict[int, str] = dict()
+        self._lock = threading.Lock()
+
+    def attach(self, vault) -> Tracer:
+        f"""Starts recording spans for {vault}. Returns the tracer."""
+        for hook in self.hooks:
+            vault.hooks.register(hook, self.record)
+        return self
+
+    def detach(self, vault) -> Tracer:
+        f"""Stops recording spans for {vault}. Returns the tracer."""
+        for hook in self.hooks:
+            vault.hooks.unregister(hook, self.record)
+        return self
+
+    def record(self, event: HookEvent):
+        f"""Records {event} as a complete span. This is the callback the tracer registers to the vault's hooks."""
+        args = {"keys": [str(key) for key in event.keys]}
+        if event.bytes is not None:
+            args["bytes"] = event.bytes
+        args.update(event.extra)
+        span = {"name": event.name or event.hook.name,
+                "cat": event.hook.name,
+                "ph": "X",
+                "ts": (event.start - self.origin) * 1e6,
+                "dur": event.duration * 1e6,
+                "pid": self.pid,
+                "tid": event.thread_id,
+                "args": args}
+        with self._lock:
+            self.events.append(span)
+            if event.thread_id not in self.thread_names:
+                # The callback runs on the thread that emitted the event, so the current thread is the thread of the event
+                self.thread_names[event.thread_id] = threading.current_thread().name
+
+    def clear(self):
+        """Removes all recorded spans."""
+        with self._lock:
+            self.events.clear()
+
+    def to_dict(self) -> Dict:
+        """Returns the recorded spans in the Chrome trace-event format."""
+        with self._lock:
+            metadata = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}} for tid, name in self.thread_names.items()]
+            spans = sorted(self.events, key=lambda span: span["ts"])
+        return {"traceEvents": metadata + spans, "displayTimeUnit": "ms"}
+
+    def write(self, path: AnyStr):
+        f"""Writes the recorded spans to {path} as a Chrome trace-event JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
@@ -13,6 +13,16 @@ class AssignedByVaultEnum(enum.Enum):
 
 AssignedByVault = AssignedByVaultEnum.ASSIGNED
 
+# Types whose values can't be changed in place
+IMMUTABLE_TYPES = (str, int, float, bool, bytes, type(None))
+
+
+def is_immutable(value: Any) -> bool:
+    f"""Returns a bool that says if {value} can't be changed in place: a value of one of {IMMUTABLE_TYPES}, but not a subclass of them, or a tuple of such values."""
+    if type(value) is tuple:
+        return all(is_immutable(item) for item in value)
+    return type(value) in IMMUTABLE_TYPES
+
 
 def concurrent_execution(target: Union[Coroutine, FunctionType, Callable], *inputs, **kwargs):
     """
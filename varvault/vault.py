@@ -12,30 +12,147 @@ import traceback
 from typing import *
 from threading import Lock
 
-from .resource import BaseResource
-from .keyring import Keyring, Key
+from .resource import BaseResource, LazyValue, LoadStats
+from .keyring import Keyring, Key, KeyringDecoder
 from .logger import get_logger, configure_logger
 from .minivault import MiniVault
 from .subscriber_thread import SubscriberThread
+from .watcher import ResourceWatcher
 from .utils import concurrent_execution, AssignedByVault, assert_and_raise
 from .flags import Flags
+from .hooks import Hooks, HookEvent, HookRegistry
+from .profiling import FunctionProfile, ProfiledCall, record_overhead, report, to_json
+
+
+def _differs(a: Any, b: Any) -> bool:
+    f"""Returns a bool that says if {a} and {b} differ. Values whose comparison isn't a bool, like NumPy arrays, differ unless they're the same object."""
+    try:
+        return bool(a != b)
+    except (TypeError, ValueError):
+        return a is not b
+
+
+class _KeyringKeys:
+    f"""
+    What 'VarVault.keys' returns. Calling it returns the keys of the vault, like {dict.keys}, which dict() and dict.update() rely on. Anything else is
+    forwarded to 'VarVault.keyring_keys', which used to be named 'keys', with a {DeprecationWarning}.
+    """
+
+    def __init__(self, vault: VarVault):
+        self.vault = vault
+
+    def __call__(self):
+        return dict.keys(self.vault)
+
+    def _keyring_keys(self) -> KeyringDecoder:
+        warnings.warn("The keys of the keyring have moved from 'VarVault.keys' to 'VarVault.keyring_keys'; 'VarVault.keys' is 'dict.keys'",
+                      DeprecationWarning, stacklevel=3)
+        return self.vault.keyring_keys
+
+    def __getattr__(self, name):
+        return getattr(self._keyring_keys(), name)
+
+    def __getitem__(self, key_name):
+        return self._keyring_keys()[key_name]
+
+    def __contains__(self, key_name):
+        return key_name in self._keyring_keys()
+
+    def __iter__(self):
+        return iter(self._keyring_keys())
+
+    def __len__(self):
+        return len(self._keyring_keys())
 
 
 class VarVault(dict):
 
+    @property
+    def keys(self) -> _KeyringKeys:
+        # Kept callable as 'dict.keys', and usable as the keys of the keyring, which were named 'keys' before they were named 'keyring_keys'
+        return _KeyringKeys(self)
+
+    def __getitem__(self, key):
+        value = super(VarVault, self).__getitem__(key)
+        if isinstance(value, LazyValue):
+            value = self._materialize(key, value)
+        return value
+
     def __setitem__(self, key, value):
         data = {key: value}
         if self.resource and self.resource.writable(data):
             self.writable_args.update(data)
+            self.dirty_keys.add(key)
+            self.deleted_keys.discard(key)
 
+        self.lazy_keys.discard(key)
+        self.resource_keys.discard(key)
         super(VarVault, self).__setitem__(key, value)
 
     def __delitem__(self, key):
         if self.resource and key in self.writable_args:
             del self.writable_args[key]
+            self.deleted_keys.add(key)
+            self.dirty_keys.discard(key)
 
+        self.lazy_keys.discard(key)
+        self.resource_keys.discard(key)
         super(VarVault, self).__delitem__(key)
 
+    def values(self):
+        self._materialize_all()
+        return super(VarVault, self).values()
+
+    def items(self):
+        self._materialize_all()
+        return super(VarVault, self).items()
+
+    def __iter__(self):
+        # Overriding this makes dict(), {**vault} and dict.update() read the values through __getitem__, which builds them, rather than straight from the dict
+        return super(VarVault, self).__iter__()
+
+    def copy(self) -> dict:
+        self._materialize_all()
+        return super(VarVault, self).copy()
+
+    def pop(self, key, *default):
+        value = super(VarVault, self).get(key)
+        if isinstance(value, LazyValue):
+            self._materialize(key, value)
+        self.lazy_keys.discard(key)
+        return super(VarVault, self).pop(key, *default)
+
+    def popitem(self):
+        self._materialize_all()
+        return super(VarVault, self).popitem()
+
+    def setdefault(self, key, default=None):
+        if super(VarVault, self).__contains__(key):
+            return self[key]
+        return super(VarVault, self).setdefault(key, default)
+
+    def __eq__(self, other):
+        self._materialize_all()
+        if isinstance(other, VarVault):
+            other._materialize_all()
+        return super(VarVault, self).__eq__(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __or__(self, other):
+        self._materialize_all()
+        return super(VarVault, self).__or__(other)
+
+    def __ror__(self, other):
+        self._materialize_all()
+        return super(VarVault, self).__ror__(other)
+
+    def __repr__(self):
+        self._materialize_all()
+        return super(VarVault, self).__repr__()
+
     @functools.singledispatchmethod
     def _put(self, *args, **kwargs):
         raise NotImplementedError("Not implemented")
@@ -43,11 +160,9 @@ class VarVault(dict):
     @_put.register
     def _mv(self, mini: MiniVault):
         f"""{self._put} to add a MiniVault"""
-
-        async def _put(item):
-            key, value = item
+        # Nothing here waits on anything, so the values are set one after the other; an event loop with a task per key only adds to the cost
+        for key, value in mini.items():
             self.__setitem__(key, value)
-        concurrent_execution(_put, mini.items())
         self.write()
 
     @_put.register
@@ -69,8 +184,26 @@ class VarVault(dict):
                               "This is not permitted and you should consider removing the action that triggered this.")
             return
 
-        # Try to write writable_args to vault_file if it has been defined
-        self.resource.write(self.writable_args)
+        # Take the changes since the last write; they are put back if the write fails
+        dirty_keys, self.dirty_keys = self.dirty_keys, set()
+        deleted_keys, self.deleted_keys = self.deleted_keys, set()
+
+        # Try to write writable_args to vault_file if it has been defined, or only the changes if the resource supports it
+        start = time.perf_counter()
+        try:
+            if self.resource.supports_delta_writes:
+                written = {key: self.writable_args[key] for key in dirty_keys}
+                self.resource.write_delta(written, deleted_keys)
+            else:
+                written = self.writable_args
+                self.resource.write(written)
+        except Exception:
+            self.dirty_keys.update(dirty_keys.difference(self.deleted_keys))
+            self.deleted_keys.update(deleted_keys.difference(self.dirty_keys))
+            raise
+        record_overhead("resource_write", time.perf_counter() - start)
+        if Hooks.write in self.hooks:
+            self._emit(Hooks.write, start, keys=written.keys(), bytes=self.resource.size())
 
     def __init__(self,
                  *flags: Flags,
@@ -121,8 +254,16 @@ class VarVault(dict):
         else:
             self.logger = get_logger(name, remove_existing_log_file) if not disable_logger else None
         self.writable_args = dict()
+        # Keys that have been set or deleted since the vault was last written, for resources that support delta writes
+        self.dirty_keys: Set[Key] = set()
+        self.deleted_keys: Set[Key] = set()
+        # Keys whose values are still LazyValues, see Flags.lazy_load
+        self.lazy_keys: Set[Key] = set()
+        # Keys whose values were last read from the resource rather than set in the vault; only these are removed when they're removed from the resource
+        self.resource_keys: Set[Key] = set()
         self.initialized = False
-        self.times_taken = dict()
+        self.times_taken: Dict[str, FunctionProfile] = dict()
+        self.hooks = HookRegistry(self.logger)
         self.keyring_class = keyring
         self.flags: set = set(flags)
         self.resource: BaseResource = resource
@@ -132,9 +273,16 @@ class VarVault(dict):
         self.running_tasks: Set[SubscriberThread] = set()
         self.threaded_automatics = set()
         self.exceptions = list()
+        self.watcher: Union[ResourceWatcher, None] = None
+        # Statistics from loading the vault from the resource, set by the factory function 'create'
+        self.load_stats: Union[LoadStats, None] = None
 
         if initial_vars and isinstance(initial_vars, MiniVault):
-            self._put(initial_vars)
+            if Flags.is_set(Flags.lazy_load, *flags):
+                self._load_lazy(initial_vars)
+            else:
+                self._put(initial_vars)
+            self.resource_keys.update(initial_vars.keys())
         self.initialized = True
 
         if self.resource and not self.resource.resource:
@@ -143,8 +291,8 @@ class VarVault(dict):
         self.lock = Lock()
 
         # Get the keys from the keyring and expand it with extra keys
-        self.keys: Dict[str, Key] = self.keyring_class.get_keys()
-        self.keys.update(extra_keys)
+        # The keys are kept as a decoder, which live-update uses to build the values it reloads. They're not named 'keys', which would hide 'dict.keys'
+        self.keyring_keys: KeyringDecoder = self.keyring_class.decoder(extra_keys)
 
         if self.resource:
             self.log(f"Vault writing data to '{self.resource.path}'", level=logging.DEBUG, all_flags=flags)
@@ -154,7 +302,7 @@ class VarVault(dict):
     def __contains__(self, key: Key):
         self._assert_key_is_correct_type(key, msg=f"{self.__contains__.__name__} may only be used with a {Key}-object, not {type(key)}")
 
-        if key.key_name not in self.keys:
+        if key.key_name not in self.keyring_keys:
             warnings.warn(f"{key.key_name} is not defined in the keyring. This is not a problem, but trying to check if the "
                           f"vault contains this key will never succeed; Consider removing the call that triggered this warning.")
             return False
@@ -162,8 +310,7 @@ class VarVault(dict):
         return super().__contains__(key)
 
     def __str__(self):
-
-        return super().__str__()
+        return self.__repr__()
 
     def as_json_str(self):
         """
@@ -392,6 +539,7 @@ class VarVault(dict):
          {Flags.debug},
          {Flags.silent}
         """
+        insert_start = time.perf_counter()
         all_flags = self._get_all_flags(*flags)
 
         # Assert that key has correct type
@@ -411,7 +559,11 @@ class VarVault(dict):
             self._insert__assert_value_may_be_inserted(key, value, modifications_permitted=Flags.is_set(Flags.permit_modifications, *all_flags))
         concurrent_execution(assert_key_and_value_may_be_inserted, mini.items())
 
+        start = time.perf_counter()
         with self.lock:
+            record_overhead("lock_wait", time.perf_counter() - start)
+            if Hooks.lock_wait in self.hooks:
+                self._emit(Hooks.lock_wait, start, keys=mini.keys())
             self.log("-------------------", all_flags=all_flags)
             self.log("Variables going in:", all_flags=all_flags)
             for ret_key, ret_value in mini.items():
@@ -419,6 +571,8 @@ class VarVault(dict):
             self._put(mini)
 
             self.log("-----------------", all_flags=all_flags)
+        if Hooks.insert in self.hooks:
+            self._emit(Hooks.insert, insert_start, keys=mini.keys())
         self._dispatch_subscribers(mini.keys())
 
     def _insert__assert_value_may_be_inserted(self, key: Key, value: object, modifications_permitted=False):
@@ -462,11 +616,16 @@ class VarVault(dict):
 
     def get(self, *args, **kwargs):
         def multiple(keys, *flags):
+            start = time.perf_counter()
             all_flags = self._get_all_flags(*flags)
             mini = MiniVault()
             self._assert_keys_in_keyring(keys)
+            lock_start = time.perf_counter()
             with self.lock:
-                self._try_reload_from_file(*all_flags)
+                record_overhead("lock_wait", time.perf_counter() - lock_start)
+                if Hooks.lock_wait in self.hooks:
+                    self._emit(Hooks.lock_wait, lock_start, keys=keys)
+                reloaded_keys = self._try_reload_from_file(*all_flags)
 
                 if not Flags.is_set(Flags.input_key_can_be_missing, *all_flags):
                     for key in keys:
@@ -475,6 +634,11 @@ class VarVault(dict):
                                                                f"in which case the value will be {None}, or make sure a value is mapped to it. "
                                                                f"Known functions/methods where this key is used as an output key: {key.usages.as_return}"))
                 [mini.update({key: self[key]}) for key in keys if key in self]
+            if Hooks.get in self.hooks:
+                self._emit(Hooks.get, start, keys=keys)
+            if reloaded_keys:
+                # Keys that arrived through live-update should trigger automatics just like inserted keys
+                self._dispatch_subscribers(reloaded_keys)
             return mini
 
         def single(key, *flags, default=None):
@@ -514,6 +678,49 @@ class VarVault(dict):
         """
         return self.manual(*flags, input=input_keys, output=output_keys)(lambda_func)
 
+    # ============================================================
+    # live-update
+    # ============================================================
+    def refresh(self, *flags: Flags) -> List[Key]:
+        f"""
+        Checks right away if the resource has changed and reloads the vault from it if it has. This only has an effect if live-update is enabled for the resource.
+        The resource is checked even if it was checked within its 'max_staleness'. Automatic functions subscribed to keys that were added or changed are dispatched.
+
+        :param flags: An optional set of flags to tweak the behavior of the refresh. Flags that have an effect:
+         {Flags.debug},
+         {Flags.silent}
+        :return: The keys that were added or changed.
+        """
+        all_flags = self._get_all_flags(*flags)
+        with self.lock:
+            reloaded_keys = self._try_reload_from_file(*all_flags, force=True)
+        if reloaded_keys:
+            self._dispatch_subscribers(reloaded_keys)
+        return reloaded_keys
+
+    def watch(self, interval: float = 0.1, use_inotify: bool = True) -> ResourceWatcher:
+        f"""
+        Starts a {ResourceWatcher} that refreshes the vault in the background whenever the resource changes, instead of when the vault is accessed.
+        Automatic functions subscribed to keys that arrive in the resource from elsewhere, like another process, are dispatched by the watcher.
+        Live-update must be enabled for the resource. Combined with a 'max_staleness' for the resource, accessing the vault rarely has to check the resource itself.
+
+        :param interval: The interval in seconds to poll the resource at if inotify isn't used.
+        :param use_inotify: Use inotify to watch the resource if it's available (Linux). Default is {True}.
+        :return: The running {ResourceWatcher}.
+        """
+        assert_and_raise(self.resource is not None and self.resource.mode_properties.live_update,
+                         ValueError(f"The vault can only be watched if it has a resource with live-update enabled"))
+        assert_and_raise(self.watcher is None, ValueError("The vault is already being watched"))
+        self.watcher = ResourceWatcher(self, interval=interval, use_inotify=use_inotify)
+        self.watcher.start()
+        return self.watcher
+
+    def stop_watching(self, timeout: float = None):
+        f"""Stops the {ResourceWatcher} started by {self.watch}, if any."""
+        if self.watcher:
+            self.watcher.stop(timeout)
+            self.watcher = None
+
     def await_running_tasks(self, timeout: float = 0, exception: Exception = None):
         f"""
         Wait for all running tasks to finish.
@@ -532,9 +739,53 @@ class VarVault(dict):
             self.logger.error(f"Exception(s) occurred while waiting for running tasks to finish: {self.exceptions}. Raising last exception.")
             raise self.exceptions.pop()
 
+    # ============================================================
+    # profiling
+    # ============================================================
+    def profile_report(self, sort_by: str = "wall", reverse: bool = True, limit: int = None, as_json: bool = False) -> str:
+        f"""
+        Returns a report of the time taken by the functions decorated by this vault.
+        For each function, the wall time, the CPU time, the time spent in the function body and the time spent by varvault
+        ('pre_call', 'post_call' and, as part of those, 'lock_wait' and 'resource_write') are reported together with latency percentiles.
+
+        :param sort_by: The column to sort the table by. Default is 'wall'.
+        :param reverse: Sort in descending order if {True} (default).
+        :param limit: Optional. Only report the first {limit} functions.
+        :param as_json: If {True}, return the report as a JSON-string instead of a table. {sort_by}, {reverse} and {limit} have no effect on the JSON-string.
+        :return: The report as a str.
+        """
+        profiles = list(self.times_taken.values())
+        if as_json:
+            return to_json(profiles, indent=2)
+        return report(profiles, sort_by=sort_by, reverse=reverse, limit=limit)
+
+    def export_profile(self, path: AnyStr):
+        f"""Writes the report from {self.profile_report} as JSON to {path}. Useful for comparing the vault overhead against the function bodies across builds."""
+        with open(path, "w") as f:
+            f.write(self.profile_report(as_json=True))
+
+    def reset_profile(self):
+        """Resets the time taken for all functions decorated by this vault."""
+        self.times_taken.clear()
+
     # ============================================================
     # privates
     # ============================================================
+    def _end_call(self, call: ProfiledCall, func_module_name: str, input: List[Key], output: List[Key], failed: bool = False):
+        call.stop(failed=failed)
+        if Hooks.call in self.hooks:
+            self._emit(Hooks.call, call.wall_start, name=func_module_name, keys=list(input) + list(output), failed=failed)
+
+    def _emit(self, hook: Hooks, start: float, **kwargs):
+        f"""Emits {hook} to the registered callbacks. Callers should check that {hook} has callbacks before calling this to keep the overhead at zero when it doesn't."""
+        self.hooks.emit(HookEvent(hook, start, time.perf_counter() - start, **kwargs))
+
+    def _get_profile(self, func_module_name: str) -> FunctionProfile:
+        profile = self.times_taken.get(func_module_name)
+        if profile is None:
+            # setdefault is atomic, so threaded automatics racing to create the profile will end up sharing the same one
+            profile = self.times_taken.setdefault(func_module_name, FunctionProfile(func_module_name))
+        return profile
 
     def _convert_input_keys_and_output_keys(self, input: Union[Key, List, Tuple], output: Union[Key, List, Tuple]) -> Tuple[List, List]:
         input = input if input else list()
@@ -567,20 +818,41 @@ class VarVault(dict):
             #
             # Do pre-call related stuff
             #
-            input_kwargs = self._pre_call(input, func_module_name, *all_flags, **kwargs)
+            call = ProfiledCall(self._get_profile(func_module_name))
+            try:
+                input_kwargs = self._pre_call(input, func_module_name, *all_flags, **kwargs)
+            except Exception:
+                call.lap("pre_call")
+                self._end_call(call, func_module_name, input, output, failed=True)
+                raise
+            if Hooks.pre_call in self.hooks:
+                self._emit(Hooks.pre_call, call.lap_start, name=func_module_name, keys=input)
+            call.lap("pre_call")
             try:
                 ret = await func(*args, **input_kwargs)
             except Exception as e:
+                call.lap()
+                self._end_call(call, func_module_name, input, output, failed=True)
                 if not Flags.is_set(Flags.no_error_logging, *all_flags):
                     # Flag to not log error is NOT set, so we should log the error and then raise the error
                     self.log(f"Failed to run {func_module_name}: {e}", level=logging.ERROR, all_flags=all_flags)
                     self.log(str(traceback.format_exc()).rstrip("\n"), level=logging.ERROR, all_flags=all_flags)
                 raise
+            call.lap()
 
             #
             # Do post-call related stuff
             #
-            self._post_call(ret, input, output, func_module_name, *all_flags)
+            try:
+                self._post_call(ret, input, output, func_module_name, *all_flags)
+            except Exception:
+                call.lap("post_call")
+                self._end_call(call, func_module_name, input, output, failed=True)
+                raise
+            if Hooks.post_call in self.hooks:
+                self._emit(Hooks.post_call, call.lap_start, name=func_module_name, keys=output)
+            call.lap("post_call")
+            self._end_call(call, func_module_name, input, output)
 
             return ret
         return wrap_inner_async
@@ -594,21 +866,42 @@ class VarVault(dict):
             #
             # Do pre-call related stuff
             #
-            input_kwargs = self._pre_call(input, func_module_name, *all_flags, **kwargs)
+            call = ProfiledCall(self._get_profile(func_module_name))
+            try:
+                input_kwargs = self._pre_call(input, func_module_name, *all_flags, **kwargs)
+            except Exception:
+                call.lap("pre_call")
+                self._end_call(call, func_module_name, input, output, failed=True)
+                raise
+            if Hooks.pre_call in self.hooks:
+                self._emit(Hooks.pre_call, call.lap_start, name=func_module_name, keys=input)
+            call.lap("pre_call")
 
             try:
                 ret = func(*args, **input_kwargs)
             except Exception as e:
+                call.lap()
+                self._end_call(call, func_module_name, input, output, failed=True)
                 if not Flags.is_set(Flags.no_error_logging, *all_flags):
                     # Flag to not log error is NOT set, so we should log the error and then raise the error
                     self.log(f"Failed to run {func_module_name}: {e}", level=logging.ERROR, all_flags=all_flags)
                     self.log(str(traceback.format_exc()).rstrip("\n"), level=logging.ERROR, all_flags=all_flags)
                 raise
+            call.lap()
 
             #
             # Do post-call related stuff
             #
-            self._post_call(ret, input, output, func_module_name, *all_flags)
+            try:
+                self._post_call(ret, input, output, func_module_name, *all_flags)
+            except Exception:
+                call.lap("post_call")
+                self._end_call(call, func_module_name, input, output, failed=True)
+                raise
+            if Hooks.post_call in self.hooks:
+                self._emit(Hooks.post_call, call.lap_start, name=func_module_name, keys=output)
+            call.lap("post_call")
+            self._end_call(call, func_module_name, input, output)
 
             return ret
         return wrap_inner
@@ -709,14 +1002,23 @@ class VarVault(dict):
             # May not dispatch; conditional is not met
             return
 
-        if threaded:
-            # Dispatch threaded functions.
-            thread = SubscriberThread(function, self)
-            self.running_tasks.add(thread)
-            thread.start()
-        else:
-            # Dispatch the function.
-            function()
+        start = time.perf_counter()
+        failed = False
+        try:
+            if threaded:
+                # Dispatch threaded functions.
+                thread = SubscriberThread(function, self)
+                self.running_tasks.add(thread)
+                thread.start()
+            else:
+                # Dispatch the function.
+                function()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if Hooks.dispatch in self.hooks:
+                self._emit(Hooks.dispatch, start, name=f"{function.__module__}.{function.__name__}", keys=keys, threaded=threaded, failed=failed)
 
     def _get_all_flags(self, *flags):
         self._assert_flag_is_correct_type(*flags)
@@ -738,16 +1040,77 @@ class VarVault(dict):
         assert isinstance(keys, (list, tuple)), f"Keys {keys} is not of required type {list} or {tuple} (type: {type(keys)})"
         for key in keys:
             self._assert_key_is_correct_type(key)
-            assert key in self.keys, f"Key {key} is not in the keyring."
-
-    def _try_reload_from_file(self, *all_flags: Flags):
-        """Can be used to reload from a file if changes has been made to it since it was read last time."""
-        if self.resource and self.resource.mode_properties.live_update:
-            if not self.resource.resource_has_changed():
-                return
-            self.log(f"Reloading from {self.resource.path}; The content has changed and live-update is enabled.", all_flags=all_flags)
-            mv = self.resource.create_mv(**self.keys)
-            self._put(mv)
+            assert key in self.keyring_keys, f"Key {key} is not in the keyring."
+
+    def _try_reload_from_file(self, *all_flags: Flags, force: bool = False) -> List[Key]:
+        f"""
+        Can be used to reload from a file if changes has been made to it since it was read last time.
+        Only keys that have been added or changed in the file are built and put in the vault, and the vault is not written back to the file.
+        Keys that have been removed from the file are removed from the vault if the vault cannot write to the file and their values were read from it;
+        keys set in the vault itself are kept. A vault that can write keeps them all, and they will be written back to the file the next time the vault is written.
+
+        :param force: Check the resource even if it was checked within its 'max_staleness'.
+        :return: The keys that were added or changed.
+        """
+        if not self.resource or not self.resource.mode_properties.live_update:
+            return []
+        if not force and self.resource.is_fresh():
+            return []
+        start = time.perf_counter()
+        changed = self.resource.resource_has_changed()
+        if Hooks.state_check in self.hooks:
+            self._emit(Hooks.state_check, start, changed=changed)
+        if not changed:
+            return []
+        self.log(f"Reloading from {self.resource.path}; The content has changed and live-update is enabled.", all_flags=all_flags)
+        vault_file_data = self.resource.read()
+        _missing = object()
+        changed_data = {key_name: value for key_name, value in vault_file_data.items()
+                        if key_name in self.keyring_keys and _differs(self.writable_args.get(key_name, _missing), value)}
+        mv = self.resource.build_mv(changed_data, self.keyring_keys)
+        removed = list()
+        if not self.resource.mode_properties.write:
+            # Keys that were set in the vault were never in the resource, so they're kept
+            removed = [key for key in self.resource_keys if key not in vault_file_data]
+        self._apply_reload(mv, removed)
+        if Hooks.reload in self.hooks:
+            self._emit(Hooks.reload, start, keys=mv.keys(), bytes=self.resource.size(), removed=removed)
+        return mv.keys()
+
+    def _load_lazy(self, mini: MiniVault):
+        f"""Puts the {LazyValue}-objects in {mini} in the vault. They were read from the resource, so they are writable and there's nothing to write."""
+        for key, value in mini.items():
+            super(VarVault, self).__setitem__(key, value)
+            self.writable_args[key] = value.raw
+            self.lazy_keys.add(key)
+
+    def _materialize(self, key: Key, value: LazyValue) -> Any:
+        f"""Builds the value for {key} from {value} and replaces {value} in the vault with it."""
+        built = value.materialize()
+        super(VarVault, self).__setitem__(key, built)
+        if self.writable_args.get(key) is value.raw:
+            self.writable_args[key] = built
+        self.lazy_keys.discard(key)
+        return built
+
+    def _materialize_all(self):
+        for key in list(self.lazy_keys):
+            value = super(VarVault, self).get(key)
+            if isinstance(value, LazyValue):
+                self._materialize(key, value)
+
+    def _apply_reload(self, mv: MiniVault, removed: List[Key]):
+        f"""Applies the changes from a live-update reload to the vault. The values come from the resource, so they are writable by definition and nothing is written back."""
+        for key, value in mv.items():
+            super(VarVault, self).__setitem__(key, value)
+            self.writable_args[key] = value
+            self.lazy_keys.discard(key)
+            self.resource_keys.add(key)
+        for key in removed:
+            self.lazy_keys.discard(key)
+            self.resource_keys.discard(key)
+            self.writable_args.pop(key, None)
+            super(VarVault, self).__delitem__(key)
 
     def _clean_output_keys(self, output_keys: Union[List[Key], Tuple[Key]], *all_flags: Flags):
         self.log(f"Cleaning output keys: {output_keys}", all_flags=all_flags)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+import sys
+import pickle
+import hashlib
+
+from typing import *
+
+from .minivault import MiniVault
+
+CHUNK_SIZE = 1 << 16
+
+# Bumped whenever the layout of the cache changes; caches of another version are ignored
+VERSION = 1
+
+
+def digest(path: AnyStr) -> str:
+    f"""Returns the md5 of the content of the file at {path}. Unlike the state of most change detectors, it's the same in every process."""
+    hash_md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+class WarmStartCache:
+    f"""
+    A cache of a vault that has been loaded from a file, stored next to the file, so that other processes that load the same file with the same
+    keyring can unpickle the built values instead of parsing the file and building the values again.
+
+    The cache holds the md5 of the file and the fingerprint of the keyring it was built for (see 'KeyringDecoder.fingerprint'), and is only used if
+    both match. The values are stored through {pickle}, so the cache must be as trusted as the file itself, and the classes of the values must be
+    picklable. A change to the code of a struct class that changes what it builds isn't detected; remove the cache when that happens.
+    """
+
+    SUFFIX = ".warm-start"
+
+    def __init__(self, path: AnyStr):
+        f"""
+        :param path: The path to the file of the vault. The cache is stored at {path} with {self.SUFFIX} added.
+        """
+        self.path = f"{path}{self.SUFFIX}"
+
+    def header(self, file_digest: str, fingerprint: str) -> Dict:
+        return {"version": VERSION, "python": sys.version_info[:2], "digest": file_digest, "fingerprint": fingerprint}
+
+    def load(self, file_digest: str, fingerprint: str) -> Union[Tuple[Dict[str, Any], List[str]], None]:
+        f"""
+        Returns the values in the cache by the names of their keys and the keys that were in the file but not in the keyring, if the cache was stored
+        for {file_digest} and {fingerprint}. Returns {None} if there's no cache, if it doesn't match or if it can't be read.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                # The header is a pickle of its own, so a cache that doesn't match is rejected without unpickling the values
+                if pickle.load(f) != self.header(file_digest, fingerprint):
+                    return None
+                data, keys_not_in_keyring = pickle.load(f)
+        except Exception:
+            return None
+        return data, keys_not_in_keyring
+
+    def store(self, file_digest: str, fingerprint: str, mv: MiniVault, keys_not_in_keyring: List[str]) -> bool:
+        f"""Stores {mv} as the vault loaded from the file with {file_digest} with the keyring with {fingerprint}. Returns a bool that says if it was stored."""
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                pickle.dump(self.header(file_digest, fingerprint), f, protocol=pickle.HIGHEST_PROTOCOL)
+                # The keys are stored by name; the keys themselves belong to the keyring
+                pickle.dump(({str(key): value for key, value in mv.items()}, keys_not_in_keyring), f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Other processes either see the old cache or the new one, never half of it
+            os.replace(temp_path, self.path)
+            return True
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+
+    def remove(self):
+        """Removes the cache, if there is one."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import os
+import sys
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+
+from typing import *
+
+
+class Inotify:
+    """A minimal wrapper around inotify through ctypes that watches a directory for files being written, moved or deleted. Only available on Linux."""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT = struct.Struct("iIII")
+
+    _libc = None
+
+    @classmethod
+    def libc(cls):
+        if cls._libc is None:
+            cls._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        return cls._libc
+
+    @classmethod
+    def available(cls) -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            return hasattr(cls.libc(), "inotify_init1")
+        except OSError:
+            return False
+
+    def __init__(self, directory: AnyStr):
+        libc = self.libc()
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}: {os.strerror(errno)}")
+
+    def wait(self, timeout: float) -> Set[str]:
+        f"""Waits up to {timeout} seconds for events and returns the names of the files in the directory that the events were for."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        names = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + self.EVENT.size <= len(data):
+            _, _, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ResourceWatcher(threading.Thread):
+    f"""
+    A thread that watches the resource of a vault and refreshes the vault in the background as soon as the resource changes,
+    which includes dispatching automatic functions subscribed to keys that arrived in the resource from elsewhere.
+
+    Files are watched through inotify where it's available. Otherwise, or if {Inotify} cannot be used for the resource (see 'BaseResource.watched_files'),
+    the resource is polled, which is cheap as long as the resource's 'state' is cheap (see varvault.change_detection).
+    """
+
+    def __init__(self, vault, interval: float = 0.1, use_inotify: bool = True):
+        f"""
+        :param vault: The vault to refresh.
+        :param interval: The interval in seconds to poll the resource at. With inotify, this is the longest time it takes for the watcher to stop.
+        :param use_inotify: Use inotify if it's available. Default is {True}.
+        """
+        super(ResourceWatcher, self).__init__(name=f"varvault-watcher-{vault.resource.raw_path}", daemon=True)
+        self.vault = vault
+        self.interval = interval
+        self.refreshes = 0
+        self._stop_event = threading.Event()
+        self.inotify: Union[Inotify, None] = None
+        path = vault.resource.raw_path
+        # Events for files that don't belong to the resource are ignored; with None, every file in the directory belongs to it
+        watched = vault.resource.watched_files()
+        directory, self.names = watched if watched is not None else (None, None)
+        if use_inotify and watched is not None and Inotify.available() and os.path.isdir(directory):
+            try:
+                self.inotify = Inotify(directory)
+            except OSError as e:
+                vault.log(f"Unable to watch {directory} through inotify; polling {path} instead: {e}")
+
+    def run(self):
+        try:
+            # Catch up with changes made before the watcher started
+            self._refresh()
+            while not self._stop_event.is_set():
+                if self.inotify:
+                    names = self.inotify.wait(self.interval)
+                    if not names or (self.names is not None and not self.names.intersection(names)):
+                        continue
+                elif self._stop_event.wait(self.interval):
+                    break
+                self._refresh()
+        finally:
+            if self.inotify:
+                self.inotify.close()
+
+    def _refresh(self):
+        try:
+            if self.vault.refresh():
+                self.refreshes += 1
+        except Exception as e:
+            # Most likely an automatic function that failed. Treat it like a failed threaded automatic and keep watching.
+            self.vault.log(f"Refresh from watcher for {self.vault.resource.path} failed: {e}", level=logging.ERROR, exception=e)
+            self.vault.exceptions.append(e)
+
+    def stop(self, timeout: float = None):
+        """Stops the watcher and waits for it to stop."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)